@@ -0,0 +1,132 @@
+"""
+Database connection profile.
+
+PostgreSQL (DATABASE_URL set) connects in one of three modes chosen with
+DATABASE_POOL:
+
+- "psycopg" (default): a psycopg 3 connection pool per process, checked
+  before every checkout. Sized with DATABASE_POOL_MIN_SIZE,
+  DATABASE_POOL_MAX_SIZE and DATABASE_POOL_TIMEOUT (seconds to wait for a
+  free connection).
+- "pgbouncer": persistent, health-checked connections to a PgBouncer in
+  transaction pooling mode (server-side cursors disabled, as PgBouncer
+  cannot keep them across transactions).
+- "persistent": one persistent, health-checked connection per thread.
+
+Persistent connections live DATABASE_CONN_MAX_AGE seconds (default 600).
+
+SQLite keeps one health-checked connection per thread and tunes it on
+creation: WAL journal (readers never block the writer), synchronous=NORMAL
+(safe with WAL), a busy timeout instead of immediate "database is locked"
+errors, memory-mapped reads and a larger page cache. Transactions start
+IMMEDIATE so concurrent writers queue on the busy timeout instead of
+failing on a lock upgrade.
+
+Measure a profile with `python manage.py benchmark_connections`.
+"""
+import os
+
+import dj_database_url
+
+POOL_MODES = ('psycopg', 'pgbouncer', 'persistent')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
+
+def env_int(environ, name, default):
+    return int(environ.get(name, default))
+
+
+def sqlite_config(path, environ=os.environ):
+    """
+    SQLite settings with the tuned pragmas run on every new connection.
+
+    Returns:
+        dict: A DATABASES entry
+    """
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': env_int(environ, 'DATABASE_CONN_MAX_AGE', 600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(
+                f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()
+            ),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+
+
+def postgres_config(url, environ=os.environ):
+    """
+    PostgreSQL settings for the DATABASE_POOL mode.
+
+    Returns:
+        dict: A DATABASES entry
+    """
+    mode = environ.get('DATABASE_POOL', 'psycopg').lower()
+    if mode not in POOL_MODES:
+        raise ValueError(f'DATABASE_POOL must be one of {", ".join(POOL_MODES)}, not {mode!r}')
+
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=env_int(environ, 'DATABASE_CONN_MAX_AGE', 600),
+        conn_health_checks=True,
+    )
+    config['OPTIONS'] = {'sslmode': 'require'}
+
+    if mode == 'psycopg':
+        from psycopg_pool import ConnectionPool
+
+        # The pool owns the connections, Django must close (return) them
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': env_int(environ, 'DATABASE_POOL_MIN_SIZE', 2),
+            'max_size': env_int(environ, 'DATABASE_POOL_MAX_SIZE', 10),
+            'timeout': env_int(environ, 'DATABASE_POOL_TIMEOUT', 10),
+            'check': ConnectionPool.check_connection,
+        }
+    elif mode == 'pgbouncer':
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return config
+
+
+def database_config(base_dir, environ=os.environ):
+    """
+    The default database: PostgreSQL from DATABASE_URL, else local SQLite.
+
+    Returns:
+        dict: The DATABASES['default'] entry
+    """
+    url = environ.get('DATABASE_URL')
+    if url:
+        return postgres_config(url, environ)
+    return sqlite_config(base_dir / 'db.sqlite3', environ)
+
+
+def baseline_config(config):
+    """
+    The same database with Django's defaults: a new connection per request,
+    no pool and SQLite's default journal and pragmas (what the profile is
+    compared against by benchmark_connections).
+
+    Returns:
+        dict: A DATABASES entry
+    """
+    baseline = {**config, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+    options = dict(config.get('OPTIONS', {}))
+    options.pop('pool', None)
+    options.pop('transaction_mode', None)
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        # WAL is stored in the database file, switch it back explicitly
+        options['init_command'] = 'PRAGMA journal_mode=DELETE'
+    baseline['OPTIONS'] = options
+    return baseline
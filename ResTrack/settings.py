@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
-import dj_database_url
+
+from .database import database_config
 
 # ======================
 # Build paths inside the project
@@ -27,8 +28,9 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    # Before staticfiles, whose collectstatic command marks extends
     'marks',
+    'django.contrib.staticfiles',
 ]
 
 # ======================
@@ -41,6 +43,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'marks.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,25 +82,48 @@ WSGI_APPLICATION = 'ResTrack.wsgi.application'
 # Local dev: SQLite
 # Production (Render): Neon PostgreSQL
 
-# Parse the DATABASE_URL if it exists
-if os.environ.get("DATABASE_URL"):
-    DATABASES = {
-        "default": dj_database_url.config(
-            default=os.environ.get("DATABASE_URL"),
-            conn_max_age=600
-        )
-    }
-    # Add SSL requirement for PostgreSQL (Neon)
-    DATABASES['default']['OPTIONS'] = {
-        'sslmode': 'require'
+# PostgreSQL from DATABASE_URL (pooled), else tuned local SQLite;
+# see ResTrack/database.py for the connection profile
+DATABASES = {
+    "default": database_config(BASE_DIR),
+}
+
+# ======================
+# Cache
+# ======================
+# One cache shared by every process (gunicorn workers, run_recalc_worker).
+# The generation tokens of marks/generations.py, which tell other processes
+# to recompile their grading policies, typeahead index and class analytics,
+# have a cache of their own so culling cached values never drops them.
+# Redis from REDIS_URL (needs the redis package) when processes run on
+# several hosts, else cache directories on the local disk.
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "generations": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "generations",
+        },
     }
 else:
-    # Local SQLite fallback
-    DATABASES = {
+    CACHE_DIR = Path(os.environ.get("CACHE_DIR", BASE_DIR / ".cache"))
+    CACHES = {
         "default": {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "db.sqlite3",
-        }
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_DIR,
+            "OPTIONS": {"MAX_ENTRIES": 20000},
+        },
+        # A few dozen keys at most, far below MAX_ENTRIES
+        "generations": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_DIR / "generations",
+            "OPTIONS": {"MAX_ENTRIES": 1000},
+        },
     }
 
 # ======================
@@ -132,9 +158,49 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / "staticfiles"
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# collectstatic writes content-hashed copies with gzip and Brotli variants;
+# WhiteNoise serves hashed files with far-future, immutable cache headers.
+# Self-hosted Tailwind CSS and Chart.js are built with `build_assets`,
+# which collectstatic runs first when they are missing.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
 
 # ======================
 # Misc
 # ======================
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Exam writes queue points/standings recalculation for `run_recalc_worker`
+# (the worker process in the Procfile). Without a worker, set
+# RECALC_QUEUE_SYNC=true to process the queue right after each committed
+# write instead; this is the default when DEBUG is on (runserver).
+RECALC_QUEUE_SYNC = os.environ.get("RECALC_QUEUE_SYNC", str(DEBUG)).lower() == "true"
+
+# Warm caches and compiled state in a background thread when the app starts
+# (see marks/warmup.py). Enable it for web processes that do not warm up
+# through gunicorn.conf.py.
+WARM_CACHES_ON_STARTUP = os.environ.get("WARM_CACHES_ON_STARTUP", "False").lower() == "true"
+
+# ======================
+# Profiling
+# ======================
+# Staff add ?_profile=1 to a page, or run `manage.py profile_view <url>`
+# (see marks/profiling.py); profiles are written to PROFILE_DIR
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", BASE_DIR / "profiles"))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.001"))
+
+# ======================
+# Logging
+# ======================
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "marks": {"handlers": ["console"], "level": os.environ.get("MARKS_LOG_LEVEL", "INFO")},
+    },
+}
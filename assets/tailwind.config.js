@@ -0,0 +1,14 @@
+// Tailwind build for python manage.py build_assets (see marks/assets.py).
+// Only classes found in these files end up in static/css/tailwind.min.css,
+// including class names built in inline scripts.
+module.exports = {
+  content: [
+    './templates/**/*.html',
+    './marks/templates/**/*.html',
+    './static/js/**/*.js',
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings for ResTrack (picked up from the working directory).
+
+Every worker warms its caches and compiled state before it accepts its
+first request (see marks/warmup.py), so restarts and deploys do not hand
+cold paths to real users.
+"""
+import os
+
+wsgi_app = 'ResTrack.wsgi:application'
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+
+
+def post_worker_init(worker):
+    # Runs in the worker once the WSGI application (and Django) is loaded
+    from marks import warmup
+    warmup.warm()
@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Student, Subject, ExamType, Exam, GradeScale, LifetimePoints, PointsSpent
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from .models import (
+    Student, Subject, ExamType, Exam, GradeScale, GradeThreshold, LifetimePoints, PointsSpent, SubjectStanding,
+    PointsLedgerEntry, PointsCheckpoint, RecalcJob, ExamRollup, RankingSnapshot,
+)
 
 
 @admin.register(Student)
@@ -10,12 +15,42 @@ class StudentAdmin(admin.ModelAdmin):
     fields = ['name', 'roll', 'class_name']
     list_display_links = ['class_name']
     list_editable = ['name', 'roll']
+    
+    def get_queryset(self, request):
+        # Totals for the whole page in one grouped query instead of three per row
+        return super().get_queryset(request).annotate(
+            marks_obtained=Coalesce(Sum('exam__mark_obtained'), 0),
+            marks_possible=Coalesce(Sum('exam__total_marks'), 0),
+            exam_count=Count('exam__exam_id', distinct=True),
+        )
+    
+    @admin.display(description='Total marks', ordering='marks_obtained')
+    def total_marks(self, obj):
+        return obj.marks_obtained
+    
+    @admin.display(description='Total exams', ordering='exam_count')
+    def total_exams(self, obj):
+        return obj.exam_count
+    
+    @admin.display(description='Average percentage')
+    def average_percentage(self, obj):
+        return (obj.marks_obtained * 100 / obj.marks_possible) if obj.marks_possible > 0 else 0
 
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
     list_display = ['name', 'average_marks']
     search_fields = ['name']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            marks_obtained=Coalesce(Sum('exam__mark_obtained'), 0),
+            marks_possible=Coalesce(Sum('exam__total_marks'), 0),
+        )
+    
+    @admin.display(description='Average marks')
+    def average_marks(self, obj):
+        return (obj.marks_obtained * 100 / obj.marks_possible) if obj.marks_possible > 0 else 0
 
 
 @admin.register(ExamType)
@@ -36,38 +71,12 @@ class ExamAdmin(admin.ModelAdmin):
     fields = ['student', 'subject', 'exam_type', 'date', 'chapter', 'class_number', 'total_marks', 'mark_obtained', 'group_id', 'exam_id']
     list_editable = ['mark_obtained', 'total_marks']
     
+    @admin.display(ordering='stored_percentage')
     def percentage(self, obj):
         return f"{obj.percentage}%"
     
     def grade(self, obj):
         return obj.grade
-    
-    def save_model(self, request, obj, form, change):
-        """Override save to recalculate points when exam is edited"""
-        super().save_model(request, obj, form, change)
-        # Recalculate points for the student
-        obj.student.recalculate_lifetime_points()
-    
-    def delete_model(self, request, obj):
-        """Override delete to recalculate points when exam is deleted"""
-        student = obj.student
-        super().delete_model(request, obj)
-        student.recalculate_lifetime_points()
-    
-    def delete_queryset(self, request, queryset):
-        """Override bulk delete to recalculate points for affected students"""
-        # Get all affected students before deletion
-        students = set(queryset.values_list('student', flat=True))
-        # Delete the records
-        super().delete_queryset(request, queryset)
-        # Recalculate points for affected students
-        from .models import Student
-        for student_id in students:
-            try:
-                student = Student.objects.get(id=student_id)
-                student.recalculate_lifetime_points()
-            except Student.DoesNotExist:
-                pass
 
 
 @admin.register(GradeScale)
@@ -76,10 +85,20 @@ class GradeScaleAdmin(admin.ModelAdmin):
     ordering = ['grade_name']
 
 
+@admin.register(GradeThreshold)
+class GradeThresholdAdmin(admin.ModelAdmin):
+    list_display = ['exam_type_name', 'grade', 'min_percentage']
+    list_filter = ['exam_type_name']
+    list_editable = ['min_percentage']
+    list_select_related = ['grade']
+
+
 @admin.register(LifetimePoints)
 class LifetimePointsAdmin(admin.ModelAdmin):
     list_display = ['student', 'points_earned', 'points_spent', 'points_remaining']
     search_fields = ['student__name']
+    # Totals are a projection of the points ledger and are not edited directly
+    readonly_fields = ['points_earned', 'points_spent', 'bonus_points', 'ledger_sequence']
     
     def points_remaining(self, obj):
         return obj.points_remaining
@@ -95,20 +114,98 @@ class PointsSpentAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
     
     def delete_queryset(self, request, queryset):
-        """Override bulk delete to update student points"""
-        from django.db.models import Sum
-        # Get all affected students
-        students = set(queryset.values_list('student', flat=True))
-        # Delete the records
-        super().delete_queryset(request, queryset)
-        # Update points for affected students
-        for student_id in students:
-            try:
-                lifetime_points = LifetimePoints.objects.get(student_id=student_id)
-                total_spent = PointsSpent.objects.filter(student_id=student_id).aggregate(
-                    total=Sum('points_spent')
-                )['total'] or 0
-                lifetime_points.points_spent = total_spent
-                lifetime_points.save()
-            except LifetimePoints.DoesNotExist:
-                pass
+        """Override bulk delete so every deleted record is reversed in the points ledger"""
+        for record in queryset:
+            record.delete()
+
+
+@admin.register(PointsLedgerEntry)
+class PointsLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'sequence', 'kind', 'amount', 'balance_after', 'description', 'created_at']
+    list_filter = ['kind', 'student']
+    search_fields = ['student__name', 'description']
+    date_hierarchy = 'created_at'
+    list_select_related = ['student']
+    
+    # The ledger is append-only
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PointsCheckpoint)
+class PointsCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['student', 'sequence', 'points_earned', 'points_spent', 'created_at']
+    list_filter = ['student']
+    list_select_related = ['student']
+
+
+@admin.register(SubjectStanding)
+class SubjectStandingAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'class_number', 'rank', 'student', 'average_percentage', 'total_marks_obtained', 'exam_count']
+    list_filter = ['subject', 'class_number']
+    search_fields = ['student__name', 'subject__name']
+    list_select_related = ['student', 'subject']
+    ordering = ['subject', 'class_number', 'rank']
+
+
+@admin.register(ExamRollup)
+class ExamRollupAdmin(admin.ModelAdmin):
+    list_display = ['month', 'class_number', 'subject', 'exam_type', 'student', 'marks_obtained', 'marks_possible', 'exam_count', 'points']
+    list_filter = ['class_number', 'subject', 'exam_type']
+    search_fields = ['student__name', 'subject__name']
+    list_select_related = ['student', 'subject', 'exam_type']
+    ordering = ['-month', 'class_number', 'subject']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RankingSnapshot)
+class RankingSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['as_of', 'period', 'class_number', 'rank', 'student', 'cohort_size', 'average_percentage', 'points']
+    list_filter = ['period', 'class_number']
+    search_fields = ['student__name']
+    list_select_related = ['student']
+    date_hierarchy = 'as_of'
+    ordering = ['-as_of', 'class_number', 'rank']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RecalcJob)
+class RecalcJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'key', 'created_at', 'age']
+    list_filter = ['kind']
+    ordering = ['created_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def age(self, obj):
+        from django.utils import timezone
+        return f"{(timezone.now() - obj.created_at).total_seconds():.0f}s"
+    age.short_description = 'Waiting'
+    
+    def changelist_view(self, request, extra_context=None):
+        """Show queue depth and lag above the pending jobs"""
+        from .services import RecalcQueueService
+        stats = RecalcQueueService.stats()
+        extra_context = extra_context or {}
+        extra_context['title'] = f"Recalculation queue: {stats['depth']} pending, lag {stats['lag_seconds']}s"
+        return super().changelist_view(request, extra_context=extra_context)
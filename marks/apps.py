@@ -1,4 +1,6 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core import checks
 
 
 class MarksConfig(AppConfig):
@@ -7,3 +9,12 @@ class MarksConfig(AppConfig):
 
     def ready(self):
         import marks.signals
+        from marks import assets
+
+        checks.register(assets.check_built)
+
+        if settings.WARM_CACHES_ON_STARTUP:
+            # Off the startup path: the database is not queried during app loading
+            import threading
+            from marks import warmup
+            threading.Thread(target=warmup.warm, name='marks-warmup', daemon=True).start()
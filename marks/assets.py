@@ -0,0 +1,102 @@
+"""
+Self-hosted front-end assets.
+
+Pages use a purged, minified Tailwind stylesheet built from the templates
+and a pinned copy of Chart.js, both served from `static/` through WhiteNoise
+(hashed names, gzip/Brotli variants, far-future cache headers). They are
+built by `python manage.py build_assets` (needs Node.js for the Tailwind
+CLI and network access), which collectstatic runs first for any asset that
+is missing, so a deploy fails when they cannot be built.
+
+Pages never fall back to a CDN: a missing asset has no entry in the
+static files manifest, and the marks.W001 system check reports it.
+"""
+import subprocess
+import urllib.request
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core import checks
+
+TAILWIND_VERSION = '3.4.17'
+CHART_JS_VERSION = '4.4.1'
+
+# Build inputs (relative to BASE_DIR); the config lists the scanned templates
+TAILWIND_CONFIG = 'assets/tailwind.config.js'
+TAILWIND_INPUT = 'assets/tailwind.css'
+
+# Static paths of the built assets
+TAILWIND_CSS = 'css/tailwind.min.css'
+CHART_JS = 'vendor/chart.umd.js'
+
+CHART_JS_URL = f'https://cdn.jsdelivr.net/npm/chart.js@{CHART_JS_VERSION}/dist/chart.umd.js'
+
+
+class AssetBuildError(Exception):
+    """Raised when an asset cannot be built or downloaded"""
+
+
+def is_built(path):
+    """Whether a built asset exists in the static directories"""
+    return finders.find(path) is not None
+
+
+def missing():
+    """Static paths of the assets that have not been built"""
+    return [path for path in (TAILWIND_CSS, CHART_JS) if not is_built(path)]
+
+
+def static_dir():
+    return settings.BASE_DIR / 'static'
+
+
+def build_tailwind():
+    """
+    Compile the purged, minified Tailwind stylesheet with the pinned CLI.
+
+    Returns:
+        Path: The written stylesheet
+    """
+    output = static_dir() / TAILWIND_CSS
+    command = [
+        'npx', '--yes', f'tailwindcss@{TAILWIND_VERSION}',
+        '--config', TAILWIND_CONFIG,
+        '--input', TAILWIND_INPUT,
+        '--output', str(output),
+        '--minify',
+    ]
+    try:
+        subprocess.run(command, cwd=settings.BASE_DIR, check=True)
+    except (OSError, subprocess.CalledProcessError) as error:
+        raise AssetBuildError(f'Tailwind build failed: {error}') from error
+    return output
+
+
+def vendor_chart_js(timeout=30):
+    """
+    Download the pinned Chart.js bundle into static/.
+
+    Returns:
+        Path: The written bundle
+    """
+    output = static_dir() / CHART_JS
+    try:
+        with urllib.request.urlopen(CHART_JS_URL, timeout=timeout) as response:
+            content = response.read()
+    except OSError as error:
+        raise AssetBuildError(f'Could not download {CHART_JS_URL}: {error}') from error
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(content)
+    return output
+
+
+def check_built(app_configs, **kwargs):
+    """Warn about assets the pages link to but that have not been built"""
+    return [
+        checks.Warning(
+            f'The front-end asset {path} has not been built, so pages render unstyled or without charts.',
+            hint='Run `python manage.py build_assets` (collectstatic runs it for missing assets).',
+            id='marks.W001',
+        )
+        for path in missing()
+    ]
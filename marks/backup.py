@@ -0,0 +1,367 @@
+"""
+Compact backup archives and fast restore.
+
+An archive is a zip file (deflate compressed) holding a manifest.json plus
+one member per model. Each member is JSON lines, and every line is one
+column-oriented chunk of up to CHUNK_SIZE rows:
+
+    {"id": [1, 2], "name": ["Zahin", "Zabib"], ...}
+
+Rows are streamed from the database chunk by chunk, so neither writing nor
+restoring holds a whole table in memory.
+
+Only source data is archived. Restore bulk-inserts it (no model signals
+run, so there is no per-row exam id assignment or points recalculation)
+and then rebuilds every derived table in one pass (see rebuild_derived).
+"""
+from contextlib import contextmanager
+from datetime import date, datetime
+import json
+import zipfile
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from . import grading, search
+from .search import normalize_name
+
+FORMAT = 'restrack-backup'
+VERSION = 1
+CHUNK_SIZE = 2000
+MANIFEST = 'manifest.json'
+
+# Source tables in dependency order (parents first)
+BACKUP_MODELS = [
+    'marks.Student',
+    'marks.Subject',
+    'marks.ExamType',
+    'marks.GradeScale',
+    'marks.GradeThreshold',
+    'marks.Exam',
+    'marks.PointsSpent',
+    'marks.PointsLedgerEntry',
+    'marks.PointsCheckpoint',
+    'marks.RankingSnapshot',
+]
+
+# Seeded with the default policy by migrations, so replaced (when the
+# archive has rows for them) rather than merged into a fresh database
+GRADING_MODELS = ['marks.GradeScale', 'marks.GradeThreshold']
+
+# Tables rebuilt from the source tables after a restore
+DERIVED_MODELS = [
+    'marks.LifetimePoints',
+    'marks.SubjectStanding',
+    'marks.ExamRollup',
+    'marks.RecalcJob',
+]
+
+
+class BackupError(Exception):
+    """The archive or fixture cannot be restored"""
+
+
+def _models(labels):
+    return [apps.get_model(label) for label in labels]
+
+
+def _stored_fields(model):
+    """Concrete fields holding archived data (generated columns are recomputed by the database)"""
+    return [field for field in model._meta.concrete_fields if not field.generated]
+
+
+def _columns(model):
+    """Concrete column attribute names of a model (e.g. 'student_id')"""
+    return [field.attname for field in _stored_fields(model)]
+
+
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'Cannot archive {type(value).__name__} values')
+
+
+def write_archive(path, chunk_size=CHUNK_SIZE):
+    """
+    Write every source table to a backup archive.
+
+    Returns:
+        dict: Model label mapped to the number of rows written
+    """
+    counts, members = {}, []
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for model in _models(BACKUP_MODELS):
+            label = model._meta.label_lower
+            columns = _columns(model)
+            member = f'{label}.jsonl'
+            rows = model.objects.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+            count = 0
+            with archive.open(member, 'w') as stream:
+                chunk = []
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) == chunk_size:
+                        count += _write_chunk(stream, columns, chunk)
+                        chunk = []
+                if chunk:
+                    count += _write_chunk(stream, columns, chunk)
+            counts[label] = count
+            members.append({'model': label, 'member': member, 'columns': columns, 'rows': count})
+
+        archive.writestr(MANIFEST, json.dumps({
+            'format': FORMAT,
+            'version': VERSION,
+            'created_at': timezone.now().isoformat(),
+            'models': members,
+        }, indent=2))
+    return counts
+
+
+def _write_chunk(stream, columns, rows):
+    chunk = dict(zip(columns, (list(values) for values in zip(*rows))))
+    stream.write(json.dumps(chunk, default=_encode, separators=(',', ':')).encode())
+    stream.write(b'\n')
+    return len(rows)
+
+
+def read_manifest(path):
+    """Manifest of a backup archive (raises BackupError if it is not one)"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read(MANIFEST))
+    except (zipfile.BadZipFile, KeyError, ValueError) as error:
+        raise BackupError(f'{path} is not a backup archive: {error}')
+    if manifest.get('format') != FORMAT or manifest.get('version') != VERSION:
+        raise BackupError(f"Unsupported archive format {manifest.get('format')} v{manifest.get('version')}")
+    return manifest
+
+
+def _archive_batches(path):
+    """Yield (model, list of unsaved instances) per chunk of an archive"""
+    manifest = read_manifest(path)
+    with zipfile.ZipFile(path) as archive:
+        for entry in manifest['models']:
+            try:
+                model = apps.get_model(entry['model'])
+            except LookupError:
+                continue
+            fields = {field.attname: field for field in _stored_fields(model)}
+            with archive.open(entry['member']) as stream:
+                for line in stream:
+                    chunk = json.loads(line)
+                    # Columns the current schema no longer has are dropped;
+                    # new columns keep their defaults
+                    columns = [(name, fields[name]) for name in chunk if name in fields]
+                    values = [
+                        [field.to_python(value) if value is not None else None for value in chunk[name]]
+                        for name, field in columns
+                    ]
+                    names = [name for name, _ in columns]
+                    yield model, [model(**dict(zip(names, row))) for row in zip(*values)]
+
+
+def _fixture_batches(path):
+    """Yield (model, list of unsaved instances) from a Django JSON fixture"""
+    wanted = {model._meta.label_lower: model for model in _models(BACKUP_MODELS)}
+    try:
+        with open(path, encoding='utf-8') as stream:
+            items = json.load(stream)
+        # Other apps may reference rows this database does not have
+        # (e.g. admin log users), so only marks objects are deserialized
+        objects = [item.object for item in serializers.deserialize(
+            'python', [item for item in items if item.get('model') in wanted], ignorenonexistent=True
+        )]
+    except (OSError, ValueError, serializers.base.DeserializationError) as error:
+        raise BackupError(f'Cannot read {path}: {error}')
+    for model in wanted.values():
+        batch = [obj for obj in objects if type(obj) is model]
+        if batch:
+            yield model, batch
+    skipped = len(items) - len(objects)
+    if skipped:
+        yield None, skipped
+
+
+def _timestamp_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+
+
+def _prepare(model, objects):
+    """Fill in what model save() methods and pre_save signals would have set"""
+    if any(field.name == 'name_normalized' for field in model._meta.concrete_fields):
+        for obj in objects:
+            obj.name_normalized = normalize_name(obj.name)
+    for field in _timestamp_fields(model):
+        for obj in objects:
+            if getattr(obj, field.attname) is None:
+                field.pre_save(obj, True)
+    if model._meta.label == 'marks.Exam':
+        _assign_missing_exam_ids(objects)
+
+
+@contextmanager
+def _keep_timestamps(model):
+    """Stop bulk_create from stamping auto_now(_add) fields with the current time"""
+    fields = [(field, field.auto_now, field.auto_now_add) for field in _timestamp_fields(model)]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _assign_missing_exam_ids(exams):
+    """Give exams without an exam_id one, shared per bulk entry group (as assign_exam_id does)"""
+    missing = [exam for exam in exams if exam.exam_id is None]
+    if not missing:
+        return
+    next_id = max(
+        [exam.exam_id for exam in exams if exam.exam_id is not None]
+        + [apps.get_model('marks.Exam').objects.aggregate(latest=Max('exam_id'))['latest'] or 0]
+    )
+    groups = {}
+    for exam in missing:
+        if exam.group_id and exam.group_id in groups:
+            exam.exam_id = groups[exam.group_id]
+            continue
+        next_id += 1
+        exam.exam_id = next_id
+        if exam.group_id:
+            groups[exam.group_id] = next_id
+
+
+def flush(labels=None):
+    """Delete some (default: all source and derived) tables without sending signals"""
+    models = _models(labels if labels is not None else BACKUP_MODELS + DERIVED_MODELS)
+    tables = [model._meta.db_table for model in models]
+    connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, reset_sequences=True))
+
+
+def has_data():
+    """Whether any source table other than the grading policy holds rows"""
+    return any(
+        model.objects.exists()
+        for model in _models(BACKUP_MODELS) if model._meta.label not in GRADING_MODELS
+    )
+
+
+def restore(path, replace=False, batch_size=500):
+    """
+    Bulk-insert a backup archive (.zip) or Django JSON fixture into empty
+    tables, then rebuild the derived tables, all in one transaction.
+
+    Fixtures may contain objects of other apps; they are skipped (load
+    those with loaddata).
+
+    Args:
+        path: Archive or fixture path
+        replace: Flush the existing marks data first
+
+    Returns:
+        dict: Model label mapped to rows restored, plus 'skipped' objects
+    """
+    if zipfile.is_zipfile(path):
+        batches = _archive_batches(path)
+    else:
+        batches = _fixture_batches(path)
+
+    counts, restored = {'skipped': 0}, set()
+    with transaction.atomic():
+        if replace:
+            flush()
+        elif has_data():
+            raise BackupError('The database already has marks data')
+        for model, objects in batches:
+            if model is None:
+                counts['skipped'] += objects
+                continue
+            if model._meta.label in GRADING_MODELS and model not in restored:
+                # Thresholds point at grade scales
+                flush(GRADING_MODELS[GRADING_MODELS.index(model._meta.label):])
+            _prepare(model, objects)
+            with _keep_timestamps(model):
+                model.objects.bulk_create(objects, batch_size=batch_size)
+            restored.add(model)
+            counts[model._meta.label_lower] = counts.get(model._meta.label_lower, 0) + len(objects)
+
+        # Explicit primary keys leave sequences behind on some databases
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(restored)):
+                cursor.execute(sql)
+
+        rebuild_derived()
+    return counts
+
+
+def rebuild_derived():
+    """
+    Rebuild every derived table and cache from the source tables in one
+    pass (after a restore, or after loading fixtures with loaddata).
+
+    Returns:
+        dict: Number of lifetime points rows corrected by the points audit
+    """
+    from .models import LifetimePoints, PointsLedgerEntry, RecalcJob, Student, Subject
+    from .services import (
+        ClassAnalyticsService, ExamStatsService, PointsService, RollupService,
+        SnapshotService, StandingsService,
+    )
+
+    grading.invalidate(broadcast=False)
+    with transaction.atomic():
+        RecalcJob.objects.all().delete()
+
+        # Raw fixture saves skip Student.save() and Subject.save()
+        for model in (Student, Subject):
+            stale = [
+                obj for obj in model.objects.only('name', 'name_normalized').iterator()
+                if obj.name_normalized != normalize_name(obj.name)
+            ]
+            for obj in stale:
+                obj.name_normalized = normalize_name(obj.name)
+            model.objects.bulk_update(stale, ['name_normalized'], batch_size=500)
+
+        # LifetimePoints is the projection of the ledger
+        LifetimePoints.objects.all().delete()
+        totals = PointsLedgerEntry.objects.values('student_id').annotate(
+            earned=Sum('amount', filter=~Q(kind=PointsLedgerEntry.KIND_SPEND)),
+            bonus=Sum('amount', filter=Q(kind=PointsLedgerEntry.KIND_BONUS)),
+            spent=Sum('amount', filter=Q(kind=PointsLedgerEntry.KIND_SPEND)),
+            sequence=Max('sequence'),
+        ).order_by()
+        LifetimePoints.objects.bulk_create([
+            LifetimePoints(
+                student_id=row['student_id'],
+                points_earned=row['earned'] or 0,
+                bonus_points=row['bonus'] or 0,
+                points_spent=-(row['spent'] or 0),
+                ledger_sequence=row['sequence'] or 0,
+            )
+            for row in totals
+        ], batch_size=500)
+        LifetimePoints.provision_missing()
+
+        StandingsService.rebuild_all()
+        RollupService.rebuild_all()
+
+        # Archives without a ledger (old fixtures) are brought in line here
+        drift = PointsService.find_drift(PointsService.expected_points())
+        corrected = PointsService.repair(drift, description='Restored')
+        SnapshotService.close_months()
+
+        transaction.on_commit(grading.invalidate)
+        transaction.on_commit(ClassAnalyticsService.invalidate_all)
+        transaction.on_commit(lambda: search.invalidate('students'))
+        transaction.on_commit(lambda: search.invalidate('subjects'))
+        exam_ids = list(apps.get_model('marks.Exam').objects.values_list('exam_id', flat=True).distinct().order_by())
+        transaction.on_commit(lambda: ExamStatsService.invalidate(exam_ids))
+    return {'corrected': corrected}
@@ -0,0 +1,65 @@
+"""
+Cache helpers for derived statistics.
+
+Values are cached per object id under 'marks:<prefix>:<id>', fetched with a
+single get_many and computed in one batch for the ids that missed. Writes
+invalidate the affected ids (see signals.py) in the cache shared by every
+process (CACHES in settings.py); the timeout bounds staleness should an
+invalidation be lost.
+"""
+from django.core.cache import cache
+
+DEFAULT_TIMEOUT = 300
+
+
+def cache_key(prefix, object_id):
+    return f'marks:{prefix}:{object_id}'
+
+
+def get_many(prefix, object_ids, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Fetch cached values for many ids, computing the misses in one call.
+
+    Args:
+        prefix: Cache namespace, e.g. 'exam-stats'
+        object_ids: Ids to fetch
+        compute: Callable taking the list of missing ids and returning a dict
+            of id to value (ids it leaves out are not cached)
+        timeout: Cache timeout in seconds
+
+    Returns:
+        dict: Id mapped to value for every id that has one
+    """
+    keys = {cache_key(prefix, object_id): object_id for object_id in dict.fromkeys(object_ids)}
+    if not keys:
+        return {}
+    values = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = [object_id for object_id in keys.values() if object_id not in values]
+    if missing:
+        computed = compute(missing)
+        cache.set_many({cache_key(prefix, object_id): value for object_id, value in computed.items()}, timeout)
+        values.update(computed)
+    return values
+
+
+def delete_many(prefix, object_ids):
+    """Invalidate the cached values of some ids (None ids are ignored)"""
+    cache.delete_many([cache_key(prefix, object_id) for object_id in set(object_ids) if object_id is not None])
+
+
+def get_or_compute(prefix, object_id, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Fetch one cached value, computing and caching it on a miss.
+
+    Args:
+        prefix: Cache namespace
+        object_id: Id of the value within the namespace
+        compute: Callable without arguments returning the value (not None)
+        timeout: Cache timeout in seconds
+    """
+    key = cache_key(prefix, object_id)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
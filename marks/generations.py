@@ -0,0 +1,53 @@
+"""
+Generation tokens shared by every process.
+
+Processes keep data compiled or cached from the database (grading
+policies, typeahead tries, class analytics) together with the generation
+it was built at, and rebuild it when the stored generation changes.
+
+A bump stores a fresh random token rather than incrementing a counter, so
+concurrent bumps, a lost key or a cleared cache can never hand out a
+generation that was seen before; at worst something is rebuilt once more.
+Tokens live in their own cache (CACHES['generations'] in settings.py), so
+culling and clearing the cached values never touch them.
+"""
+import secrets
+
+from django.core.cache import caches
+
+CACHE_ALIAS = 'generations'
+
+
+def _new_token():
+    return secrets.token_hex(8)
+
+
+def get(key):
+    """Current token of a key (see get_many)"""
+    return get_many([key])[key]
+
+
+def get_many(keys):
+    """
+    Current tokens of some keys in one cache round trip.
+
+    Keys without a token get a fresh one, so a lost token is replaced by a
+    new generation instead of an old one.
+
+    Returns:
+        dict: Key mapped to its token
+    """
+    cache = caches[CACHE_ALIAS]
+    tokens = cache.get_many(keys)
+    for key in keys:
+        if key not in tokens:
+            token = _new_token()
+            cache.add(key, token, None)
+            # Another process may have added its token first
+            tokens[key] = cache.get(key, token)
+    return tokens
+
+
+def bump(key):
+    """Start a new generation, in every process"""
+    caches[CACHE_ALIAS].set(key, _new_token(), None)
@@ -0,0 +1,223 @@
+"""
+Grading policy registry.
+
+Grades, grade colours and exam points are defined per exam type by
+GradeThreshold rows (minimum percentage per grade) and GradeScale rows
+(points and colour per grade). Both tables are compiled once per process
+into sorted cutoff tables, so every lookup afterwards is a bisect with no
+database queries.
+
+The compiled registry is dropped when GradeScale, GradeThreshold or
+ExamType change (see signals.py). Other processes notice the change through
+a shared generation token (see generations.py), checked once per request
+and once per recalculation batch.
+"""
+from bisect import bisect_right
+from collections import Counter
+import threading
+
+from django.db import DatabaseError
+
+from . import generations
+
+# Exam types without a policy of their own are graded like CQ
+DEFAULT_EXAM_TYPE = 'CQ'
+
+# Built-in policy, used until the grading tables are seeded
+DEFAULT_THRESHOLDS = {
+    'CQ': {'Superb': 85, 'Good': 70, 'Average': 50, 'Poor': 33, 'Fail': 20, 'Horrible': 0},
+    'MCQ': {'Superb': 93, 'Good': 77, 'Average': 55, 'Poor': 40, 'Fail': 30, 'Horrible': 0},
+}
+
+DEFAULT_GRADE_POINTS = {
+    'Superb': 20,
+    'Good': 15,
+    'Average': 0,
+    'Poor': -10,
+    'Fail': -15,
+    'Horrible': -20,
+}
+
+DEFAULT_GRADE_COLORS = {
+    'Superb': '#A7F3D0',    # Emerald-200 (darker green)
+    'Good': '#D1FAE5',      # Green-100 (lighter green)
+    'Average': '#FEF08A',   # Yellow-200 (very light yellow)
+    'Poor': '#FDE68A',      # Amber-200 (very light amber)
+    'Fail': '#FECACA',      # Red-200 (very light red)
+    'Horrible': '#FCA5A5',  # Red-300 (light red)
+}
+
+UNKNOWN_GRADE_COLOR = '#000000'
+
+GENERATION_CACHE_KEY = 'marks:grading:generation'
+
+
+def normalize_exam_type(name):
+    """Policy key for an exam type name (case and surrounding spaces ignored)"""
+    return (name or '').upper().strip()
+
+
+class GradingPolicy:
+    """
+    Compiled grading policy of one exam type.
+
+    cutoffs holds the minimum percentage of every grade in ascending order,
+    with grades/points at the same positions.
+    """
+
+    def __init__(self, exam_type_name, thresholds, grade_points):
+        self.exam_type_name = exam_type_name
+        ordered = sorted(thresholds.items(), key=lambda item: item[1])
+        self.cutoffs = [minimum for _, minimum in ordered]
+        self.grades = [grade for grade, _ in ordered]
+        self.points = [grade_points.get(grade, 0) for grade in self.grades]
+
+    def _index(self, percentage):
+        # Scores below the lowest cutoff still get the lowest grade
+        return max(bisect_right(self.cutoffs, percentage) - 1, 0)
+
+    def grade_for(self, percentage):
+        """Grade name for a percentage score"""
+        return self.grades[self._index(percentage)]
+
+    def points_for(self, percentage):
+        """Points earned for a percentage score (can be negative)"""
+        return self.points[self._index(percentage)]
+
+    def grades_for(self, percentages):
+        """Grade names for many percentage scores"""
+        grades, index = self.grades, self._index
+        return [grades[index(percentage)] for percentage in percentages]
+
+    def __repr__(self):
+        return f"GradingPolicy({self.exam_type_name!r}, {dict(zip(self.grades, self.cutoffs))})"
+
+
+class GradingRegistry:
+    """All compiled policies plus grade colours and exam type names"""
+
+    def __init__(self, thresholds, grade_points, grade_colors, exam_type_names, generation=None):
+        self.policies = {
+            name: GradingPolicy(name, grades, grade_points)
+            for name, grades in thresholds.items()
+        }
+        if DEFAULT_EXAM_TYPE not in self.policies:
+            self.policies[DEFAULT_EXAM_TYPE] = GradingPolicy(
+                DEFAULT_EXAM_TYPE, DEFAULT_THRESHOLDS[DEFAULT_EXAM_TYPE], grade_points
+            )
+        self.grade_colors = grade_colors
+        self.exam_type_names = exam_type_names
+        self.generation = generation
+
+    def policy(self, exam_type_name):
+        """Policy for an exam type name, falling back to the default policy"""
+        return self.policies.get(normalize_exam_type(exam_type_name), self.policies[DEFAULT_EXAM_TYPE])
+
+    def policy_for_exam_type_id(self, exam_type_id):
+        """Policy for an ExamType primary key"""
+        return self.policy(self.exam_type_names.get(exam_type_id))
+
+    def color(self, grade_name):
+        """Display colour of a grade"""
+        return self.grade_colors.get(grade_name, UNKNOWN_GRADE_COLOR)
+
+
+def compile_registry(generation=None):
+    """
+    Build a GradingRegistry from the database.
+
+    Missing grading data falls back to the built-in policy, so grades keep
+    working on a fresh database before the grading tables are seeded.
+    """
+    from .models import ExamType, GradeScale, GradeThreshold
+
+    grade_points = dict(DEFAULT_GRADE_POINTS)
+    grade_colors = dict(DEFAULT_GRADE_COLORS)
+    thresholds = {}
+    exam_type_names = {}
+    try:
+        # The oldest row of a duplicated grade name wins
+        for grade_name, points, color_code in GradeScale.objects.order_by('-pk').values_list(
+            'grade_name', 'points', 'color_code'
+        ):
+            grade_points[grade_name] = points
+            grade_colors[grade_name] = color_code
+        for exam_type_name, grade_name, minimum in GradeThreshold.objects.values_list(
+            'exam_type_name', 'grade__grade_name', 'min_percentage'
+        ):
+            thresholds.setdefault(normalize_exam_type(exam_type_name), {})[grade_name] = minimum
+        exam_type_names = dict(ExamType.objects.values_list('id', 'name'))
+    except DatabaseError:
+        # Tables not migrated yet
+        pass
+
+    if not thresholds:
+        thresholds = DEFAULT_THRESHOLDS
+    return GradingRegistry(thresholds, grade_points, grade_colors, exam_type_names, generation)
+
+
+_registry = None
+_lock = threading.Lock()
+
+
+def get_registry():
+    """The compiled registry of this process (compiled on first use)"""
+    global _registry
+    registry = _registry
+    if registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = compile_registry(generations.get(GENERATION_CACHE_KEY))
+            registry = _registry
+    return registry
+
+
+def invalidate(broadcast=True):
+    """
+    Drop the compiled registry of this process.
+
+    Args:
+        broadcast: Also bump the shared generation so other processes recompile
+    """
+    global _registry
+    with _lock:
+        _registry = None
+    if broadcast:
+        generations.bump(GENERATION_CACHE_KEY)
+
+
+def check_generation():
+    """Recompile on the next lookup if another process changed the grading tables"""
+    registry = _registry
+    if registry is not None and generations.get(GENERATION_CACHE_KEY) != registry.generation:
+        invalidate(broadcast=False)
+
+
+def grade_for(exam_type_name, percentage):
+    return get_registry().policy(exam_type_name).grade_for(percentage)
+
+
+def points_for(exam_type_name, percentage):
+    return get_registry().policy(exam_type_name).points_for(percentage)
+
+
+def grade_color(grade_name):
+    return get_registry().color(grade_name)
+
+
+def grade_counts(rows):
+    """
+    Count grades for many exams.
+
+    Args:
+        rows: Iterable of (exam_type_id, mark_obtained, total_marks) tuples
+
+    Returns:
+        Counter: Grade names mapped to counts, in order of first appearance
+    """
+    registry = get_registry()
+    counts = Counter()
+    for exam_type_id, mark_obtained, total_marks in rows:
+        percentage = (mark_obtained / total_marks) * 100 if total_marks > 0 else 0
+        counts[registry.policy_for_exam_type_id(exam_type_id).grade_for(percentage)] += 1
+    return counts
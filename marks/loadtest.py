@@ -0,0 +1,372 @@
+"""
+Concurrent load generator.
+
+Virtual users replay a weighted mix of page views, chart API calls and
+mark entry forms against a running server over keep-alive HTTP/1.1
+connections (a minimal asyncio client, no extra dependencies). Each
+request's latency and status is recorded per endpoint and summarised as
+a JSON-serialisable report: throughput, p50/p95/p99 latency and error
+rate, so runs of different builds can be diffed.
+
+Run it with `python manage.py load_test`, which also starts the app under
+gunicorn or uvicorn. The POST endpoints write real exams and points
+spent (marked with LOAD_TEST_TAG), so point it at a copy of the data.
+"""
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from http.cookies import SimpleCookie
+from itertools import count
+from typing import Callable
+from urllib.parse import urlencode
+
+import numpy as np
+from django.db.models import Max
+from django.urls import reverse
+
+# Chapter of load-test exams and description of load-test points spent
+LOAD_TEST_TAG = 'load-test'
+
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Dataset:
+    """Existing rows the generated requests refer to"""
+    students: list
+    student_classes: dict
+    subjects: list
+    next_exam_id: Callable
+
+    @classmethod
+    def load(cls):
+        from .models import Exam, Student, Subject
+
+        student_classes = dict(
+            Exam.objects.values_list('student_id').annotate(class_number=Max('class_number'))
+        )
+        students = list(Student.objects.values_list('id', flat=True))
+        subjects = list(Subject.objects.values_list('id', flat=True))
+        if not students or not subjects:
+            raise ValueError('The load test needs at least one student and one subject')
+        last_exam_id = Exam.objects.aggregate(last=Max('exam_id'))['last'] or 0
+        return cls(students, student_classes, subjects, count(last_exam_id + 1).__next__)
+
+    def class_of(self, student_id):
+        return self.student_classes.get(student_id, 1)
+
+
+def exam_fields(data, rng, class_number):
+    return {
+        'subject': rng.choice(data.subjects),
+        'exam_type': rng.choice(['CQ', 'MCQ']),
+        'date': date.today().isoformat(),
+        'chapter': LOAD_TEST_TAG,
+        'class_number': class_number,
+        'total_marks': 100,
+        'exam_id': data.next_exam_id(),
+    }
+
+
+def add_exam_body(data, rng):
+    student = rng.choice(data.students)
+    return {
+        **exam_fields(data, rng, data.class_of(student)),
+        'student': student,
+        'mark_obtained': rng.randint(30, 100),
+    }
+
+
+def add_bulk_exam_body(data, rng, size=5):
+    students = rng.sample(data.students, min(size, len(data.students)))
+    body = {
+        **exam_fields(data, rng, data.class_of(students[0])),
+        'submit_exams': 'true',
+        'student_count': len(students),
+    }
+    for index, student in enumerate(students, start=1):
+        body[f'student_{index}'] = student
+        body[f'marks_{index}'] = rng.randint(30, 100)
+    return body
+
+
+def add_points_spent_body(data, rng):
+    return {'student': rng.choice(data.students), 'points_spent': 1, 'description': LOAD_TEST_TAG}
+
+
+@dataclass
+class Endpoint:
+    method: str
+    weight: int
+    path: Callable
+    body: Callable = None
+
+
+# Default mix: mostly students refreshing pages, some teachers entering marks
+ENDPOINTS = {
+    'dashboard': Endpoint('GET', 10, lambda data, rng: reverse('dashboard')),
+    'leaderboard': Endpoint('GET', 10, lambda data, rng: reverse('leaderboard')),
+    'student_detail': Endpoint(
+        'GET', 8, lambda data, rng: reverse('student_detail', args=[rng.choice(data.students)]),
+    ),
+    'marks_over_time': Endpoint(
+        'GET', 4, lambda data, rng: reverse('api_marks_over_time', args=[rng.choice(data.students)]),
+    ),
+    'subject_performance': Endpoint(
+        'GET', 4, lambda data, rng: reverse('api_subject_performance', args=[rng.choice(data.students)]),
+    ),
+    'grade_distribution': Endpoint(
+        'GET', 4, lambda data, rng: reverse('api_grade_distribution', args=[rng.choice(data.students)]),
+    ),
+    'student_comparison': Endpoint(
+        'GET', 2, lambda data, rng: reverse('api_student_comparison', args=[rng.choice(data.subjects)]),
+    ),
+    'overall_grade_distribution': Endpoint(
+        'GET', 2, lambda data, rng: reverse('api_overall_grade_distribution'),
+    ),
+    'add_exam': Endpoint('POST', 3, lambda data, rng: reverse('add_exam'), add_exam_body),
+    'add_bulk_exam': Endpoint('POST', 1, lambda data, rng: reverse('add_bulk_exams'), add_bulk_exam_body),
+    'add_points_spent': Endpoint(
+        'POST', 1, lambda data, rng: reverse('add_points_spent'), add_points_spent_body,
+    ),
+}
+
+
+def parse_mix(spec):
+    """
+    Endpoint weights from "name=weight,..." (unlisted endpoints are not requested).
+
+    Returns:
+        dict: Endpoint name -> weight
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f'Unknown endpoint {name!r} (choose from {", ".join(ENDPOINTS)})')
+        mix[name] = int(weight) if weight else ENDPOINTS[name].weight
+    if not any(mix.values()):
+        raise ValueError('The mix needs at least one endpoint with a positive weight')
+    return mix
+
+
+class HTTPConnection:
+    """A keep-alive HTTP/1.1 connection that reconnects when the server closes it"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = self.writer = None
+        self.cookies = {}
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, form=None):
+        """
+        Send one request; a connection the server closed while idle is retried once.
+
+        Returns:
+            int: The response status
+        """
+        reused = self.writer is not None
+        try:
+            return await asyncio.wait_for(self._request(method, path, form), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+        return await asyncio.wait_for(self._request(method, path, form), self.timeout)
+
+    async def _request(self, method, path, form):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        body = urlencode(form).encode() if form is not None else b''
+        headers = {
+            'Host': f'{self.host}:{self.port}',
+            'User-Agent': 'restrack-load-test',
+            'Content-Length': str(len(body)),
+        }
+        if form is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        head = ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        self.writer.write(f'{method} {path} HTTP/1.1\r\n{head}\r\n'.encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Server closed the connection')
+        status = int(status_line.split()[1])
+        response_headers = defaultdict(list)
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()].append(value.strip())
+
+        for cookie in response_headers['set-cookie']:
+            for name, morsel in SimpleCookie(cookie).items():
+                self.cookies[name] = morsel.value
+
+        if 'chunked' in ','.join(response_headers['transfer-encoding']).lower():
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        elif response_headers['content-length']:
+            await self.reader.readexactly(int(response_headers['content-length'][0]))
+        else:
+            await self.reader.read()
+            await self.close()
+
+        if 'close' in ','.join(response_headers['connection']).lower():
+            await self.close()
+        return status
+
+
+@dataclass
+class EndpointStats:
+    method: str
+    latencies: list = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+
+    def record(self, seconds, status):
+        self.latencies.append(seconds)
+        self.statuses[str(status)] += 1
+        # Redirects are successful form submissions
+        if not isinstance(status, int) or status >= 400:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        requests = len(self.latencies)
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'method': self.method,
+            'requests': requests,
+            'errors': self.errors,
+            'error_rate': round(self.errors / requests, 4) if requests else 0.0,
+            'throughput': round(requests / elapsed, 2),
+            'latency_ms': latency_summary(latencies),
+            'statuses': dict(sorted(self.statuses.items())),
+        }
+
+
+def latency_summary(latencies):
+    if not len(latencies):
+        return None
+    summary = {'mean': round(float(latencies.mean()), 2)}
+    for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+        summary[f'p{percentile}'] = round(float(value), 2)
+    summary['max'] = round(float(latencies.max()), 2)
+    return summary
+
+
+async def wait_until_ready(host, port, timeout, is_alive=lambda: True):
+    """Poll the dashboard until the server answers (workers warm up before serving)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not is_alive():
+            raise RuntimeError('The server exited during startup')
+        connection = HTTPConnection(host, port, timeout=max(1, deadline - time.monotonic()))
+        try:
+            await connection.request('GET', reverse('dashboard'))
+            return
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            await asyncio.sleep(0.25)
+        finally:
+            await connection.close()
+    raise RuntimeError(f'The server did not answer on {host}:{port} within {timeout}s')
+
+
+async def virtual_user(connection, data, mix, rng, stats, should_stop):
+    names, weights = list(mix), list(mix.values())
+    if any(ENDPOINTS[name].method == 'POST' and mix[name] for name in names):
+        # Forms need the CSRF cookie of an earlier page view (without it they fail with 403)
+        try:
+            await connection.request('GET', reverse('add_exam'))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            await connection.close()
+
+    while not should_stop():
+        name = rng.choices(names, weights)[0]
+        endpoint = ENDPOINTS[name]
+        path = endpoint.path(data, rng)
+        form = endpoint.body(data, rng) if endpoint.body else None
+        if form is not None:
+            form['csrfmiddlewaretoken'] = connection.cookies.get('csrftoken', '')
+
+        started = time.perf_counter()
+        try:
+            status = await connection.request(endpoint.method, path, form)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as error:
+            await connection.close()
+            status = type(error).__name__
+        stats[name].record(time.perf_counter() - started, status)
+
+
+async def run(host, port, data, mix, users=20, duration=30.0, requests=None, timeout=30.0, seed=None):
+    """
+    Replay the mix with concurrent virtual users until the duration ends or
+    the request budget is spent.
+
+    Args:
+        data: Dataset the generated requests refer to
+        mix: Endpoint name -> weight (see parse_mix)
+        users: Concurrent virtual users, each with its own connection and cookies
+        duration: Seconds to run (ignored when requests is given)
+        requests: Total requests to send
+        timeout: Seconds before a request counts as a TimeoutError
+
+    Returns:
+        dict: The report
+    """
+    stats = {name: EndpointStats(ENDPOINTS[name].method) for name in mix}
+    issued = count()
+    deadline = time.monotonic() + duration
+
+    def should_stop():
+        if requests is not None:
+            return next(issued) >= requests
+        return time.monotonic() >= deadline
+
+    seeds = random.Random(seed)
+    connections = [HTTPConnection(host, port, timeout) for _ in range(users)]
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            virtual_user(connection, data, mix, random.Random(seeds.random()), stats, should_stop)
+            for connection in connections
+        ))
+    finally:
+        elapsed = time.perf_counter() - started
+        for connection in connections:
+            await connection.close()
+
+    total = sum(len(endpoint.latencies) for endpoint in stats.values())
+    errors = sum(endpoint.errors for endpoint in stats.values())
+    latencies = np.concatenate([np.array(endpoint.latencies) for endpoint in stats.values()]) * 1000
+    return {
+        'users': users,
+        'elapsed': round(elapsed, 3),
+        'mix': mix,
+        'totals': {
+            'requests': total,
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'throughput': round(total / elapsed, 2),
+            'latency_ms': latency_summary(latencies),
+        },
+        'endpoints': {name: endpoint.summary(elapsed) for name, endpoint in stats.items()},
+    }
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from marks.models import Student
+from marks.services import PointsService
+
+
+class Command(BaseCommand):
+    help = 'Audit LifetimePoints against a full recompute and optionally repair drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Fix drifted rows (bulk update, recorded in the points ledger)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of exams fetched per chunk while streaming (default: 2000)',
+        )
+        parser.add_argument(
+            '--student',
+            type=int,
+            action='append',
+            dest='student_ids',
+            help='Only audit this student id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        
+        self.stdout.write(f'Recomputing lifetime points (chunk size {chunk_size})...')
+        expected = PointsService.expected_points(options['student_ids'], chunk_size=chunk_size)
+        drift = PointsService.find_drift(expected, chunk_size=chunk_size)
+        
+        self.stdout.write(f'Checked {len(expected)} students: {len(drift)} with drift')
+        if drift:
+            names = dict(
+                Student.objects.filter(id__in=[item['student_id'] for item in drift]).values_list('id', 'name')
+            )
+            for item in drift:
+                changes = []
+                for field, label in (('points_earned', 'earned'), ('bonus_points', 'bonus'), ('points_spent', 'spent')):
+                    stored, expected_value = item['stored'][field], item['expected'][field]
+                    if stored != expected_value:
+                        changes.append(f'{label} {stored} → {expected_value} ({expected_value - stored:+d})')
+                name = names.get(item['student_id'], '?')
+                self.stdout.write(f'  #{item["student_id"]:<6} {name:15} | ' + ' | '.join(changes))
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No drift found!'))
+        elif options['repair']:
+            repaired = PointsService.repair(drift)
+            self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} lifetime points record(s)!'))
+        else:
+            self.stdout.write(self.style.WARNING('Run again with --repair to fix the drift.'))
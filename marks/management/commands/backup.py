@@ -0,0 +1,26 @@
+import os
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from marks import backup
+
+
+class Command(BaseCommand):
+    help = 'Write a compressed, column-oriented backup archive of all marks data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            help='Archive to write (default: backup-<timestamp>.zip)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or f"backup-{timezone.now():%Y%m%d-%H%M%S}.zip"
+        counts = backup.write_archive(path)
+        for label, rows in counts.items():
+            self.stdout.write(f'{label}: {rows} rows')
+
+        size_kb = os.path.getsize(path) / 1024
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully wrote {sum(counts.values())} rows to {path} ({size_kb:.1f} KB)!')
+        )
@@ -0,0 +1,125 @@
+import sys
+import threading
+import time
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ResTrack.database import baseline_config
+
+DEFAULT_URLS = ['/', '/subjects/', '/leaderboard/', '/api/search/students/?q=a']
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure requests per second with Django\'s default database connections '
+        'and with the configured connection profile (pool, health checks, SQLite pragmas)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            action='append',
+            dest='urls',
+            help=f'Path to request, repeatable (default: {" ".join(DEFAULT_URLS)})',
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Requests per profile (default: 200)')
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent request threads (default: 4)')
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or DEFAULT_URLS
+        configured = dict(connections.settings['default'])
+        self.application = WSGIHandler()
+        self.host = options['host']
+
+        # Baseline first, so the database is left in the configured journal mode
+        profiles = [('baseline', baseline_config(configured)), ('profile', configured)]
+        results = []
+        try:
+            for name, config in profiles:
+                self.use_database(config)
+                # Warm caches and compiled state so only connection handling differs
+                for url in urls:
+                    self.request(url)
+                connections.close_all()
+                results.append((name, *self.run(urls, options['requests'], options['threads'])))
+        finally:
+            self.use_database(configured)
+
+        self.stdout.write(f'{options["requests"]} requests over {options["threads"]} threads: {" ".join(urls)}')
+        for name, elapsed, failures in results:
+            line = f'{name:>8}: {options["requests"] / elapsed:8.1f} req/s ({elapsed * 1000 / options["requests"]:.2f} ms/request)'
+            if failures:
+                self.stdout.write(self.style.WARNING(f'{line}, {failures} non-2xx responses'))
+            else:
+                self.stdout.write(line)
+
+        speedup = results[0][1] / results[1][1]
+        self.stdout.write(self.style.SUCCESS(f'Connection profile: {speedup:.2f}x the baseline throughput'))
+
+    def use_database(self, config):
+        """Close every open connection and point new ones at config"""
+        connections.close_all()
+        wrapper = connections['default']
+        if hasattr(wrapper, 'close_pool'):
+            wrapper.close_pool()
+        connections.settings['default'].clear()
+        connections.settings['default'].update(config)
+        del connections['default']
+
+    def request(self, url):
+        """Send one GET through the WSGI handler, with request_started/finished signals"""
+        parts = urlsplit(url)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': parts.path,
+            'QUERY_STRING': parts.query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': sys.stderr,
+        }
+        status = []
+        response = self.application(environ, lambda code, headers: status.append(code))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return status[0].startswith('2')
+
+    def run(self, urls, total, threads):
+        """
+        Send total requests, cycling through urls, from a number of threads.
+
+        Returns:
+            tuple: (elapsed seconds, non-2xx responses)
+        """
+        counter = iter(range(total))
+        lock = threading.Lock()
+        failures = []
+
+        def worker():
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    break
+                if not self.request(urls[index % len(urls)]):
+                    failures.append(index)
+            connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - started, len(failures)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from marks import assets
+
+
+class Command(BaseCommand):
+    help = 'Build the purged Tailwind stylesheet and vendor the pinned Chart.js bundle into static/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-css', action='store_true', help='Do not rebuild the Tailwind stylesheet')
+        parser.add_argument('--skip-js', action='store_true', help='Do not download Chart.js')
+
+    def handle(self, *args, **options):
+        try:
+            if not options['skip_css']:
+                self.stdout.write(f'Building Tailwind CSS {assets.TAILWIND_VERSION}...')
+                path = assets.build_tailwind()
+                self.stdout.write(f'  {path} ({path.stat().st_size // 1024} KiB)')
+            if not options['skip_js']:
+                self.stdout.write(f'Downloading Chart.js {assets.CHART_JS_VERSION}...')
+                path = assets.vendor_chart_js()
+                self.stdout.write(f'  {path} ({path.stat().st_size // 1024} KiB)')
+        except assets.AssetBuildError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            'Assets built. Run collectstatic to publish hashed, compressed copies.'
+        ))
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
-from marks.models import Student, Subject, ExamType, Exam, GradeScale
-from decimal import Decimal
+from marks import grading
+from marks.models import Student, Subject, Exam, GradeScale
 
 
 class Command(BaseCommand):
@@ -14,7 +14,7 @@ class Command(BaseCommand):
         # Check Exam Percentage Calculations
         self.stdout.write('\n1. EXAM PERCENTAGE CALCULATIONS:')
         self.stdout.write('-'*80)
-        exams = Exam.objects.all().order_by('date', 'student__name')
+        exams = Exam.objects.select_related('student', 'subject', 'exam_type').order_by('date', 'student__name')
         for exam in exams:
             calculated_percentage = (float(exam.mark_obtained) / float(exam.total_marks)) * 100
             model_percentage = float(exam.percentage)
@@ -102,15 +102,19 @@ class Command(BaseCommand):
         for gs in grade_scales:
             self.stdout.write(f'  {gs.grade_name:8}: +{gs.points} points (Color: {gs.color_code})')
         
+        self.stdout.write('\nGrading Policies:')
+        for policy in grading.get_registry().policies.values():
+            cutoffs = ', '.join(
+                f'{grade} >= {minimum:g}%' for grade, minimum in zip(reversed(policy.grades), reversed(policy.cutoffs))
+            )
+            self.stdout.write(f'  {policy.exam_type_name:8}: {cutoffs}')
+        
         self.stdout.write('\nGrade Assignments Check:')
         for exam in exams[:10]:  # Check first 10
             percentage = exam.percentage
             grade = exam.grade
             points = exam.points_earned
             
-            # Note: Grading is hardcoded in Exam.grade property, not in GradeScale table
-            # GradeScale table only stores colors for charts
-            
             self.stdout.write(
                 f'✓ {exam.student.name:10} | {exam.subject.name:12} | '
                 f'{percentage:6.2f}% → {grade:8} ({points:+d} points)'
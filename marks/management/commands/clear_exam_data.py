@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from marks.models import Student, Subject, ExamType, Exam, GradeScale, LifetimePoints
+from marks.models import Student, Subject, ExamType, Exam, GradeScale, LifetimePoints, RecalcJob
 
 
 class Command(BaseCommand):
@@ -44,6 +44,9 @@ class Command(BaseCommand):
         ExamType.objects.all().delete()
         self.stdout.write(self.style.SUCCESS(f'✓ Deleted {exam_type_count} exam types'))
         
+        # Nothing is left to recalculate
+        RecalcJob.objects.all().delete()
+        
         # Keep grade scales (these are configuration, not data)
         self.stdout.write(self.style.WARNING(f'\nℹ Grade scales kept intact (configuration data)'))
         
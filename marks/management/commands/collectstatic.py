@@ -0,0 +1,20 @@
+from django.contrib.staticfiles.management.commands import collectstatic
+from django.core.management import call_command
+from marks import assets
+
+
+class Command(collectstatic.Command):
+    help = collectstatic.Command.help + ' Builds the self-hosted front-end assets first if they are missing.'
+
+    def handle(self, **options):
+        # Pages link to the built assets only, so never publish without them
+        missing = assets.missing()
+        if missing:
+            call_command(
+                'build_assets',
+                skip_css=assets.TAILWIND_CSS not in missing,
+                skip_js=assets.CHART_JS not in missing,
+                stdout=self.stdout,
+                stderr=self.stderr,
+            )
+        return super().handle(**options)
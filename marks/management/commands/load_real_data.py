@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from marks.models import Student, Subject, ExamType, Exam, GradeScale, LifetimePoints
+from marks.services import RecalcQueueService
 from datetime import date
 
 
@@ -102,6 +103,10 @@ class Command(BaseCommand):
             exam_count += 1
         
         self.stdout.write(self.style.SUCCESS(f'Created {exam_count} exams'))
+        
+        # Calculate points and standings now rather than leaving it to the worker
+        processed = RecalcQueueService.process_all()
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} recalculation jobs'))
         self.stdout.write(self.style.SUCCESS('Real data loaded successfully!'))
         self.stdout.write('')
         self.stdout.write('Students: Zabib, Zahin, Showrob')
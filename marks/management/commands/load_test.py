@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from marks import loadtest
+
+SERVERS = {
+    'gunicorn': lambda host, port, workers: [
+        sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+        '--bind', f'{host}:{port}', '--workers', str(workers),
+    ],
+    'uvicorn': lambda host, port, workers: [
+        sys.executable, '-m', 'uvicorn', 'ResTrack.asgi:application',
+        '--host', host, '--port', str(port), '--workers', str(workers), '--no-access-log',
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the app under gunicorn or uvicorn and replay a mix of page views, chart API calls '
+        'and mark entry forms from concurrent users, reporting throughput, latency percentiles and '
+        'error rates per endpoint as JSON. POSTs write real exams and points spent: use a copy of the data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server',
+            choices=[*SERVERS, 'none'],
+            default='gunicorn',
+            help='Server to start, or "none" to test one already listening on --port (default: gunicorn)',
+        )
+        parser.add_argument('--host', default='127.0.0.1', help='Host to bind and connect to (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8765, help='Port to bind and connect to (default: 8765)')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes (default: 2)')
+        parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users (default: 20)')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run (default: 30)')
+        parser.add_argument('--requests', type=int, help='Stop after this many requests instead of --duration')
+        parser.add_argument(
+            '--mix',
+            help='Endpoint weights as name=weight,... (default: '
+                 + ','.join(f'{name}={endpoint.weight}' for name, endpoint in loadtest.ENDPOINTS.items()) + ')',
+        )
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request fails (default: 30)')
+        parser.add_argument('--startup-timeout', type=float, default=120, help='Seconds to wait for the server (default: 120)')
+        parser.add_argument('--seed', type=int, help='Random seed of the request sequence')
+        parser.add_argument('--label', help='Build label stored in the report, e.g. a commit hash')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix']) if options['mix'] else {
+                name: endpoint.weight for name, endpoint in loadtest.ENDPOINTS.items()
+            }
+            data = loadtest.Dataset.load()
+        except ValueError as error:
+            raise CommandError(error)
+
+        host, port = options['host'], options['port']
+        server = self.start_server(options['server'], host, port, options['workers'])
+        try:
+            report = asyncio.run(self.load(server, host, port, data, mix, options))
+        except RuntimeError as error:
+            raise CommandError(error)
+        finally:
+            self.stop_server(server)
+
+        report = {
+            'label': options['label'],
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'server': options['server'],
+            'workers': options['workers'] if server else None,
+            'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            **report,
+        }
+        content = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(content + '\n')
+        else:
+            self.stdout.write(content)
+
+        totals = report['totals']
+        message = (
+            f'{totals["requests"]} requests in {report["elapsed"]}s: {totals["throughput"]} req/s, '
+            f'{totals["error_rate"]:.2%} errors'
+        )
+        if totals['latency_ms']:
+            message += f', p95 {totals["latency_ms"]["p95"]} ms'
+        style = self.style.WARNING if totals['errors'] else self.style.SUCCESS
+        self.stderr.write(style(message))
+
+    async def load(self, server, host, port, data, mix, options):
+        await loadtest.wait_until_ready(
+            host, port, options['startup_timeout'],
+            is_alive=lambda: server is None or server.poll() is None,
+        )
+        return await loadtest.run(
+            host, port, data, mix,
+            users=options['users'],
+            duration=options['duration'],
+            requests=options['requests'],
+            timeout=options['timeout'],
+            seed=options['seed'],
+        )
+
+    def start_server(self, name, host, port, workers):
+        if name == 'none':
+            return None
+        command = SERVERS[name](host, port, workers)
+        if name == 'uvicorn':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError('uvicorn is not installed (pip install uvicorn)')
+        self.stderr.write(f'Starting {" ".join(command[1:])}')
+        # The server inherits DJANGO_SETTINGS_MODULE and the database settings
+        return subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=os.environ.copy(), stdout=subprocess.DEVNULL,
+        )
+
+    def stop_server(self, server):
+        if server is None:
+            return
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
@@ -0,0 +1,101 @@
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from marks import backup
+from marks.profiling import MODES, Profile
+
+# Keeps cached pages of the real database out of a --dataset run
+DATASET_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'profile-view-{alias}'}
+    for alias in ('default', 'generations')
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile a URL through the test client and write the profile to PROFILE_DIR: folded stacks '
+        '(flamegraph.pl, speedscope) with --mode sample, or a pstats file with --mode cprofile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Path to request, e.g. /leaderboard/?class_number=8')
+        parser.add_argument('--mode', choices=MODES, default='sample', help='Profiler to use (default: sample)')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help='Profiled requests, after one unprofiled warm-up request (default: 1)',
+        )
+        parser.add_argument('--output-dir', help='Write the profile here instead of PROFILE_DIR')
+        parser.add_argument(
+            '--dataset',
+            help='Backup archive or JSON fixture to restore into a throwaway test database and profile against',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        # The test client's host
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            with self.database(options['dataset']):
+                path, elapsed = self.profile(options)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Profiled {options['repeat']} request(s) to {options['url']} in {elapsed * 1000:.0f} ms: {path}"
+            )
+        )
+
+    @contextmanager
+    def database(self, dataset):
+        """Use the configured database, or a test database holding the dataset"""
+        if not dataset:
+            yield
+            return
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=DATASET_CACHES):
+                try:
+                    counts = backup.restore(dataset)
+                except (backup.BackupError, OSError) as error:
+                    raise CommandError(f'Could not restore {dataset}: {error}')
+                counts.pop('skipped')
+                self.stdout.write(f'Restored {sum(counts.values())} rows from {dataset}')
+                yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def profile(self, options):
+        """
+        Warm up, then request the URL under the profiler.
+
+        Returns:
+            tuple: (Path of the written profile, seconds spent in the profiled requests)
+        """
+        client = Client()
+        url = options['url']
+
+        response = client.get(url)
+        if response.status_code >= 500:
+            raise CommandError(
+                f'{url} returned {response.status_code}; '
+                'run collectstatic first if the static files manifest is missing'
+            )
+        if response.status_code >= 400:
+            raise CommandError(f'{url} returned {response.status_code}')
+
+        def requests():
+            for _ in range(options['repeat']):
+                client.get(url)
+
+        profile = Profile(options['mode'])
+        started = time.perf_counter()
+        profile.run(requests)
+        elapsed = time.perf_counter() - started
+        return profile.write(url, options['output_dir']), elapsed
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from marks.services import ClassAnalyticsService, RollupService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the exam rollup cube from all exam results'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding exam rollup...')
+        
+        rows = RollupService.rebuild_all()
+        ClassAnalyticsService.invalidate_all()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {rows} rollup rows!')
+        )
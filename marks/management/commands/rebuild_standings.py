@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from marks.models import SubjectStanding
+from marks.services import StandingsService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild precomputed subject standings from all exam results'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding subject standings...')
+        
+        StandingsService.rebuild_all()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {SubjectStanding.objects.count()} subject standings!')
+        )
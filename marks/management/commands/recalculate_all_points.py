@@ -1,18 +1,17 @@
 from django.core.management.base import BaseCommand
-from marks.models import Student
+from marks.services import PointsService
 
 
 class Command(BaseCommand):
-    help = 'Recalculate lifetime points for all students'
+    help = 'Recalculate lifetime points for all students (corrections are recorded in the points ledger)'
 
     def handle(self, *args, **options):
-        students = Student.objects.all()
-        count = students.count()
+        expected = PointsService.expected_points()
+        count = len(expected)
         
         self.stdout.write(f'Recalculating points for {count} students...')
+        corrected = PointsService.repair(PointsService.find_drift(expected), description='Recalculated')
         
-        for student in students:
-            student.recalculate_lifetime_points()
-            self.stdout.write(f'  ✓ {student.name}')
-        
-        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully recalculated points for {count} students!'))
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSuccessfully recalculated points for {count} students ({corrected} updated)!'
+        ))
@@ -1,19 +1,24 @@
 from django.core.management.base import BaseCommand
-from marks.models import Student
+from marks.models import LifetimePoints
+from marks.services import PointsService
 
 
 class Command(BaseCommand):
     help = 'Recalculate lifetime points for all students based on current exam results'
 
     def handle(self, *args, **options):
-        students = Student.objects.all()
+        expected = PointsService.expected_points()
+        drift = PointsService.find_drift(expected)
+        PointsService.repair(drift, description='Recalculated')
         
-        for student in students:
-            student.recalculate_lifetime_points()
+        totals = LifetimePoints.objects.filter(
+            student_id__in=[item['student_id'] for item in drift]
+        ).select_related('student')
+        for lifetime_points in totals:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Recalculated points for {student.name}: {student.lifetimepoints.total_points if hasattr(student, "lifetimepoints") else 0} points'
+                    f'Recalculated points for {lifetime_points.student.name}: {lifetime_points.total_points} points'
                 )
             )
         
-        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully recalculated lifetime points for {students.count()} students!'))
+        self.stdout.write(self.style.SUCCESS(f'\nSuccessfully recalculated lifetime points for {len(expected)} students!'))
@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from marks import backup
+from marks.models import GradeThreshold
+
+
+class Command(BaseCommand):
+    help = 'Restore a backup archive or JSON fixture with bulk inserts, then rebuild derived data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            help='Backup archive (.zip) or Django JSON fixture (e.g. data.json)',
+        )
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Delete all existing marks data first (required if there is any)',
+        )
+        parser.add_argument(
+            '--rebuild-only',
+            action='store_true',
+            help='Only rebuild derived tables and caches (e.g. after loaddata)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['rebuild_only']:
+            result = backup.rebuild_derived()
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt derived data ({result['corrected']} points totals corrected)!")
+            )
+            return
+
+        if not options['path']:
+            raise CommandError('Give the archive or fixture to restore (or --rebuild-only)')
+        if backup.has_data() and not options['flush']:
+            raise CommandError('The database already has marks data; use --flush to replace it')
+
+        try:
+            counts = backup.restore(options['path'], replace=options['flush'])
+        except backup.BackupError as error:
+            raise CommandError(str(error))
+
+        skipped = counts.pop('skipped')
+        for label, rows in counts.items():
+            self.stdout.write(f'{label}: {rows} rows')
+        if skipped:
+            self.stdout.write(f'Skipped {skipped} objects of other apps or derived tables (use loaddata for those)')
+
+        if not GradeThreshold.objects.exists():
+            self.stdout.write('No grading thresholds were restored; run setup_grades to seed the defaults')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully restored {sum(counts.values())} rows in {elapsed:.1f}s!')
+        )
@@ -0,0 +1,65 @@
+import time
+from django.core.management.base import BaseCommand
+from marks.services import RecalcQueueService
+
+
+class Command(BaseCommand):
+    help = 'Process queued points/standings recalculation jobs in coalesced batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling for new jobs',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Only report queue depth and lag',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Maximum number of jobs claimed per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.write_stats()
+            return
+
+        self.write_stats()
+        try:
+            while True:
+                started = time.perf_counter()
+                result = RecalcQueueService.process_batch(options['batch_size'])
+                if result is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.stdout.write(
+                    f"Processed {result['jobs']} jobs: {result['students']} students "
+                    f"({result['corrected']} updated), {result['months']} months, "
+                    f"{result['partitions']} standings partitions, {result['slices']} rollup slices, "
+                    f"{result['snapshots']} ranking snapshots in {elapsed_ms:.0f}ms"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker')
+
+        self.stdout.write(self.style.SUCCESS('Recalculation queue is empty'))
+
+    def write_stats(self):
+        stats = RecalcQueueService.stats()
+        by_kind = ', '.join(f'{kind}: {count}' for kind, count in sorted(stats['by_kind'].items()))
+        self.stdout.write(
+            f"Queue depth: {stats['depth']} ({by_kind or 'empty'}), lag: {stats['lag_seconds']}s"
+        )
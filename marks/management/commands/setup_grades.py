@@ -1,54 +1,36 @@
 from django.core.management.base import BaseCommand
-from marks.models import GradeScale
+from django.db import transaction
+from marks import grading
+from marks.models import GradeScale, GradeThreshold
 
 
 class Command(BaseCommand):
-    help = 'Setup default grade scales'
+    help = 'Setup default grade scales and CQ/MCQ grading policies'
 
     def handle(self, *args, **options):
-        # Clear existing grade scales
-        GradeScale.objects.all().delete()
-        
-        # Create default grade scales
-        # Note: These are for display/chart colors only. Actual grading logic
-        # is hardcoded in Exam model with different thresholds for CQ vs MCQ.
-        grade_scales = [
-            {
-                'grade_name': 'Superb',
-                'color_code': '#A7F3D0',  # Emerald-200 (darker green)
-                'points': 20
-            },
-            {
-                'grade_name': 'Good',
-                'color_code': '#D1FAE5',  # Green-100 (lighter green)
-                'points': 15
-            },
-            {
-                'grade_name': 'Average',
-                'color_code': '#FEF08A',  # Yellow-200 (very light yellow)
-                'points': 0
-            },
-            {
-                'grade_name': 'Poor',
-                'color_code': '#FDE68A',  # Amber-200 (very light amber)
-                'points': -10
-            },
-            {
-                'grade_name': 'Fail',
-                'color_code': '#FECACA',  # Red-200 (very light red)
-                'points': -15
-            },
-            {
-                'grade_name': 'Horrible',
-                'color_code': '#FCA5A5',  # Red-300 (light red)
-                'points': -20
-            },
-        ]
-        
-        for grade_data in grade_scales:
-            GradeScale.objects.create(**grade_data)
-            self.stdout.write(
-                self.style.SUCCESS(f'Created grade scale: {grade_data["grade_name"]}')
-            )
-        
+        # Grade points and colors are shared by every exam type; the minimum
+        # percentage of each grade is set per exam type (GradeThreshold).
+        with transaction.atomic():
+            grades = {}
+            for grade_name, points in grading.DEFAULT_GRADE_POINTS.items():
+                grade = GradeScale.objects.filter(grade_name=grade_name).order_by('pk').first() or GradeScale(grade_name=grade_name)
+                grade.color_code = grading.DEFAULT_GRADE_COLORS[grade_name]
+                grade.points = points
+                grade.save()
+                grades[grade_name] = grade
+                self.stdout.write(
+                    self.style.SUCCESS(f'Set up grade scale: {grade_name}')
+                )
+
+            for exam_type_name, thresholds in grading.DEFAULT_THRESHOLDS.items():
+                for grade_name, minimum in thresholds.items():
+                    GradeThreshold.objects.update_or_create(
+                        exam_type_name=exam_type_name,
+                        grade=grades[grade_name],
+                        defaults={'min_percentage': minimum},
+                    )
+                self.stdout.write(
+                    self.style.SUCCESS(f'Set up {exam_type_name} grading policy')
+                )
+
         self.stdout.write(self.style.SUCCESS('Successfully setup grade scales!'))
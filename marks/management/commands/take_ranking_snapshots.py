@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from marks.models import RankingSnapshot
+from marks.services import SnapshotService
+
+
+class Command(BaseCommand):
+    help = 'Take point-in-time ranking snapshots (run daily, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Snapshot the end of this day (YYYY-MM-DD, default: yesterday)',
+        )
+        parser.add_argument(
+            '--period',
+            choices=[RankingSnapshot.PERIOD_DAY, RankingSnapshot.PERIOD_MONTH],
+            default=RankingSnapshot.PERIOD_DAY,
+            help='Snapshot one day, or the month containing --date (default: day)',
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Retake the month snapshot of every closed month',
+        )
+
+    def handle(self, *args, **options):
+        today = date.today()
+        if options['date']:
+            as_of = parse_date(options['date'])
+            if as_of is None:
+                raise CommandError('--date must be YYYY-MM-DD')
+        else:
+            as_of = today - timedelta(days=1)
+
+        if options['backfill']:
+            RankingSnapshot.objects.filter(period=RankingSnapshot.PERIOD_MONTH).delete()
+        else:
+            if options['period'] == RankingSnapshot.PERIOD_MONTH:
+                as_of = (as_of.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            rows = SnapshotService.take(as_of, options['period'])
+            self.stdout.write(f"Took {options['period']} snapshot of {as_of}: {rows} rows")
+
+        # Months that closed since the last run
+        for month_end in SnapshotService.close_months(today):
+            self.stdout.write(f'Took month snapshot of {month_end:%B %Y}')
+
+        self.stdout.write(self.style.SUCCESS('Ranking snapshots are up to date!'))
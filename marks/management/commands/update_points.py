@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Sum
-from marks.models import LifetimePoints, PointsSpent
+from marks.models import LifetimePoints, PointsSpent, PointsLedgerEntry
 
 
 class Command(BaseCommand):
@@ -12,8 +12,13 @@ class Command(BaseCommand):
                 student=lifetime_points.student
             ).aggregate(total=Sum('points_spent'))['total'] or 0
             
-            lifetime_points.points_spent = total_spent
-            lifetime_points.save()
+            # Correct any drift through the ledger so the history stays complete
+            drift = total_spent - lifetime_points.points_spent
+            if drift:
+                PointsLedgerEntry.record(
+                    lifetime_points.student_id, PointsLedgerEntry.KIND_SPEND, -drift,
+                    description='Spend total corrected'
+                )
             
             self.stdout.write(
                 self.style.SUCCESS(
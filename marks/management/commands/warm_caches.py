@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from marks import warmup
+
+
+class Command(BaseCommand):
+    help = 'Pre-build cached analytics, search indexes and compiled templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--step',
+            action='append',
+            choices=list(warmup.STEPS),
+            dest='steps',
+            help='Only run this warm-up step (repeatable, default: all)',
+        )
+
+    def handle(self, *args, **options):
+        results = warmup.warm(options['steps'])
+        for name, count, elapsed in results:
+            if count is None:
+                self.stdout.write(self.style.WARNING(f'{name}: failed after {elapsed:.3f}s (see log)'))
+            else:
+                self.stdout.write(f'{name}: {count} items in {elapsed:.3f}s')
+
+        total = sum(elapsed for _, _, elapsed in results)
+        self.stdout.write(self.style.SUCCESS(f'Warm-up finished in {total:.3f}s'))
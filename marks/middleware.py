@@ -0,0 +1,43 @@
+from django.http import HttpResponse
+
+from .profiling import Profile
+
+# ?_profile= values: profiling mode, and whether the profile replaces the response
+PROFILE_PARAMETERS = {
+    '1': ('sample', False),
+    'sample': ('sample', False),
+    'cprofile': ('cprofile', False),
+    'download': ('sample', True),
+}
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request for staff users with ?_profile=.
+
+    - ?_profile=1 (or sample): sampling profile saved as folded stacks
+    - ?_profile=cprofile: cProfile timings saved as a pstats file
+    - ?_profile=download: sampling profile returned instead of the page
+
+    Saved profiles go to PROFILE_DIR; the response names the file in an
+    X-Profile header. The parameter is ignored for everyone else.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        parameters = PROFILE_PARAMETERS.get(request.GET.get('_profile'))
+        if parameters is None or not request.user.is_staff:
+            return self.get_response(request)
+
+        mode, download = parameters
+        profile = Profile(mode)
+        response = profile.run(self.get_response, request)
+        if download:
+            response = HttpResponse(profile.content(), content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename="profile.folded"'
+        else:
+            response['X-Profile'] = profile.write(request.path).name
+        return response
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_standings(apps, schema_editor):
+    """Backfill standings for existing exams (all-classes and per-class partitions)"""
+    Exam = apps.get_model('marks', 'Exam')
+    SubjectStanding = apps.get_model('marks', 'SubjectStanding')
+
+    totals = {}
+    for exam in Exam.objects.all().only('student_id', 'subject_id', 'class_number', 'exam_id', 'mark_obtained', 'total_marks'):
+        percentage = (exam.mark_obtained / exam.total_marks) * 100 if exam.total_marks > 0 else 0
+        for class_number in (None, exam.class_number):
+            key = (exam.subject_id, class_number)
+            row = totals.setdefault(key, {}).setdefault(exam.student_id, {
+                'obtained': 0, 'possible': 0, 'exam_ids': set(), 'best': 0,
+            })
+            row['obtained'] += exam.mark_obtained
+            row['possible'] += exam.total_marks
+            row['exam_ids'].add(exam.exam_id)
+            row['best'] = max(row['best'], percentage)
+
+    standings = []
+    for (subject_id, class_number), students in totals.items():
+        rows = []
+        for student_id, row in students.items():
+            average = (row['obtained'] * 100 / row['possible']) if row['possible'] > 0 else 0
+            rows.append((average, row['obtained'], student_id, row))
+        rows.sort(key=lambda x: (x[0], x[1]), reverse=True)
+        current_rank = 1
+        for idx, (average, obtained, student_id, row) in enumerate(rows):
+            if idx > 0:
+                prev_average, prev_obtained = rows[idx - 1][0], rows[idx - 1][1]
+                if not (abs(average - prev_average) < 0.01 and obtained == prev_obtained):
+                    current_rank = idx + 1
+            standings.append(SubjectStanding(
+                student_id=student_id,
+                subject_id=subject_id,
+                class_number=class_number,
+                total_marks_obtained=row['obtained'],
+                total_possible_marks=row['possible'],
+                exam_count=len(row['exam_ids'] - {None}),
+                average_percentage=average,
+                best_percentage=row['best'],
+                rank=current_rank,
+            ))
+    SubjectStanding.objects.bulk_create(standings, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0007_remove_unused_percentage_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubjectStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_number', models.IntegerField(blank=True, help_text='Class partition of this standing (empty means all classes)', null=True)),
+                ('total_marks_obtained', models.IntegerField(default=0)),
+                ('total_possible_marks', models.IntegerField(default=0)),
+                ('exam_count', models.IntegerField(default=0, help_text='Unique exams taken in this subject')),
+                ('average_percentage', models.FloatField(default=0)),
+                ('best_percentage', models.FloatField(default=0)),
+                ('rank', models.IntegerField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='marks.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='marks.subject')),
+            ],
+            options={
+                'ordering': ['subject', 'class_number', 'rank'],
+                'indexes': [models.Index(fields=['subject', 'class_number', 'rank'], name='marks_subje_subject_b25759_idx'), models.Index(fields=['student', 'class_number', 'rank'], name='marks_subje_student_435475_idx')],
+            },
+        ),
+        migrations.RunPython(build_standings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+CHECKPOINT_INTERVAL = 50
+
+
+def seed_ledger(apps, schema_editor):
+    """Open a ledger for every student from the current LifetimePoints totals and spend history"""
+    Student = apps.get_model('marks', 'Student')
+    LifetimePoints = apps.get_model('marks', 'LifetimePoints')
+    PointsSpent = apps.get_model('marks', 'PointsSpent')
+    PointsLedgerEntry = apps.get_model('marks', 'PointsLedgerEntry')
+    PointsCheckpoint = apps.get_model('marks', 'PointsCheckpoint')
+
+    for student in Student.objects.all():
+        lifetime_points = LifetimePoints.objects.filter(student=student).first()
+        spends = list(PointsSpent.objects.filter(student=student).order_by('created_at', 'id'))
+        if lifetime_points is None and not spends:
+            continue
+        if lifetime_points is None:
+            lifetime_points = LifetimePoints.objects.create(student=student)
+
+        opened_at = min([student.created_at] + [spend.created_at for spend in spends])
+        events = [('earn', lifetime_points.points_earned, 'Opening balance', None, opened_at)]
+        events += [('spend', -spend.points_spent, spend.description, spend, spend.created_at) for spend in spends]
+        drift = lifetime_points.points_spent - sum(spend.points_spent for spend in spends)
+        if drift:
+            events.append(('spend', -drift, 'Opening adjustment', None, opened_at))
+
+        entries, checkpoints = [], []
+        points_earned = points_spent = 0
+        for sequence, (kind, amount, description, spend, created_at) in enumerate(events, 1):
+            if kind == 'spend':
+                points_spent -= amount
+            else:
+                points_earned += amount
+            entries.append(PointsLedgerEntry(
+                student=student, kind=kind, amount=amount,
+                balance_after=points_earned - points_spent, sequence=sequence,
+                description=description[:100], points_spent_record=spend, created_at=created_at,
+            ))
+            if sequence % CHECKPOINT_INTERVAL == 0:
+                checkpoints.append(PointsCheckpoint(
+                    student=student, sequence=sequence, points_earned=points_earned,
+                    points_spent=points_spent, created_at=created_at,
+                ))
+        PointsLedgerEntry.objects.bulk_create(entries)
+        PointsCheckpoint.objects.bulk_create(checkpoints)
+        lifetime_points.ledger_sequence = len(entries)
+        lifetime_points.save(update_fields=['ledger_sequence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0008_subjectstanding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lifetimepoints',
+            name='bonus_points',
+            field=models.IntegerField(default=0, help_text='Part of points earned that comes from monthly win bonuses'),
+        ),
+        migrations.AddField(
+            model_name='lifetimepoints',
+            name='ledger_sequence',
+            field=models.IntegerField(default=0, help_text='Sequence number of the latest ledger entry'),
+        ),
+        migrations.CreateModel(
+            name='PointsCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.IntegerField(help_text='Ledger sequence number this checkpoint covers')),
+                ('points_earned', models.IntegerField()),
+                ('points_spent', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='marks.student')),
+            ],
+            options={
+                'ordering': ['student', '-sequence'],
+                'indexes': [models.Index(fields=['student', 'created_at'], name='marks_point_student_1d4104_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PointsLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('earn', 'Exam points'), ('bonus', 'Monthly win bonus'), ('spend', 'Points spent')], max_length=10)),
+                ('amount', models.IntegerField(help_text='Signed change (spends are negative, reversals positive)')),
+                ('balance_after', models.IntegerField(help_text='Points remaining after this entry')),
+                ('sequence', models.IntegerField(help_text='Per-student entry number')),
+                ('description', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('points_spent_record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='marks.pointsspent')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='marks.student')),
+            ],
+            options={
+                'verbose_name': 'Points Ledger Entry',
+                'verbose_name_plural': 'Points Ledger',
+                'ordering': ['-created_at', '-sequence'],
+                'indexes': [models.Index(fields=['student', 'created_at'], name='marks_point_student_2cc4bb_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'sequence'), name='unique_ledger_sequence')],
+            },
+        ),
+        migrations.RunPython(seed_ledger, migrations.RunPython.noop),
+    ]
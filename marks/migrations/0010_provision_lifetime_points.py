@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:48
+
+from django.db import migrations
+
+
+def provision_lifetime_points(apps, schema_editor):
+    """Create the LifetimePoints rows that the points page used to create on read"""
+    Student = apps.get_model('marks', 'Student')
+    LifetimePoints = apps.get_model('marks', 'LifetimePoints')
+    missing = Student.objects.filter(lifetimepoints__isnull=True).values_list('id', flat=True)
+    LifetimePoints.objects.bulk_create(
+        [LifetimePoints(student_id=student_id) for student_id in missing],
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0009_points_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(provision_lifetime_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0010_provision_lifetime_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecalcJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('student', 'Student lifetime points'), ('month', 'Monthly ranking cohort'), ('standings', 'Subject standings partition')], max_length=20)),
+                ('key', models.CharField(help_text="Student id, 'YYYY-MM:class' or 'subject:class'", max_length=50)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Recalculation Job',
+                'verbose_name_plural': 'Recalculation Queue',
+                'ordering': ['created_at'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='unique_recalc_job')],
+            },
+        ),
+    ]
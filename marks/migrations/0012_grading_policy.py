@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Thresholds that were hard-coded in Exam.grade / Exam.points_earned
+THRESHOLDS = {
+    'CQ': {'Superb': 85, 'Good': 70, 'Average': 50, 'Poor': 33, 'Fail': 20, 'Horrible': 0},
+    'MCQ': {'Superb': 93, 'Good': 77, 'Average': 55, 'Poor': 40, 'Fail': 30, 'Horrible': 0},
+}
+
+GRADES = [
+    ('Superb', '#A7F3D0', 20),
+    ('Good', '#D1FAE5', 15),
+    ('Average', '#FEF08A', 0),
+    ('Poor', '#FDE68A', -10),
+    ('Fail', '#FECACA', -15),
+    ('Horrible', '#FCA5A5', -20),
+]
+
+
+def seed_grading_policy(apps, schema_editor):
+    """Store the built-in CQ and MCQ grading policies as GradeThreshold rows"""
+    GradeScale = apps.get_model('marks', 'GradeScale')
+    GradeThreshold = apps.get_model('marks', 'GradeThreshold')
+    grades = {}
+    for grade_name, color_code, points in GRADES:
+        grade = GradeScale.objects.filter(grade_name=grade_name).order_by('pk').first()
+        if grade is None:
+            grade = GradeScale.objects.create(grade_name=grade_name, color_code=color_code, points=points)
+        grades[grade_name] = grade
+    GradeThreshold.objects.bulk_create([
+        GradeThreshold(exam_type_name=exam_type_name, grade=grades[grade_name], min_percentage=minimum)
+        for exam_type_name, policy in THRESHOLDS.items()
+        for grade_name, minimum in policy.items()
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0011_recalcjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeThreshold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_type_name', models.CharField(help_text='Exam type name, e.g. CQ or MCQ', max_length=50)),
+                ('min_percentage', models.FloatField()),
+                ('grade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thresholds', to='marks.gradescale')),
+            ],
+            options={
+                'ordering': ['exam_type_name', '-min_percentage'],
+                'constraints': [models.UniqueConstraint(fields=('exam_type_name', 'grade'), name='unique_grade_threshold')],
+            },
+        ),
+        migrations.RunPython(seed_grading_policy, migrations.RunPython.noop),
+    ]
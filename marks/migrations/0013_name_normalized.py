@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:00
+
+from django.db import migrations, models
+
+
+def normalize_names(apps, schema_editor):
+    """Fill name_normalized the way Student.save / Subject.save do"""
+    for model_name in ('Student', 'Subject'):
+        model = apps.get_model('marks', model_name)
+        objects = list(model.objects.only('id', 'name'))
+        for obj in objects:
+            obj.name_normalized = ' '.join((obj.name or '').split()).casefold()
+        model.objects.bulk_update(objects, ['name_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0012_grading_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='name_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='name_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(normalize_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from marks.grading import DEFAULT_GRADE_COLORS, DEFAULT_GRADE_POINTS, DEFAULT_THRESHOLDS, GradingRegistry, normalize_exam_type
+
+# Excellence thresholds at the time of this migration
+EXCELLENCE_THRESHOLDS = {'CQ': 80, 'MCQ': 85}
+
+
+def build_rollup(apps, schema_editor):
+    """Backfill the rollup cube from existing exams"""
+    Exam = apps.get_model('marks', 'Exam')
+    ExamRollup = apps.get_model('marks', 'ExamRollup')
+    ExamType = apps.get_model('marks', 'ExamType')
+    GradeScale = apps.get_model('marks', 'GradeScale')
+    GradeThreshold = apps.get_model('marks', 'GradeThreshold')
+
+    grade_points = dict(DEFAULT_GRADE_POINTS)
+    for grade_name, points in GradeScale.objects.order_by('-pk').values_list('grade_name', 'points'):
+        grade_points[grade_name] = points
+    thresholds = {}
+    for exam_type_name, grade_name, minimum in GradeThreshold.objects.values_list(
+        'exam_type_name', 'grade__grade_name', 'min_percentage'
+    ):
+        thresholds.setdefault(normalize_exam_type(exam_type_name), {})[grade_name] = minimum
+    exam_type_names = dict(ExamType.objects.values_list('id', 'name'))
+    registry = GradingRegistry(thresholds or DEFAULT_THRESHOLDS, grade_points, DEFAULT_GRADE_COLORS, exam_type_names)
+
+    cells, owners = {}, {}
+    for student_id, subject_id, exam_type_id, class_number, exam_date, exam_id, mark_obtained, total_marks in (
+        Exam.objects.order_by().values_list(
+            'student_id', 'subject_id', 'exam_type_id', 'class_number', 'date', 'exam_id', 'mark_obtained', 'total_marks'
+        ).iterator()
+    ):
+        month = exam_date.replace(day=1)
+        cell = cells.setdefault((class_number, month, subject_id, exam_type_id, student_id), {
+            'obtained': 0, 'possible': 0, 'records': 0, 'exam_ids': set(), 'excellent': 0, 'points': 0,
+        })
+        cell['obtained'] += mark_obtained
+        cell['possible'] += total_marks
+        cell['records'] += 1
+        if total_marks > 0:
+            threshold = EXCELLENCE_THRESHOLDS.get((exam_type_names.get(exam_type_id) or '').upper())
+            if threshold is not None and mark_obtained * 100 / total_marks >= threshold:
+                cell['excellent'] += 1
+        percentage = (mark_obtained / total_marks) * 100 if total_marks > 0 else 0
+        cell['points'] += registry.policy_for_exam_type_id(exam_type_id).points_for(percentage)
+        if exam_id is not None:
+            cell['exam_ids'].add(exam_id)
+            owner = (class_number, month, subject_id, exam_type_id, exam_id)
+            owners[owner] = min(owners.get(owner, student_id), student_id)
+
+    ExamRollup.objects.bulk_create([
+        ExamRollup(
+            class_number=class_number, month=month, subject_id=subject_id, exam_type_id=exam_type_id,
+            student_id=student_id,
+            marks_obtained=cell['obtained'],
+            marks_possible=cell['possible'],
+            record_count=cell['records'],
+            exam_count=len(cell['exam_ids']),
+            session_count=sum(
+                1 for exam_id in cell['exam_ids']
+                if owners[(class_number, month, subject_id, exam_type_id, exam_id)] == student_id
+            ),
+            excellent_count=cell['excellent'],
+            points=cell['points'],
+        )
+        for (class_number, month, subject_id, exam_type_id, student_id), cell in cells.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0013_name_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_number', models.IntegerField()),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('marks_obtained', models.IntegerField(default=0)),
+                ('marks_possible', models.IntegerField(default=0)),
+                ('record_count', models.IntegerField(default=0, help_text='Exam result rows')),
+                ('exam_count', models.IntegerField(default=0, help_text='Unique exams of the student')),
+                ('session_count', models.IntegerField(default=0, help_text='Unique exams, counted once across students')),
+                ('excellent_count', models.IntegerField(default=0, help_text='Results reaching the excellence threshold')),
+                ('points', models.IntegerField(default=0, help_text='Exam points earned (without monthly bonuses)')),
+                ('exam_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='marks.examtype')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='marks.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='marks.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'month'], name='marks_examr_student_1f7b16_idx'), models.Index(fields=['subject', 'class_number'], name='marks_examr_subject_2964bb_idx')],
+                'constraints': [models.UniqueConstraint(fields=('class_number', 'month', 'subject', 'exam_type', 'student'), name='unique_exam_rollup_cell')],
+            },
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0014_exam_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Daily'), ('month', 'Monthly')], max_length=5)),
+                ('as_of', models.DateField(help_text='Last day covered (month snapshots: last day of the month)')),
+                ('class_number', models.IntegerField(blank=True, help_text='Class partition of this snapshot (empty means all classes)', null=True)),
+                ('rank', models.IntegerField()),
+                ('cohort_size', models.IntegerField(help_text='Students ranked in this snapshot')),
+                ('average_percentage', models.FloatField(default=0)),
+                ('points', models.IntegerField(default=0, help_text='Points earned up to as_of')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranking_snapshots', to='marks.student')),
+            ],
+            options={
+                'ordering': ['as_of', 'rank'],
+                'indexes': [models.Index(fields=['student', 'period', 'class_number', 'as_of'], name='marks_ranki_student_b15bec_idx'), models.Index(fields=['period', 'class_number', 'as_of', 'rank'], name='marks_ranki_period_9ad9e9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:25
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marks', '0015_ranking_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='stored_percentage',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(then=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(models.F('mark_obtained'), models.FloatField()), '*', models.Value(100)), '/', models.F('total_marks')), total_marks__gt=0), default=models.Value(0.0), output_field=models.FloatField()), output_field=models.FloatField()),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['stored_percentage'], name='marks_exam_stored__c68b79_idx'),
+        ),
+    ]
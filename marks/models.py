@@ -1,5 +1,9 @@
-from django.db import models
-from django.db.models import Avg, Sum, Count, Q
+from django.db import models, transaction
+from django.db.models import Avg, Sum, Count, Q, F
+from django.db.models.functions import Cast
+from django.utils import timezone
+from . import grading
+from .search import normalize_name
 
 
 class Student(models.Model):
@@ -7,11 +11,20 @@ class Student(models.Model):
     name = models.CharField(max_length=200)
     roll = models.CharField(max_length=50, blank=True, null=True)
     class_name = models.CharField(max_length=100, blank=True, null=True)
+    # Lowercased, whitespace-collapsed name for typeahead search (see marks.search)
+    name_normalized = models.CharField(max_length=200, db_index=True, editable=False, default='')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_normalized'}
+        super().save(*args, **kwargs)
+
     @staticmethod
     def _count_unique_exams(queryset):
         """
@@ -153,35 +166,58 @@ class Student(models.Model):
         
         return None
 
+    def _grouped_totals(self, field):
+        """
+        Marks and unique exam totals of this student's exams grouped by one
+        column, in a single query.
+        
+        Args:
+            field: Column to group by, e.g. 'subject_id'
+            
+        Returns:
+            list: Dicts with the group column, total_obtained, total_possible,
+            exam_count and average_percentage, ordered by the group column
+        """
+        rows = list(self.exam_set.order_by(field).values(field).annotate(
+            total_obtained=Sum('mark_obtained'),
+            total_possible=Sum('total_marks'),
+            exam_count=Count('exam_id', distinct=True),
+        ))
+        for row in rows:
+            total_possible = row['total_possible'] or 0
+            row['average_percentage'] = (
+                (row['total_obtained'] * 100 / total_possible) if total_possible > 0 else 0
+            )
+        return rows
+
     def subject_wise_summary(self):
         """
         Get performance summary for each subject the student has taken.
         
+        Uses one grouped query for the totals and the precomputed standings
+        for the subject ranks (three queries in all).
+        
         Returns:
             list: List of dicts containing subject performance data
         """
-        summary = []
-        subjects = Subject.objects.filter(exam__student=self).distinct()
-        
-        for subject in subjects:
-            exams = self.exam_set.filter(subject=subject)
-            
-            total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-            total_possible_marks = sum(float(e.total_marks) for e in exams)
-            avg_percentage = (
-                (total_marks_obtained * 100 / total_possible_marks) 
-                if total_possible_marks > 0 else 0
-            )
-            
-            summary.append({
-                'subject': subject,
-                'total_marks': total_marks_obtained,
-                'exam_count': self._count_unique_exams(exams),
-                'average_percentage': avg_percentage,
-                'rank': self.get_subject_rank(subject)
-            })
-        
-        return summary
+        rows = self._grouped_totals('subject_id')
+        subjects = Subject.objects.in_bulk([row['subject_id'] for row in rows])
+        ranks = dict(SubjectStanding.objects.filter(
+            student=self,
+            class_number__isnull=True
+        ).values_list('subject_id', 'rank'))
+        
+        return [
+            {
+                'subject': subjects[row['subject_id']],
+                'total_marks': float(row['total_obtained']),
+                'exam_count': row['exam_count'],
+                'average_percentage': row['average_percentage'],
+                'rank': ranks.get(row['subject_id'])
+            }
+            for row in rows
+        ]
+
     def exam_type_summary(self):
         """
         Get performance summary for each exam type the student has taken.
@@ -189,27 +225,18 @@ class Student(models.Model):
         Returns:
             list: List of dicts containing exam type performance data
         """
-        summary = []
-        exam_types = ExamType.objects.filter(exam__student=self).distinct()
-        
-        for exam_type in exam_types:
-            exams = self.exam_set.filter(exam_type=exam_type)
-            
-            total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-            total_possible_marks = sum(float(e.total_marks) for e in exams)
-            avg_percentage = (
-                (total_marks_obtained * 100 / total_possible_marks) 
-                if total_possible_marks > 0 else 0
-            )
-            
-            summary.append({
-                'exam_type': exam_type,
-                'total_marks': total_marks_obtained,
-                'exam_count': self._count_unique_exams(exams),
-                'average_percentage': avg_percentage
-            })
+        rows = self._grouped_totals('exam_type_id')
+        exam_types = ExamType.objects.in_bulk([row['exam_type_id'] for row in rows])
         
-        return summary
+        return [
+            {
+                'exam_type': exam_types[row['exam_type_id']],
+                'total_marks': float(row['total_obtained']),
+                'exam_count': row['exam_count'],
+                'average_percentage': row['average_percentage']
+            }
+            for row in rows
+        ]
 
     def grade_frequency(self):
         """
@@ -218,13 +245,13 @@ class Student(models.Model):
         Returns:
             dict: Grade names mapped to their frequency counts
         """
-        from collections import Counter
-        grades = [exam.grade for exam in self.exam_set.all()]
-        return dict(Counter(grades))
+        return dict(grading.grade_counts(
+            self.exam_set.values_list('exam_type_id', 'mark_obtained', 'total_marks')
+        ))
 
     def get_subject_rank(self, subject):
         """
-        Calculate student's rank in a specific subject.
+        Get student's rank in a specific subject from the precomputed standings.
         
         Args:
             subject: Subject instance to calculate rank for
@@ -232,30 +259,24 @@ class Student(models.Model):
         Returns:
             int or None: Rank position (1-indexed) or None if not applicable
         """
-        students_in_subject = Student.objects.filter(exam__subject=subject).distinct()
-        
-        student_averages = []
-        for student in students_in_subject:
-            exams = student.exam_set.filter(subject=subject)
-            if exams.exists():
-                total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-                total_possible_marks = sum(float(e.total_marks) for e in exams)
-                avg_percentage = (
-                    (total_marks_obtained * 100 / total_possible_marks) 
-                    if total_possible_marks > 0 else 0
-                )
-                student_averages.append({
-                    'student_id': student.id,
-                    'avg_percentage': avg_percentage
-                })
-        
-        student_averages.sort(key=lambda x: x['avg_percentage'], reverse=True)
-        
-        for idx, item in enumerate(student_averages, 1):
-            if item['student_id'] == self.id:
-                return idx
+        return SubjectStanding.objects.filter(
+            student=self,
+            subject=subject,
+            class_number__isnull=True
+        ).values_list('rank', flat=True).first()
+
+    def subject_champion_count(self):
+        """
+        Count the subjects where this student holds rank #1 (ties included).
         
-        return None
+        Returns:
+            int: Number of subjects topped by the student
+        """
+        return SubjectStanding.objects.filter(
+            student=self,
+            class_number__isnull=True,
+            rank=1
+        ).count()
 
     def recalculate_lifetime_points(self):
         """
@@ -270,28 +291,27 @@ class Student(models.Model):
         monthly_wins = self.calculate_monthly_wins()
         bonus_points = monthly_wins * 40
         
-        # Total points = exam points + monthly wins bonus
-        total_points = exam_points + bonus_points
-        
-        # Get or create LifetimePoints record
-        lifetime_points, created = LifetimePoints.objects.get_or_create(
-            student=self,
-            defaults={'points_earned': total_points, 'points_spent': 0}
-        )
-        
-        # Update points if record already exists
-        if not created:
-            lifetime_points.points_earned = total_points
-            lifetime_points.save()
-        
+        # Record the change in the points ledger (LifetimePoints is its projection)
+        PointsLedgerEntry.sync_earned(self.id, exam_points, bonus_points)
+
+
 class Subject(models.Model):
     """Model representing a subject/course"""
     name = models.CharField(max_length=200)
+    # Lowercased, whitespace-collapsed name for typeahead search (see marks.search)
+    name_normalized = models.CharField(max_length=200, db_index=True, editable=False, default='')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_normalized'}
+        super().save(*args, **kwargs)
+
     @property
     def average_marks(self):
         """
@@ -314,35 +334,16 @@ class Subject(models.Model):
 
     def best_student(self):
         """
-        Get the best performing student in this subject based on average percentage.
+        Get the best performing student in this subject from the precomputed standings.
         
         Returns:
-            Student or None: Student with highest average percentage
+            Student or None: Student ranked #1 in this subject
         """
-        students = Student.objects.filter(exam__subject=self).distinct()
-        
-        if not students.exists():
-            return None
-        
-        student_averages = []
-        for student in students:
-            student_exams = student.exam_set.filter(subject=self)
-            if student_exams.exists():
-                total_marks_obtained = sum(float(e.mark_obtained) for e in student_exams)
-                total_possible_marks = sum(float(e.total_marks) for e in student_exams)
-                
-                if total_possible_marks > 0:
-                    avg_percentage = (total_marks_obtained * 100 / total_possible_marks)
-                    student_averages.append({
-                        'student': student,
-                        'avg_percentage': avg_percentage
-                    })
-        
-        if not student_averages:
-            return None
-        
-        student_averages.sort(key=lambda x: x['avg_percentage'], reverse=True)
-        return student_averages[0]['student']
+        standing = SubjectStanding.objects.filter(
+            subject=self,
+            class_number__isnull=True
+        ).select_related('student').order_by('rank', 'student__name').first()
+        return standing.student if standing else None
 
 
 class ExamType(models.Model):
@@ -365,6 +366,27 @@ class GradeScale(models.Model):
         return f"{self.grade_name} ({self.points:+d} points)"
 
 
+class GradeThreshold(models.Model):
+    """
+    Minimum percentage needed for a grade under one exam type's grading policy.
+    
+    Exam types without thresholds of their own are graded with the CQ policy
+    (see marks.grading).
+    """
+    exam_type_name = models.CharField(max_length=50, help_text="Exam type name, e.g. CQ or MCQ")
+    grade = models.ForeignKey(GradeScale, on_delete=models.CASCADE, related_name='thresholds')
+    min_percentage = models.FloatField()
+    
+    class Meta:
+        ordering = ['exam_type_name', '-min_percentage']
+        constraints = [
+            models.UniqueConstraint(fields=['exam_type_name', 'grade'], name='unique_grade_threshold'),
+        ]
+
+    def __str__(self):
+        return f"{self.exam_type_name} {self.grade.grade_name}: >= {self.min_percentage:g}%"
+
+
 class Exam(models.Model):
     """
     Model representing a single exam result entry.
@@ -393,9 +415,26 @@ class Exam(models.Model):
         help_text="Unique exam identifier (same for bulk entries)"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Percentage score computed and stored by the database, for filtering,
+    # sorting and aggregating in SQL (0 when total_marks is 0)
+    stored_percentage = models.GeneratedField(
+        expression=models.Case(
+            models.When(
+                total_marks__gt=0,
+                then=Cast(F('mark_obtained'), models.FloatField()) * 100 / F('total_marks'),
+            ),
+            default=models.Value(0.0),
+            output_field=models.FloatField(),
+        ),
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
 
     class Meta:
         ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['stored_percentage']),
+        ]
 
     def __str__(self):
         return f"{self.student.name} - {self.subject.name} - {self.exam_type.name}"
@@ -415,133 +454,46 @@ class Exam(models.Model):
     @property
     def grade(self):
         """
-        Get letter grade based on percentage and exam type.
+        Get letter grade based on percentage and exam type's grading policy.
         
         Returns:
-            str: Grade name (e.g., "Superb", "Good") or "N/A"
-        """
-        percentage = self.percentage
-        exam_type_name = self.exam_type.name.upper().strip() if self.exam_type else ""
-        
-        # Determine grade based on exam type
-        if exam_type_name == "MCQ":
-            if percentage >= 93:
-                return "Superb"
-            elif percentage >= 77:
-                return "Good"
-            elif percentage >= 55:
-                return "Average"
-            elif percentage >= 40:
-                return "Poor"
-            elif percentage >= 30:
-                return "Fail"
-            else:
-                return "Horrible"
-        else:  # CQ or default
-            if percentage >= 85:
-                return "Superb"
-            elif percentage >= 70:
-                return "Good"
-            elif percentage >= 50:
-                return "Average"
-            elif percentage >= 33:
-                return "Poor"
-            elif percentage >= 20:
-                return "Fail"
-            else:
-                return "Horrible"
+            str: Grade name (e.g., "Superb", "Good")
+        """
+        return grading.get_registry().policy_for_exam_type_id(self.exam_type_id).grade_for(self.percentage)
 
     @property
     def grade_color(self):
         """
-        Get display color for the grade based on the grade name.
+        Get display color for the grade (GradeScale.color_code).
         
         Returns:
-            str: Hex color code (e.g., "#4CAF50")
-        """
-        grade_name = self.grade
-        
-        # Map grade names to colors
-        color_map = {
-            "Superb": "#A7F3D0",  # Emerald-200 (darker green)
-            "Good": "#D1FAE5",       # Green-100 (lighter green)
-            "Average": "#FEF08A",    # Yellow-200 (very light yellow)
-            "Poor": "#FDE68A",       # Amber-200 (very light amber)
-            "Fail": "#FECACA",       # Red-200 (very light red)
-            "Horrible": "#FCA5A5",   # Red-300 (light red)
-        }
-        
-        return color_map.get(grade_name, "#000000")
+            str: Hex color code (e.g., "#A7F3D0")
+        """
+        return grading.grade_color(self.grade)
 
     @property
     def points_earned(self):
         """
         Calculate lifetime points earned from this exam.
-        Different thresholds for CQ vs MCQ exam types.
-        
-        Point System:
-        
-        Superb (+20 points):
-        - CQ: >= 85%
-        - MCQ: >= 93%
         
-        Good (+15 points):
-        - CQ: 70-84.99%
-        - MCQ: 77-92.99%
-        
-        Average (0 points):
-        - CQ: 50-69.99%
-        - MCQ: 55-76.99%
-        
-        Poor (-10 points):
-        - CQ: 33-49.99%
-        - MCQ: 40-54.99%
-        
-        Fail (-15 points):
-        - CQ: 20-32.99%
-        - MCQ: 30-39.99%
-        
-        Horrible (-20 points):
-        - CQ: < 20%
-        - MCQ: < 30%
+        The grade comes from the exam type's GradeThreshold rows (CQ and MCQ
+        use different thresholds) and its points from GradeScale; see
+        marks.grading for the built-in defaults.
         
         Returns:
             int: Points earned (can be negative)
         """
-        percentage = self.percentage
-        exam_type_name = self.exam_type.name.upper().strip() if self.exam_type else ""
-        
-        # MCQ grading thresholds
-        if exam_type_name == "MCQ":
-            if percentage >= 93:
-                return 20  # Superb
-            elif percentage >= 77:
-                return 15  # Good
-            elif percentage >= 55:
-                return 0   # Average
-            elif percentage >= 40:
-                return -10 # Poor
-            elif percentage >= 30:
-                return -15 # Fail
-            else:
-                return -20 # Horrible
-        
-        # CQ grading thresholds (default)
-        else:
-            if percentage >= 85:
-                return 20  # Superb
-            elif percentage >= 70:
-                return 15  # Good
-            elif percentage >= 50:
-                return 0   # Average
-            elif percentage >= 33:
-                return -10 # Poor
-            elif percentage >= 20:
-                return -15 # Fail
-            else:
-                return -20 # Horrible
+        return grading.get_registry().policy_for_exam_type_id(self.exam_type_id).points_for(self.percentage)
+
+    @staticmethod
+    def points_for(exam_type_name, percentage):
+        """
+        Points earned for a percentage score in an exam type (see points_earned).
         
-        # if you change value here, run 'python manage.py recalculate_all_points' to update all students' lifetime points based on the new values
+        Returns:
+            int: Points earned (can be negative)
+        """
+        return grading.points_for(exam_type_name, percentage)
 
     def save(self, *args, **kwargs):
         """Override save, no longer recalculates lifetime points (handled by signal)"""
@@ -549,10 +501,18 @@ class Exam(models.Model):
 
 
 class LifetimePoints(models.Model):
-    """Model tracking accumulated points for rewards/achievements"""
+    """
+    Model tracking accumulated points for rewards/achievements.
+    
+    This is a cached projection of the PointsLedgerEntry history: every
+    ledger entry updates these totals atomically, so they should only be
+    changed through PointsLedgerEntry.record().
+    """
     student = models.OneToOneField(Student, on_delete=models.CASCADE)
     points_earned = models.IntegerField(default=0, help_text="Total points earned from exams")
     points_spent = models.IntegerField(default=0, help_text="Points spent on rewards")
+    bonus_points = models.IntegerField(default=0, help_text="Part of points earned that comes from monthly win bonuses")
+    ledger_sequence = models.IntegerField(default=0, help_text="Sequence number of the latest ledger entry")
 
     class Meta:
         verbose_name = "Lifetime Points"
@@ -561,6 +521,25 @@ class LifetimePoints(models.Model):
     def __str__(self):
         return f"{self.student.name} - {self.points_remaining} points remaining"
 
+    @classmethod
+    def provision_missing(cls, student_ids=None):
+        """
+        Create empty LifetimePoints rows for students that have none, in one
+        bulk insert.
+        
+        Args:
+            student_ids: Restrict provisioning to these students (default: all)
+            
+        Returns:
+            int: Number of rows created
+        """
+        students = Student.objects.filter(lifetimepoints__isnull=True)
+        if student_ids is not None:
+            students = students.filter(id__in=student_ids)
+        missing = [cls(student_id=student_id) for student_id in students.values_list('id', flat=True)]
+        cls.objects.bulk_create(missing, ignore_conflicts=True)
+        return len(missing)
+
     @property
     def total_points(self):
         """
@@ -599,27 +578,366 @@ class PointsSpent(models.Model):
         return f"{self.student.name} - {self.points_spent} points on {self.date}"
 
     def save(self, *args, **kwargs):
-        """Override save to update student's lifetime points"""
-        super().save(*args, **kwargs)
-        # Update the student's total points spent
-        from django.db.models import Sum
-        lifetime_points, created = LifetimePoints.objects.get_or_create(student=self.student)
-        total_spent = PointsSpent.objects.filter(student=self.student).aggregate(
-            total=Sum('points_spent')
-        )['total'] or 0
-        lifetime_points.points_spent = total_spent
-        lifetime_points.save()
+        """Override save to record the spend (or its correction) in the points ledger"""
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = PointsSpent.objects.filter(pk=self.pk).values_list(
+                    'student_id', 'points_spent'
+                ).first()
+            super().save(*args, **kwargs)
+            
+            if previous and previous[0] != self.student_id:
+                # Moved to another student: give the points back first
+                PointsLedgerEntry.record(
+                    previous[0], PointsLedgerEntry.KIND_SPEND, previous[1],
+                    description=f"Reversed: {self.description}", points_spent_record=self
+                )
+                previous = None
+            
+            delta = self.points_spent - (previous[1] if previous else 0)
+            if delta:
+                PointsLedgerEntry.record(
+                    self.student_id, PointsLedgerEntry.KIND_SPEND, -delta,
+                    description=self.description, points_spent_record=self
+                )
 
     def delete(self, *args, **kwargs):
-        """Override delete to update student's lifetime points"""
-        student = self.student
-        super().delete(*args, **kwargs)
-        # Update the student's total points spent after deletion
-        from django.db.models import Sum
-        lifetime_points = LifetimePoints.objects.filter(student=student).first()
-        if lifetime_points:
-            total_spent = PointsSpent.objects.filter(student=student).aggregate(
-                total=Sum('points_spent')
-            )['total'] or 0
-            lifetime_points.points_spent = total_spent
-            lifetime_points.save()
+        """Override delete to give the points back through the points ledger"""
+        with transaction.atomic():
+            student_id, points_spent = self.student_id, self.points_spent
+            result = super().delete(*args, **kwargs)
+            PointsLedgerEntry.record(
+                student_id, PointsLedgerEntry.KIND_SPEND, points_spent,
+                description=f"Reversed: {self.description}"
+            )
+        return result
+
+
+class PointsLedgerEntry(models.Model):
+    """
+    Append-only history of every change to a student's points balance.
+    
+    Each entry stores a signed amount and the running balance after it was
+    applied. Recording an entry updates the LifetimePoints projection with
+    F() expressions, so its cost does not depend on history length.
+    """
+    KIND_EARN = 'earn'
+    KIND_BONUS = 'bonus'
+    KIND_SPEND = 'spend'
+    KIND_CHOICES = [
+        (KIND_EARN, 'Exam points'),
+        (KIND_BONUS, 'Monthly win bonus'),
+        (KIND_SPEND, 'Points spent'),
+    ]
+    
+    # A checkpoint is written every CHECKPOINT_INTERVAL entries per student
+    CHECKPOINT_INTERVAL = 50
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    amount = models.IntegerField(help_text="Signed change (spends are negative, reversals positive)")
+    balance_after = models.IntegerField(help_text="Points remaining after this entry")
+    sequence = models.IntegerField(help_text="Per-student entry number")
+    description = models.CharField(max_length=100, blank=True)
+    points_spent_record = models.ForeignKey(
+        PointsSpent, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Points Ledger Entry"
+        verbose_name_plural = "Points Ledger"
+        ordering = ['-created_at', '-sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'sequence'], name='unique_ledger_sequence'),
+        ]
+        indexes = [
+            models.Index(fields=['student', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.name} - {self.kind} {self.amount:+d} (balance {self.balance_after})"
+
+    @classmethod
+    def record(cls, student_id, kind, amount, description='', points_spent_record=None):
+        """
+        Append an entry and apply it to the LifetimePoints projection.
+        
+        Earn and bonus amounts change points_earned; spend amounts change
+        points_spent (a negative amount spends, a positive one reverses).
+        
+        Returns:
+            PointsLedgerEntry: The created entry
+        """
+        updates = {'ledger_sequence': F('ledger_sequence') + 1}
+        if kind == cls.KIND_SPEND:
+            updates['points_spent'] = F('points_spent') - amount
+        else:
+            updates['points_earned'] = F('points_earned') + amount
+            if kind == cls.KIND_BONUS:
+                updates['bonus_points'] = F('bonus_points') + amount
+        
+        with transaction.atomic():
+            projection = LifetimePoints.objects.filter(student_id=student_id)
+            if not projection.update(**updates):
+                LifetimePoints.objects.get_or_create(student_id=student_id)
+                projection.update(**updates)
+            points_earned, points_spent, sequence = projection.values_list(
+                'points_earned', 'points_spent', 'ledger_sequence'
+            ).get()
+            
+            entry = cls.objects.create(
+                student_id=student_id,
+                kind=kind,
+                amount=amount,
+                balance_after=points_earned - points_spent,
+                sequence=sequence,
+                description=description[:100],
+                points_spent_record=points_spent_record,
+            )
+            if sequence % cls.CHECKPOINT_INTERVAL == 0:
+                PointsCheckpoint.objects.create(
+                    student_id=student_id,
+                    sequence=sequence,
+                    points_earned=points_earned,
+                    points_spent=points_spent,
+                    created_at=entry.created_at,
+                )
+        return entry
+
+    @classmethod
+    def sync_earned(cls, student_id, exam_points, bonus_points):
+        """
+        Record whatever earn/bonus entries bring the student's totals to the
+        given values (no entry is written when nothing changed).
+        """
+        current = LifetimePoints.objects.filter(student_id=student_id).values_list(
+            'points_earned', 'bonus_points'
+        ).first()
+        if current is None:
+            LifetimePoints.objects.get_or_create(student_id=student_id)
+            current = (0, 0)
+        current_exam_points = current[0] - current[1]
+        
+        if exam_points != current_exam_points:
+            cls.record(student_id, cls.KIND_EARN, exam_points - current_exam_points,
+                       description='Exam points recalculated')
+        if bonus_points != current[1]:
+            cls.record(student_id, cls.KIND_BONUS, bonus_points - current[1],
+                       description='Monthly win bonus recalculated')
+
+    @classmethod
+    def balance_at(cls, student_id, when):
+        """
+        Points remaining for a student at a point in time.
+        
+        Returns:
+            int: Running balance of the latest entry at or before `when`
+        """
+        return cls.objects.filter(
+            student_id=student_id,
+            created_at__lte=when
+        ).order_by('-sequence').values_list('balance_after', flat=True).first() or 0
+
+    @classmethod
+    def totals_at(cls, student_id, when):
+        """
+        Points earned and spent by a student at a point in time, replayed from
+        the latest checkpoint (at most CHECKPOINT_INTERVAL entries).
+        
+        Returns:
+            dict: points_earned, points_spent and points_remaining
+        """
+        checkpoint = PointsCheckpoint.objects.filter(
+            student_id=student_id,
+            created_at__lte=when
+        ).order_by('-sequence').first()
+        
+        entries = cls.objects.filter(student_id=student_id, created_at__lte=when)
+        points_earned = points_spent = 0
+        if checkpoint:
+            entries = entries.filter(sequence__gt=checkpoint.sequence)
+            points_earned, points_spent = checkpoint.points_earned, checkpoint.points_spent
+        
+        totals = entries.aggregate(
+            earned=Sum('amount', filter=~Q(kind=cls.KIND_SPEND)),
+            spent=Sum('amount', filter=Q(kind=cls.KIND_SPEND)),
+        )
+        points_earned += totals['earned'] or 0
+        points_spent -= totals['spent'] or 0
+        return {
+            'points_earned': points_earned,
+            'points_spent': points_spent,
+            'points_remaining': points_earned - points_spent,
+        }
+
+
+class PointsCheckpoint(models.Model):
+    """Periodic snapshot of a student's ledger totals for point-in-time queries"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    sequence = models.IntegerField(help_text="Ledger sequence number this checkpoint covers")
+    points_earned = models.IntegerField()
+    points_spent = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['student', '-sequence']
+        indexes = [
+            models.Index(fields=['student', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.name} - checkpoint #{self.sequence}"
+
+
+class SubjectStanding(models.Model):
+    """
+    Precomputed standing of a student within a subject.
+
+    Rows are rebuilt per (subject, class_number) partition whenever an exam in
+    that partition is written, so subject ranks, champion counts and subject
+    leaderboards become indexed lookups. A class_number of NULL holds the
+    standings across all classes.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    class_number = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Class partition of this standing (empty means all classes)"
+    )
+    total_marks_obtained = models.IntegerField(default=0)
+    total_possible_marks = models.IntegerField(default=0)
+    exam_count = models.IntegerField(default=0, help_text="Unique exams taken in this subject")
+    average_percentage = models.FloatField(default=0)
+    best_percentage = models.FloatField(default=0)
+    rank = models.IntegerField()
+
+    class Meta:
+        ordering = ['subject', 'class_number', 'rank']
+        indexes = [
+            models.Index(fields=['subject', 'class_number', 'rank']),
+            models.Index(fields=['student', 'class_number', 'rank']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.name} - {self.subject.name} (#{self.rank})"
+
+
+class ExamRollup(models.Model):
+    """
+    Exam totals of one (student, subject, exam type, class, month) cell.
+
+    Rows are rebuilt per (class_number, month) slice by the recalculation
+    queue (see RollupService), so analytics sum this much smaller table at
+    any coarser grain instead of scanning every exam.
+
+    exam_count counts the student's unique exams, which adds up correctly
+    while the student stays part of the grain. session_count counts every
+    unique exam once, at the cell of the lowest student id that took it, so
+    it adds up to unique exams across students. Both assume an exam_id is
+    one subject and exam type on one date, as bulk entry records it.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='rollups')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    exam_type = models.ForeignKey(ExamType, on_delete=models.CASCADE)
+    class_number = models.IntegerField()
+    month = models.DateField(help_text="First day of the month")
+    marks_obtained = models.IntegerField(default=0)
+    marks_possible = models.IntegerField(default=0)
+    record_count = models.IntegerField(default=0, help_text="Exam result rows")
+    exam_count = models.IntegerField(default=0, help_text="Unique exams of the student")
+    session_count = models.IntegerField(default=0, help_text="Unique exams, counted once across students")
+    excellent_count = models.IntegerField(default=0, help_text="Results reaching the excellence threshold")
+    points = models.IntegerField(default=0, help_text="Exam points earned (without monthly bonuses)")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['class_number', 'month', 'subject', 'exam_type', 'student'],
+                name='unique_exam_rollup_cell',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['student', 'month']),
+            models.Index(fields=['subject', 'class_number']),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id}/{self.subject_id}/{self.exam_type_id} class {self.class_number} {self.month:%Y-%m}"
+
+
+class RankingSnapshot(models.Model):
+    """
+    Overall rank of a student as it stood at the end of one day or month.
+
+    Snapshots are taken per class partition (a class_number of NULL ranks
+    across all classes) by the take_ranking_snapshots command, and retaken
+    by the recalculation queue when exams of an already snapshotted period
+    change, so rank history is read from here instead of replaying exams.
+    """
+    PERIOD_DAY = 'day'
+    PERIOD_MONTH = 'month'
+    PERIOD_CHOICES = [
+        (PERIOD_DAY, 'Daily'),
+        (PERIOD_MONTH, 'Monthly'),
+    ]
+
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    as_of = models.DateField(help_text="Last day covered (month snapshots: last day of the month)")
+    class_number = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Class partition of this snapshot (empty means all classes)"
+    )
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='ranking_snapshots')
+    rank = models.IntegerField()
+    cohort_size = models.IntegerField(help_text="Students ranked in this snapshot")
+    average_percentage = models.FloatField(default=0)
+    points = models.IntegerField(default=0, help_text="Points earned up to as_of")
+
+    class Meta:
+        ordering = ['as_of', 'rank']
+        indexes = [
+            models.Index(fields=['student', 'period', 'class_number', 'as_of']),
+            models.Index(fields=['period', 'class_number', 'as_of', 'rank']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.name} #{self.rank} on {self.as_of} ({self.period})"
+
+
+class RecalcJob(models.Model):
+    """
+    Pending recalculation of derived data, queued by exam writes and
+    processed by the run_recalc_worker command.
+    
+    (kind, key) is unique, so repeated writes touching the same student,
+    month or standings partition coalesce into one job that keeps the time
+    of the first enqueue (used to report queue lag).
+    """
+    KIND_STUDENT = 'student'
+    # Month jobs also rebuild the ExamRollup slice of that month and class
+    KIND_MONTH = 'month'
+    KIND_STANDINGS = 'standings'
+    KIND_CHOICES = [
+        (KIND_STUDENT, 'Student lifetime points'),
+        (KIND_MONTH, 'Monthly ranking cohort'),
+        (KIND_STANDINGS, 'Subject standings partition'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    key = models.CharField(max_length=50, help_text="Student id, 'YYYY-MM:class' or 'subject:class'")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Recalculation Job"
+        verbose_name_plural = "Recalculation Queue"
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_recalc_job'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key}"
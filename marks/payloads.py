@@ -0,0 +1,211 @@
+"""
+Compact columnar chart payloads.
+
+Chart data is sent column by column instead of as a list of row objects:
+
+    {
+        "version": 1,
+        "length": 3,
+        "scale": 100,
+        "columns": {"subject": [0, 1, 0], "day": [20163, 20170, 20171], "percentage": [8750, 6425, 9100]},
+        "encodings": {"subject": "dictionary", "day": "epoch_day", "percentage": "scaled"},
+        "dictionaries": {"subject": {"id": [3, 5], "name": ["Mathematics", "Physics"]}}
+    }
+
+- "dictionary" columns hold indexes into a lookup table of distinct
+  values (null for a missing value), so repeated labels are sent once.
+  A null column means row i uses entry i (every row has its own entry).
+- "scaled" columns hold numbers multiplied by `scale` and rounded to
+  integers (percentages to 0.01).
+- "epoch_day" columns hold dates as days since 1970-01-01.
+- Other columns hold plain values.
+
+static/js/columnar.js (and `rows` here) decode a payload back into rows. JSON responses
+are serialised with orjson when it is installed and compressed with
+Brotli or gzip, whichever the client accepts (see `compressed`).
+"""
+import gzip
+import json
+from datetime import date, timedelta
+from functools import wraps
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the standard library is the fallback
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+FORMAT_VERSION = 1
+
+# Percentages are sent as integer hundredths
+PERCENT_SCALE = 100
+
+# Smaller responses are not worth compressing
+MIN_COMPRESS_SIZE = 200
+
+EPOCH = date(1970, 1, 1)
+
+
+class Columns:
+    """Builds a columnar payload one column at a time"""
+
+    def __init__(self, length, scale=PERCENT_SCALE):
+        self.length = length
+        self.scale = scale
+        self.columns = {}
+        self.encodings = {}
+        self.dictionaries = {}
+
+    def plain(self, name, values):
+        self.columns[name] = list(values)
+        return self
+
+    def scaled(self, name, values):
+        self.columns[name] = [None if value is None else round(float(value) * self.scale) for value in values]
+        self.encodings[name] = 'scaled'
+        return self
+
+    def days(self, name, dates):
+        self.columns[name] = [(value - EPOCH).days for value in dates]
+        self.encodings[name] = 'epoch_day'
+        return self
+
+    def dictionary(self, name, keys, lookup):
+        """
+        Dictionary-encode a column.
+
+        Args:
+            keys: The key of each row (None for a missing value)
+            lookup: Key -> dict of fields describing it, e.g. {'id': 3, 'name': 'Physics'}
+        """
+        codes = {}
+        column = []
+        for key in keys:
+            if key is None:
+                column.append(None)
+            else:
+                column.append(codes.setdefault(key, len(codes)))
+
+        entries = [lookup[key] for key in codes]
+        fields = list(entries[0]) if entries else []
+        # Row i uses entry i: the codes would only repeat 0..n-1
+        self.columns[name] = None if len(codes) == len(column) else column
+        self.encodings[name] = 'dictionary'
+        self.dictionaries[name] = {field: [entry[field] for entry in entries] for field in fields}
+        return self
+
+    def payload(self):
+        return {
+            'version': FORMAT_VERSION,
+            'length': self.length,
+            'scale': self.scale,
+            'columns': self.columns,
+            'encodings': self.encodings,
+            'dictionaries': self.dictionaries,
+        }
+
+
+def rows(payload):
+    """
+    Decode a payload back into row dicts (the Python twin of columnar.js).
+
+    Returns:
+        list: One dict per row; dictionary columns become their entry dict,
+        scaled columns floats and epoch_day columns dates
+    """
+    decoded = {}
+    for name, values in payload['columns'].items():
+        encoding = payload['encodings'].get(name)
+        if encoding == 'dictionary':
+            dictionary = payload['dictionaries'][name]
+            entries = [dict(zip(dictionary, entry)) for entry in zip(*dictionary.values())]
+            values = entries if values is None else [None if code is None else entries[code] for code in values]
+        elif encoding == 'scaled':
+            values = [None if value is None else value / payload['scale'] for value in values]
+        elif encoding == 'epoch_day':
+            values = [EPOCH + timedelta(days=day) for day in values]
+        decoded[name] = values
+    return [{name: values[i] for name, values in decoded.items()} for i in range(payload['length'])]
+
+
+def dumps(data):
+    """
+    Serialise to compact JSON bytes (orjson when installed).
+
+    Returns:
+        bytes: UTF-8 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def json_response(data, status=200):
+    """A JSON response serialised with `dumps`"""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the response encoding from an Accept-Encoding header.
+
+    Returns:
+        str or None: 'br', 'gzip' or None for identity
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(response, accept_encoding):
+    """Compress a response body in place with the negotiated encoding"""
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if (
+        response.streaming
+        or response.has_header('Content-Encoding')
+        or len(response.content) < MIN_COMPRESS_SIZE
+    ):
+        return response
+
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding == 'br':
+        content = brotli.compress(response.content, quality=5)
+    elif encoding == 'gzip':
+        content = gzip.compress(response.content, compresslevel=6, mtime=0)
+    else:
+        return response
+    if len(content) >= len(response.content):
+        return response
+
+    response.content = content
+    response.headers['Content-Length'] = str(len(content))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def compressed(view):
+    """View decorator: Brotli/gzip-compress the response for clients that accept it"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        return compress(response, request.headers.get('Accept-Encoding', ''))
+    return wrapper
@@ -0,0 +1,138 @@
+"""
+On-demand Python profiling of requests.
+
+Two profilers, both from the standard library:
+
+- "sample": a thread samples the request thread's stack every
+  PROFILE_SAMPLE_INTERVAL seconds and counts identical stacks. The result
+  is written in the folded ("collapsed") stack format read by
+  flamegraph.pl, speedscope and inferno:
+
+      marks.views:leaderboard;marks.services:ClassAnalyticsService.overall_rankings;... 42
+
+- "cprofile": deterministic cProfile timings of every call, written as a
+  pstats file (python -m pstats, snakeviz, flameprof).
+
+Profiles are written to settings.PROFILE_DIR. Staff can profile any page
+with ?_profile=1 (see ProfilingMiddleware in middleware.py); any URL can be
+profiled offline with `python manage.py profile_view <url>`.
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+MODES = ('sample', 'cprofile')
+
+EXTENSIONS = {'sample': 'folded', 'cprofile': 'prof'}
+
+
+def _module_roots():
+    # Longest first, so site-packages wins over its parent directories
+    return sorted((str(Path(entry).resolve()) + os.sep for entry in sys.path if entry), key=len, reverse=True)
+
+
+class Sampler:
+    """Samples the stack of the thread that enters it"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or settings.PROFILE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self.frame_names = {}
+        self.roots = _module_roots()
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        # Let the sampler thread take the GIL as often as it samples
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch_interval, self.interval))
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self.switch_interval)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self.frame_name(frame.f_code))
+                frame = frame.f_back
+            # The outermost frames (this module's caller) come first
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def frame_name(self, code):
+        """'package.module:function' of a code object (file path when outside sys.path)"""
+        name = self.frame_names.get(code)
+        if name is None:
+            filename = code.co_filename
+            for root in self.roots:
+                if filename.startswith(root):
+                    filename = filename[len(root):].rsplit('.', 1)[0].replace(os.sep, '.')
+                    break
+            name = f"{filename}:{getattr(code, 'co_qualname', code.co_name)}".replace(';', ',').replace(' ', '_')
+            self.frame_names[code] = name
+        return name
+
+    def folded(self):
+        """The samples in folded stack format, one 'stack count' line per distinct stack"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    """Runs a callable under one of the profilers and writes the result"""
+
+    def __init__(self, mode='sample'):
+        if mode not in MODES:
+            raise ValueError(f'Profiling mode must be one of {", ".join(MODES)}, not {mode!r}')
+        self.mode = mode
+        self.profiler = None
+
+    def run(self, func, *args, **kwargs):
+        """
+        Call func under the profiler.
+
+        Returns:
+            The return value of func
+        """
+        if self.mode == 'sample':
+            self.profiler = Sampler()
+            with self.profiler:
+                return func(*args, **kwargs)
+        self.profiler = cProfile.Profile()
+        return self.profiler.runcall(func, *args, **kwargs)
+
+    def content(self):
+        """The folded stacks of a sampling profile (None for cProfile)"""
+        return self.profiler.folded() if self.mode == 'sample' else None
+
+    def write(self, label, directory=None):
+        """
+        Write the profile to PROFILE_DIR (or directory).
+
+        Args:
+            label: Describes what was profiled, e.g. the request path
+
+        Returns:
+            Path: The written file
+        """
+        directory = Path(directory or settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-')[:80] or 'root'
+        path = directory / f'{timezone.now():%Y%m%d-%H%M%S-%f}-{slug}.{EXTENSIONS[self.mode]}'
+        if self.mode == 'sample':
+            path.write_text(self.content())
+        else:
+            self.profiler.dump_stats(path)
+        return path
@@ -0,0 +1,119 @@
+"""
+Typeahead search over student and subject names.
+
+Names are stored normalized (lowercase, single spaces) in an indexed
+name_normalized column. Each process compiles them into a prefix trie
+whose nodes keep their first matches in name order, so a lookup walks one
+node per typed character and never touches the database. The trie is
+rebuilt after students or subjects change; other processes notice through
+a shared generation token (see generations.py).
+"""
+import threading
+
+from . import generations
+
+# Most matches kept per trie node (and returned per request)
+MAX_RESULTS = 20
+
+
+def normalize_name(name):
+    """Search key of a name: casefolded, surrounding/repeated whitespace removed"""
+    return ' '.join((name or '').split()).casefold()
+
+
+class PrefixIndex:
+    """
+    Prefix trie over normalized names.
+
+    A name is reachable from its first character and from the start of every
+    following word, so "rah" finds "Fatima Rahman".
+    """
+
+    def __init__(self, entries, generation=None):
+        """
+        Args:
+            entries: (id, name, name_normalized) tuples sorted by name_normalized
+        """
+        self.entries = [(object_id, name) for object_id, name, _ in entries]
+        self.generation = generation
+        self.root = ({}, [])
+        for position, (_, _, normalized) in enumerate(entries):
+            words = normalized.split(' ')
+            starts = {sum(len(word) + 1 for word in words[:i]) for i in range(len(words))}
+            for start in sorted(starts):
+                self._insert(normalized[start:], position)
+
+    def _insert(self, key, position):
+        node = self.root
+        self._add_match(node, position)
+        for char in key:
+            node = node[0].setdefault(char, ({}, []))
+            self._add_match(node, position)
+
+    @staticmethod
+    def _add_match(node, position):
+        # Entries are inserted in name order, so every match list stays sorted
+        # and a repeated entry can only be the last one appended
+        matches = node[1]
+        if len(matches) < MAX_RESULTS and (not matches or matches[-1] != position):
+            matches.append(position)
+
+    def search(self, query, limit=MAX_RESULTS):
+        """
+        Returns:
+            list: Up to `limit` dicts with 'id' and 'name', in name order
+        """
+        node = self.root
+        for char in normalize_name(query):
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return [
+            {'id': self.entries[position][0], 'name': self.entries[position][1]}
+            for position in node[1][:limit]
+        ]
+
+
+def _querysets():
+    from .models import Student, Subject
+    return {
+        'students': Student.objects.all(),
+        'subjects': Subject.objects.all(),
+    }
+
+
+SOURCES = ('students', 'subjects')
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _generation_key(source):
+    return f'marks:search:generation:{source}'
+
+
+def get_index(source):
+    """The compiled PrefixIndex of 'students' or 'subjects' for this process"""
+    generation = generations.get(_generation_key(source))
+    index = _indexes.get(source)
+    if index is None or index.generation != generation:
+        with _lock:
+            index = _indexes.get(source)
+            if index is None or index.generation != generation:
+                entries = _querysets()[source].order_by('name_normalized', 'id').values_list(
+                    'id', 'name', 'name_normalized'
+                )
+                index = PrefixIndex(list(entries), generation)
+                _indexes[source] = index
+    return index
+
+
+def search(source, query, limit=MAX_RESULTS):
+    """Top matches for a typed prefix (see PrefixIndex.search)"""
+    return get_index(source).search(query, max(1, min(limit, MAX_RESULTS)))
+
+
+def invalidate(source):
+    """Rebuild the index of a source on its next search, in every process"""
+    _indexes.pop(source, None)
+    generations.bump(_generation_key(source))
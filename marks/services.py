@@ -1,16 +1,32 @@
-from django.db.models import Sum, Avg, Count, Q
-from .models import Student, Subject, ExamType, Exam, GradeScale
-
-# Default color mapping for grades (from GradeScale table for consistency)
-DEFAULT_GRADE_COLORS = {
-    'Average': '#FEF08A',
-    'Fail': '#FECACA',
-    'Good': '#D1FAE5',
-    'Horrible': '#FCA5A5',
-    'Poor': '#FDE68A',
-    'Superb': '#A7F3D0',
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, Count, Max, Min, Q, F
+from django.db.models.functions import Coalesce, TruncMonth
+from django.db.models.lookups import GreaterThanOrEqual
+from .models import (
+    Student, Subject, ExamType, Exam, ExamRollup, SubjectStanding,
+    LifetimePoints, PointsSpent, PointsLedgerEntry, PointsCheckpoint, RankingSnapshot,
+    RecalcJob,
+)
+from . import cache as stats_cache
+from . import generations
+from . import grading
+from . import payloads
+
+from collections import Counter, defaultdict
+import numpy as np
+from datetime import date, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+# Bonus points for every fully passed month a student finishes #1
+MONTHLY_WIN_BONUS = 40
+
+# Excellence thresholds per exam type (percentage needed for an "excellent" exam)
+EXCELLENCE_THRESHOLDS = {
+    'CQ': 80,
+    'MCQ': 85,
 }
-from collections import Counter
 
 
 def count_unique_exams(queryset):
@@ -28,94 +44,1341 @@ def count_unique_exams(queryset):
     return queryset.values('exam_id').distinct().count()
 
 
+def percentage_expression():
+    """
+    SQL expression for an exam's percentage score (the indexed
+    Exam.stored_percentage column). Exams with zero total marks evaluate
+    to 0, matching Exam.percentage.
+    """
+    return F('stored_percentage')
+
+
+def excellence_aggregates(prefix='', exam_type=None, unique_exams=False):
+    """
+    Aggregates counting excellent and total exams in SQL.
+    
+    An exam is excellent when its percentage reaches the threshold of its
+    exam type (CQ >= 80%, MCQ >= 85%). Use with .aggregate() for a single
+    scope or .values(...).annotate() for one grouped query per student,
+    subject or class.
+    
+    Args:
+        prefix: Prefix for the result keys (e.g. 'cq_')
+        exam_type: Restrict both counts to one exam type name
+        unique_exams: Rate against unique exam_id values (a student's
+            total exams) instead of result rows
+        
+    Returns:
+        dict: '<prefix>excellent_exams' and '<prefix>rated_exams' aggregates
+    """
+    percentage = percentage_expression()
+    excellent = Q()
+    for type_name, threshold in EXCELLENCE_THRESHOLDS.items():
+        if exam_type is None or exam_type.upper() == type_name:
+            excellent |= Q(GreaterThanOrEqual(percentage, threshold), exam_type__name__iexact=type_name)
+    if not excellent:
+        # Exam types without a threshold never count as excellent
+        excellent = Q(pk__in=[])
+    
+    scope = Q(exam_type__name__iexact=exam_type) if exam_type else Q()
+    return {
+        f'{prefix}excellent_exams': Count('id', filter=scope & excellent),
+        f'{prefix}rated_exams': Count(
+            'exam_id' if unique_exams else 'id', distinct=unique_exams, filter=scope if exam_type else None
+        ),
+    }
+
+
+def excellence_rate(counts, prefix=''):
+    """
+    Excellence rate from the counts produced by excellence_aggregates().
+    
+    Returns:
+        float: Excellent exams as a percentage of rated exams
+    """
+    rated = counts.get(f'{prefix}rated_exams') or 0
+    if rated == 0:
+        return 0
+    return (counts.get(f'{prefix}excellent_exams') or 0) * 100 / rated
+
+
+def rank_with_ties(rows, score_key='average_percentage', total_key='total_marks'):
+    """
+    Sort rows in place and assign competition ranks.
+    
+    Ranking Rules:
+    1. Primary: score_key descending
+    2. Tie-breaker: total_key descending
+    3. If both are equal, rows share the same rank
+    
+    Args:
+        rows: List of dicts containing score_key and total_key
+        
+    Returns:
+        list: The same rows, sorted, each with a 'rank' key
+    """
+    rows.sort(key=lambda x: (x[score_key], x[total_key]), reverse=True)
+    current_rank = 1
+    for idx, row in enumerate(rows):
+        if idx > 0:
+            prev = rows[idx - 1]
+            if not (abs(row[score_key] - prev[score_key]) < 0.01 and
+                    row[total_key] == prev[total_key]):
+                current_rank = idx + 1
+        row['rank'] = current_rank
+    return rows
+
+
+class StandingsService:
+    """Service class maintaining the precomputed SubjectStanding table"""
+    
+    @staticmethod
+    def refresh_subject(subject_id, class_number=None):
+        """
+        Rebuild the standings of one (subject, class_number) partition.
+        A class_number of None rebuilds the all-classes partition.
+        """
+        exams = Exam.objects.filter(subject_id=subject_id)
+        if class_number is not None:
+            exams = exams.filter(class_number=class_number)
+        
+        rows = list(
+            exams.values('student_id').annotate(
+                total_obtained=Sum('mark_obtained'),
+                total_possible=Sum('total_marks'),
+                exam_count=Count('exam_id', distinct=True),
+                best_percentage=Max(percentage_expression()),
+            )
+        )
+        for row in rows:
+            total_possible = row['total_possible'] or 0
+            row['average_percentage'] = (
+                (row['total_obtained'] * 100 / total_possible) if total_possible > 0 else 0
+            )
+        rank_with_ties(rows, total_key='total_obtained')
+        
+        with transaction.atomic():
+            SubjectStanding.objects.filter(
+                subject_id=subject_id,
+                class_number=class_number
+            ).delete()
+            SubjectStanding.objects.bulk_create([
+                SubjectStanding(
+                    student_id=row['student_id'],
+                    subject_id=subject_id,
+                    class_number=class_number,
+                    total_marks_obtained=row['total_obtained'] or 0,
+                    total_possible_marks=row['total_possible'] or 0,
+                    exam_count=row['exam_count'],
+                    average_percentage=row['average_percentage'],
+                    best_percentage=row['best_percentage'] or 0,
+                    rank=row['rank'],
+                )
+                for row in rows
+            ])
+    
+    @staticmethod
+    def refresh_for_exam(subject_id, class_number):
+        """Rebuild the partitions an exam in (subject, class_number) belongs to"""
+        StandingsService.refresh_subject(subject_id)
+        StandingsService.refresh_subject(subject_id, class_number)
+    
+    @staticmethod
+    def rebuild_all():
+        """Rebuild every standings partition from the exam table"""
+        # Exam's default ordering would make every row distinct
+        partitions = Exam.objects.values_list('subject_id', 'class_number').distinct().order_by()
+        with transaction.atomic():
+            SubjectStanding.objects.all().delete()
+            refreshed_subjects = set()
+            for subject_id, class_number in partitions:
+                if subject_id not in refreshed_subjects:
+                    StandingsService.refresh_subject(subject_id)
+                    refreshed_subjects.add(subject_id)
+                StandingsService.refresh_subject(subject_id, class_number)
+    
+    @staticmethod
+    def subject_leaders(class_number=None, limit=10):
+        """
+        Get the top standings of every subject in one query.
+        
+        Returns:
+            dict: Subject id mapped to its top `limit` SubjectStanding rows
+        """
+        standings = SubjectStanding.objects.filter(
+            class_number=class_number,
+            rank__lte=limit
+        ).select_related('student').order_by('subject_id', 'rank', 'student__name')
+        
+        leaders = {}
+        for standing in standings:
+            subject_leaders = leaders.setdefault(standing.subject_id, [])
+            if len(subject_leaders) < limit:
+                subject_leaders.append(standing)
+        return leaders
+
+
+class RollupService:
+    """
+    Service class maintaining and querying the ExamRollup cube.
+    
+    The cube is rebuilt per (class_number, month) slice whenever a month job
+    of the recalculation queue is processed; query() rolls it up to any
+    coarser grain with a single GROUP BY.
+    """
+    
+    # Dimension names accepted by query() and their ExamRollup columns
+    DIMENSIONS = {
+        'student': 'student_id',
+        'subject': 'subject_id',
+        'exam_type': 'exam_type_id',
+        'class': 'class_number',
+        'month': 'month',
+    }
+    
+    @staticmethod
+    def build_rows(exams):
+        """
+        Compute the rollup rows of every cell covered by an exam queryset.
+        
+        Returns:
+            list: Unsaved ExamRollup instances
+        """
+        registry = grading.get_registry()
+        thresholds = {
+            exam_type_id: EXCELLENCE_THRESHOLDS.get((name or '').upper())
+            for exam_type_id, name in registry.exam_type_names.items()
+        }
+        cells, exam_ids, owners = {}, defaultdict(set), {}
+        for student_id, subject_id, exam_type_id, class_number, exam_date, exam_id, mark_obtained, total_marks in (
+            exams.order_by().values_list(
+                'student_id', 'subject_id', 'exam_type_id', 'class_number', 'date', 'exam_id',
+                'mark_obtained', 'total_marks',
+            ).iterator()
+        ):
+            month = exam_date.replace(day=1)
+            key = (class_number, month, subject_id, exam_type_id, student_id)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = ExamRollup(
+                    class_number=class_number, month=month, subject_id=subject_id,
+                    exam_type_id=exam_type_id, student_id=student_id,
+                )
+            cell.marks_obtained += mark_obtained
+            cell.marks_possible += total_marks
+            cell.record_count += 1
+            if total_marks > 0:
+                # Same expression as excellence_aggregates()
+                threshold = thresholds.get(exam_type_id)
+                if threshold is not None and mark_obtained * 100 / total_marks >= threshold:
+                    cell.excellent_count += 1
+            percentage = (mark_obtained / total_marks) * 100 if total_marks > 0 else 0
+            cell.points += registry.policy_for_exam_type_id(exam_type_id).points_for(percentage)
+            if exam_id is not None:
+                exam_ids[key].add(exam_id)
+                owner = key[:4] + (exam_id,)
+                owners[owner] = min(owners.get(owner, student_id), student_id)
+        
+        for key, cell in cells.items():
+            cell.exam_count = len(exam_ids[key])
+            cell.session_count = sum(
+                1 for exam_id in exam_ids[key] if owners[key[:4] + (exam_id,)] == cell.student_id
+            )
+        return list(cells.values())
+    
+    @staticmethod
+    def refresh(slices, batch_size=500):
+        """
+        Rebuild the rollup rows of some (class_number, first day of month) slices.
+        
+        Returns:
+            int: Number of rollup rows written
+        """
+        if not slices:
+            return 0
+        exam_filter, rollup_filter = Q(), Q()
+        for class_number, month in slices:
+            end = (month + timedelta(days=32)).replace(day=1)
+            exam_filter |= Q(class_number=class_number, date__gte=month, date__lt=end)
+            rollup_filter |= Q(class_number=class_number, month=month)
+        rows = RollupService.build_rows(Exam.objects.filter(exam_filter))
+        with transaction.atomic():
+            ExamRollup.objects.filter(rollup_filter).delete()
+            ExamRollup.objects.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
+    
+    @staticmethod
+    def rebuild_all(batch_size=500):
+        """Rebuild the whole cube from the exam table; returns the number of rows"""
+        rows = RollupService.build_rows(Exam.objects.all())
+        with transaction.atomic():
+            ExamRollup.objects.all().delete()
+            ExamRollup.objects.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
+    
+    @staticmethod
+    def query(group_by=(), class_number=None, **filters):
+        """
+        Roll the cube up to a coarser grain with one GROUP BY.
+        
+        Unique exams add up per student while the student is part of the
+        grain (grouped by, or fixed with a student_id filter); otherwise
+        every exam is counted once across students.
+        
+        Args:
+            group_by: Dimension names (see DIMENSIONS), e.g. ('subject', 'month')
+            class_number: Restrict to one class (default: all classes)
+            **filters: Lookups on ExamRollup, e.g. student_id=3 or
+                month__lt=date(2025, 1, 1)
+                
+        Returns:
+            list: One dict per group, ordered by the group columns, with the
+            dimension columns plus total_obtained, total_possible,
+            average_percentage, unique_exams, rated_exams, excellent_exams
+            and points
+        """
+        if class_number is not None:
+            filters['class_number'] = class_number
+        fields = [RollupService.DIMENSIONS[name] for name in group_by]
+        per_student = 'student' in group_by or 'student_id' in filters or 'student' in filters
+        aggregates = {
+            'total_obtained': Coalesce(Sum('marks_obtained'), 0),
+            'total_possible': Coalesce(Sum('marks_possible'), 0),
+            'unique_exams': Coalesce(Sum('exam_count' if per_student else 'session_count'), 0),
+            'rated_exams': Coalesce(Sum('record_count'), 0),
+            'excellent_exams': Coalesce(Sum('excellent_count'), 0),
+            'points': Coalesce(Sum('points'), 0),
+        }
+        rollups = ExamRollup.objects.filter(**filters)
+        if fields:
+            rows = list(rollups.values(*fields).annotate(**aggregates).order_by(*fields))
+        else:
+            rows = [rollups.aggregate(**aggregates)]
+        for row in rows:
+            row['average_percentage'] = (
+                (row['total_obtained'] * 100 / row['total_possible']) if row['total_possible'] > 0 else 0
+            )
+        return rows
+    
+    @staticmethod
+    def monthly_rankings(class_number=None, before=None):
+        """
+        Rank students within every fully passed month.
+        
+        Ranked by average score, then total marks (ties share a rank), so
+        rank 1 rows are the monthly winners (see PointsService.monthly_winners).
+        
+        Args:
+            class_number: Rank within one class only (default: all classes)
+            before: First day of the current month (default: today)
+            
+        Returns:
+            dict: (year, month) mapped to the ranked query() rows of that month
+        """
+        if before is None:
+            before = date.today().replace(day=1)
+        months = defaultdict(list)
+        for row in RollupService.query(('month', 'student'), class_number, month__lt=before):
+            months[(row['month'].year, row['month'].month)].append(row)
+        return {
+            month: rank_with_ties(rows, total_key='total_obtained')
+            for month, rows in months.items()
+        }
+
+
+class PointsService:
+    """Service class recomputing lifetime points in bulk (audits and batch repairs)"""
+    
+    @staticmethod
+    def monthly_winners(class_number=None, before=None):
+        """
+        Find the #1 student(s) of every fully passed month.
+        
+        Uses one grouped query over (month, student); ties on average score
+        AND total marks share the win, as in Student.calculate_monthly_wins.
+        
+        Args:
+            class_number: Rank within one class only (default: all classes)
+            before: First day of the current month (default: today)
+            
+        Returns:
+            dict: (year, month) mapped to the set of winning student ids
+        """
+        if before is None:
+            before = date.today().replace(day=1)
+        
+        exams = Exam.objects.filter(date__lt=before)
+        if class_number is not None:
+            exams = exams.filter(class_number=class_number)
+        rows = exams.annotate(month=TruncMonth('date')).values('month', 'student_id').annotate(
+            obtained=Sum('mark_obtained'),
+            possible=Sum('total_marks'),
+        ).order_by('month')
+        
+        def month_winners(month_rows):
+            top_avg, top_total, _ = max(month_rows, key=lambda x: (x[0], x[1]))
+            return {
+                student_id for avg, total, student_id in month_rows
+                if abs(avg - top_avg) < 0.01 and total == top_total
+            }
+        
+        winners = {}
+        current_month, month_rows = None, []
+        for row in rows.iterator():
+            if row['month'] != current_month:
+                if month_rows:
+                    winners[(current_month.year, current_month.month)] = month_winners(month_rows)
+                current_month, month_rows = row['month'], []
+            possible = row['possible'] or 0
+            avg = (row['obtained'] * 100 / possible) if possible > 0 else 0
+            month_rows.append((avg, row['obtained'], row['student_id']))
+        if month_rows:
+            winners[(current_month.year, current_month.month)] = month_winners(month_rows)
+        return winners
+    
+    @staticmethod
+    def expected_points(student_ids=None, chunk_size=2000, include_spent=True):
+        """
+        Recompute lifetime points from the raw tables, independently of the
+        stored LifetimePoints rows.
+        
+        Exams are streamed in chunks as plain tuples, so memory grows with the
+        number of students rather than the number of exams.
+        
+        Args:
+            include_spent: Also total the PointsSpent rows; without it drift
+                checks and repairs leave points_spent alone
+        
+        Returns:
+            dict: Student id mapped to points_earned, bonus_points and (with
+            include_spent) points_spent
+        """
+        exam_points = defaultdict(int)
+        registry = grading.get_registry()
+        exams = Exam.objects.order_by('pk').values_list(
+            'student_id', 'exam_type_id', 'mark_obtained', 'total_marks'
+        )
+        if student_ids is not None:
+            exams = exams.filter(student_id__in=student_ids)
+        for student_id, exam_type_id, mark_obtained, total_marks in exams.iterator(chunk_size=chunk_size):
+            percentage = (mark_obtained / total_marks) * 100 if total_marks > 0 else 0
+            exam_points[student_id] += registry.policy_for_exam_type_id(exam_type_id).points_for(percentage)
+        
+        monthly_wins = Counter()
+        for winners in PointsService.monthly_winners().values():
+            monthly_wins.update(winners)
+        
+        points_spent = {}
+        if include_spent:
+            spends = PointsSpent.objects.values('student_id').annotate(total=Sum('points_spent'))
+            if student_ids is not None:
+                spends = spends.filter(student_id__in=student_ids)
+            points_spent = {row['student_id']: row['total'] or 0 for row in spends}
+        
+        students = Student.objects.values_list('id', flat=True)
+        if student_ids is not None:
+            students = students.filter(id__in=student_ids)
+        
+        expected = {}
+        for student_id in students.iterator(chunk_size=chunk_size):
+            bonus_points = monthly_wins[student_id] * MONTHLY_WIN_BONUS
+            expected[student_id] = {
+                'points_earned': exam_points[student_id] + bonus_points,
+                'bonus_points': bonus_points,
+            }
+            if include_spent:
+                expected[student_id]['points_spent'] = points_spent.get(student_id, 0)
+        return expected
+    
+    @staticmethod
+    def find_drift(expected, chunk_size=2000):
+        """
+        Compare stored LifetimePoints against recomputed totals.
+        
+        Args:
+            expected: Result of expected_points()
+            
+        Returns:
+            list: One dict per drifted student with 'student_id', 'stored' and
+            'expected' totals (a missing LifetimePoints row counts as zeros);
+            only the totals present in expected are compared
+        """
+        fields = ('points_earned', 'bonus_points', 'points_spent')
+        stored = {}
+        rows = LifetimePoints.objects.values_list('student_id', *fields)
+        for student_id, *values in rows.iterator(chunk_size=chunk_size):
+            if student_id in expected:
+                stored[student_id] = dict(zip(fields, values))
+        
+        drift = []
+        for student_id, totals in expected.items():
+            current = stored.get(student_id, dict.fromkeys(fields, 0))
+            current = {field: current[field] for field in totals}
+            if current != totals:
+                drift.append({'student_id': student_id, 'stored': current, 'expected': totals})
+        return drift
+    
+    @staticmethod
+    def repair(drift, batch_size=500, description='Audit correction'):
+        """
+        Correct drifted LifetimePoints rows with bulk writes.
+        
+        Every correction is appended to the points ledger (with checkpoints)
+        so the projection and its history stay consistent.
+        
+        Args:
+            drift: Result of find_drift()
+            description: Ledger description for the correcting entries
+            
+        Returns:
+            int: Number of LifetimePoints rows corrected
+        """
+        if not drift:
+            return 0
+        student_ids = [item['student_id'] for item in drift]
+        
+        with transaction.atomic():
+            LifetimePoints.provision_missing(student_ids)
+            projections = {
+                lp.student_id: lp
+                for lp in LifetimePoints.objects.select_for_update().filter(student_id__in=student_ids)
+            }
+            
+            entries, checkpoints = [], []
+            for item in drift:
+                lp = projections[item['student_id']]
+                expected = item['expected']
+                deltas = [
+                    (PointsLedgerEntry.KIND_EARN,
+                     (expected['points_earned'] - expected['bonus_points']) - (lp.points_earned - lp.bonus_points)),
+                    (PointsLedgerEntry.KIND_BONUS, expected['bonus_points'] - lp.bonus_points),
+                ]
+                if 'points_spent' in expected:
+                    deltas.append((PointsLedgerEntry.KIND_SPEND, lp.points_spent - expected['points_spent']))
+                for kind, amount in deltas:
+                    if not amount:
+                        continue
+                    if kind == PointsLedgerEntry.KIND_SPEND:
+                        lp.points_spent -= amount
+                    else:
+                        lp.points_earned += amount
+                        if kind == PointsLedgerEntry.KIND_BONUS:
+                            lp.bonus_points += amount
+                    lp.ledger_sequence += 1
+                    entries.append(PointsLedgerEntry(
+                        student_id=lp.student_id,
+                        kind=kind,
+                        amount=amount,
+                        balance_after=lp.points_remaining,
+                        sequence=lp.ledger_sequence,
+                        description=description,
+                    ))
+                    if lp.ledger_sequence % PointsLedgerEntry.CHECKPOINT_INTERVAL == 0:
+                        checkpoints.append(PointsCheckpoint(
+                            student_id=lp.student_id,
+                            sequence=lp.ledger_sequence,
+                            points_earned=lp.points_earned,
+                            points_spent=lp.points_spent,
+                        ))
+            
+            PointsLedgerEntry.objects.bulk_create(entries, batch_size=batch_size)
+            PointsCheckpoint.objects.bulk_create(checkpoints, batch_size=batch_size)
+            LifetimePoints.objects.bulk_update(
+                projections.values(),
+                ['points_earned', 'bonus_points', 'points_spent', 'ledger_sequence'],
+                batch_size=batch_size,
+            )
+            # Bulk writes send no signals; the all-classes rankings rank by
+            # lifetime points earned
+            transaction.on_commit(ClassAnalyticsService.invalidate)
+        return len(projections)
+
+
+class RecalcQueueService:
+    """
+    Service class for the coalescing recalculation queue.
+    
+    Exam writes only record which students, months and standings partitions
+    became dirty; run_recalc_worker recomputes them in batches, so a bulk
+    import touching one month triggers one cohort recalculation instead of
+    one per exam.
+    """
+    
+    @staticmethod
+    def enqueue_exam_change(student_id, subject_id, class_number, exam_date):
+        """
+        Mark everything derived from one exam as dirty.
+        
+        Runs inside the caller's transaction, so a rolled back write leaves
+        no job behind; already queued jobs are kept (coalesced).
+        """
+        if isinstance(exam_date, str):
+            exam_date = parse_date(exam_date)
+        jobs = [
+            RecalcJob(kind=RecalcJob.KIND_STANDINGS, key=f"{subject_id}:"),
+            RecalcJob(kind=RecalcJob.KIND_STANDINGS, key=f"{subject_id}:{class_number}"),
+        ]
+        if student_id:
+            jobs.append(RecalcJob(kind=RecalcJob.KIND_STUDENT, key=str(student_id)))
+        if exam_date:
+            jobs.append(RecalcJob(
+                kind=RecalcJob.KIND_MONTH,
+                key=f"{exam_date.year:04d}-{exam_date.month:02d}:{class_number}",
+            ))
+        RecalcJob.objects.bulk_create(jobs, ignore_conflicts=True)
+        
+        if getattr(settings, 'RECALC_QUEUE_SYNC', False):
+            transaction.on_commit(RecalcQueueService.process_all)
+    
+    @staticmethod
+    def enqueue_students(student_ids=None):
+        """Queue a lifetime points recalculation for some (default: all) students"""
+        if student_ids is None:
+            student_ids = Student.objects.values_list('id', flat=True)
+        RecalcJob.objects.bulk_create(
+            [RecalcJob(kind=RecalcJob.KIND_STUDENT, key=str(student_id)) for student_id in student_ids],
+            ignore_conflicts=True,
+        )
+        if getattr(settings, 'RECALC_QUEUE_SYNC', False):
+            transaction.on_commit(RecalcQueueService.process_all)
+    
+    @staticmethod
+    def enqueue_months():
+        """Queue a rebuild of every month and class with exams (e.g. after grading changes)"""
+        class_months = Exam.objects.annotate(month=TruncMonth('date')).values_list(
+            'month', 'class_number'
+        ).distinct().order_by()
+        RecalcJob.objects.bulk_create(
+            [
+                RecalcJob(kind=RecalcJob.KIND_MONTH, key=f"{month.year:04d}-{month.month:02d}:{class_number}")
+                for month, class_number in class_months
+            ],
+            ignore_conflicts=True,
+        )
+        if getattr(settings, 'RECALC_QUEUE_SYNC', False):
+            transaction.on_commit(RecalcQueueService.process_all)
+    
+    @staticmethod
+    def claim_batch(batch_size=500):
+        """
+        Take the oldest jobs off the queue.
+        
+        Jobs are deleted when claimed, so a write arriving while the batch is
+        being processed queues a fresh job instead of coalescing into one that
+        is about to be discarded.
+        """
+        with transaction.atomic():
+            jobs = list(
+                RecalcJob.objects.select_for_update(skip_locked=True).order_by('created_at')[:batch_size]
+            )
+            if jobs:
+                RecalcJob.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+        return jobs
+    
+    @staticmethod
+    def process_jobs(jobs):
+        """
+        Recompute everything the given jobs mark as dirty.
+        
+        Dirty months expand to every student with an exam in that month (the
+        monthly win bonus is ranked across classes); lifetime points earned
+        by the whole cohort are then recomputed and corrected in one batch. The
+        ExamRollup slice of every dirty month and class is rebuilt, and
+        ranking snapshots taken since the earliest dirty month are retaken.
+        
+        Returns:
+            dict: Number of students, months, rollup slices, snapshots and
+            standings partitions processed
+        """
+        # The worker serves no requests, so pick up grading changes here
+        grading.check_generation()
+        student_ids, months, partitions, slices = set(), set(), set(), set()
+        for job in jobs:
+            if job.kind == RecalcJob.KIND_STUDENT:
+                student_ids.add(int(job.key))
+            elif job.kind == RecalcJob.KIND_MONTH:
+                year_month, class_number = job.key.split(':')
+                year, month = year_month.split('-')
+                months.add((int(year), int(month)))
+                if class_number:
+                    slices.add((int(class_number), date(int(year), int(month), 1)))
+            elif job.kind == RecalcJob.KIND_STANDINGS:
+                subject_id, class_number = job.key.split(':')
+                partitions.add((int(subject_id), int(class_number) if class_number else None))
+        
+        if months:
+            month_filter = Q()
+            for year, month in months:
+                start = date(year, month, 1)
+                end = (start + timedelta(days=32)).replace(day=1)
+                month_filter |= Q(date__gte=start, date__lt=end)
+            student_ids.update(
+                Exam.objects.filter(month_filter).values_list('student_id', flat=True).distinct().order_by()
+            )
+        
+        for subject_id, class_number in sorted(partitions, key=lambda p: (p[0], p[1] or 0)):
+            StandingsService.refresh_subject(subject_id, class_number)
+        
+        retaken = 0
+        if slices:
+            class_numbers = {class_number for class_number, _ in slices}
+            with transaction.atomic():
+                RollupService.refresh(slices)
+                # Class analytics read the cube, which only changes here:
+                # bump their generations once the rebuilt slices are visible
+                transaction.on_commit(lambda: ClassAnalyticsService.invalidate(class_numbers))
+            # Back-dated exams change every snapshot taken since their month
+            retaken = SnapshotService.retake_since(min(month for _, month in slices), class_numbers)
+        
+        corrected = 0
+        if student_ids:
+            # Spends are recorded in the ledger as they happen and never queue
+            # a job; reconciling them against a total read before repair()
+            # locks the rows would reverse a spend recorded in between
+            expected = PointsService.expected_points(student_ids, include_spent=False)
+            corrected = PointsService.repair(PointsService.find_drift(expected), description='Recalculated')
+        
+        return {
+            'jobs': len(jobs),
+            'students': len(student_ids),
+            'corrected': corrected,
+            'months': len(months),
+            'slices': len(slices),
+            'snapshots': retaken,
+            'partitions': len(partitions),
+        }
+    
+    @staticmethod
+    def process_batch(batch_size=500):
+        """
+        Claim and process one batch; failed jobs are put back on the queue.
+        
+        Returns:
+            dict: Result of process_jobs(), or None if the queue was empty
+        """
+        jobs = RecalcQueueService.claim_batch(batch_size)
+        if not jobs:
+            return None
+        try:
+            return RecalcQueueService.process_jobs(jobs)
+        except Exception:
+            RecalcJob.objects.bulk_create(
+                [RecalcJob(kind=job.kind, key=job.key, created_at=job.created_at) for job in jobs],
+                ignore_conflicts=True,
+            )
+            raise
+    
+    @staticmethod
+    def process_all(batch_size=500):
+        """Drain the queue; returns the number of jobs processed"""
+        processed = 0
+        while True:
+            result = RecalcQueueService.process_batch(batch_size)
+            if result is None:
+                return processed
+            processed += result['jobs']
+    
+    @staticmethod
+    def stats():
+        """
+        Queue depth and lag (age of the oldest pending job).
+        
+        Returns:
+            dict: 'depth', 'lag_seconds' and per-kind 'by_kind' counts
+        """
+        rows = list(RecalcJob.objects.values('kind').annotate(depth=Count('id'), oldest=Min('created_at')))
+        by_kind = {row['kind']: row['depth'] for row in rows}
+        oldest = min((row['oldest'] for row in rows), default=None)
+        return {
+            'depth': sum(by_kind.values()),
+            'lag_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0,
+            'by_kind': by_kind,
+        }
+
+
+class TrendService:
+    """
+    Service class for per student × subject score trends.
+    
+    All (student, subject, date, percentage) rows of a cohort are loaded with
+    one query and every group is computed at once with NumPy array operations
+    (grouped sums via bincount), so the whole school costs the same number of
+    queries as one student.
+    """
+    
+    # Exams in the rolling average window
+    ROLLING_WINDOW = 3
+    # Smoothing factor of the exponentially weighted mean (weight of the latest exam)
+    EWM_ALPHA = 0.5
+    # Slope (percentage points per 30 days) beyond which a subject counts as improving/slipping
+    TREND_THRESHOLD = 1.0
+    
+    @staticmethod
+    def compute(student_ids=None, subject_ids=None, class_number=None,
+                window=ROLLING_WINDOW, alpha=EWM_ALPHA):
+        """
+        Compute trend statistics for every student × subject pair.
+        
+        Args:
+            student_ids: Only these students (default: everyone)
+            subject_ids: Only these subjects (default: all subjects)
+            class_number: Only exams of this class
+            window: Number of latest exams in the rolling average
+            alpha: Smoothing factor of the exponentially weighted mean
+            
+        Returns:
+            list: One dict per student × subject with exam_count, latest,
+            rolling_average, ewm, slope (percentage points per 30 days, None
+            with fewer than two exam dates) and trend ('improving', 'slipping',
+            'steady' or None)
+        """
+        exams = Exam.objects.order_by('student_id', 'subject_id', 'date', 'id').values_list(
+            'student_id', 'student__name', 'subject_id', 'subject__name', 'date', 'mark_obtained', 'total_marks'
+        )
+        if student_ids is not None:
+            exams = exams.filter(student_id__in=student_ids)
+        if subject_ids is not None:
+            exams = exams.filter(subject_id__in=subject_ids)
+        if class_number is not None:
+            exams = exams.filter(class_number=class_number)
+        rows = list(exams)
+        if not rows:
+            return []
+        
+        student_col, student_names, subject_col, subject_names, dates, obtained, possible = zip(*rows)
+        students = np.array(student_col, dtype=np.int64)
+        subjects = np.array(subject_col, dtype=np.int64)
+        days = np.array(dates, dtype='datetime64[D]').astype(np.int64).astype(np.float64)
+        obtained = np.array(obtained, dtype=np.float64)
+        possible = np.array(possible, dtype=np.float64)
+        pct = np.divide(obtained * 100, possible, out=np.zeros_like(obtained), where=possible > 0)
+        
+        # Rows are sorted by (student, subject, date): label every row with its group
+        n = len(rows)
+        is_start = np.ones(n, dtype=bool)
+        is_start[1:] = (students[1:] != students[:-1]) | (subjects[1:] != subjects[:-1])
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:], n) - 1
+        group = np.cumsum(is_start) - 1
+        counts = np.bincount(group)
+        position = np.arange(n) - starts[group]
+        
+        # Rolling average of the last `window` exams, from a running sum
+        running = np.cumsum(pct)
+        width = np.minimum(position + 1, window)
+        before = np.arange(n) - width
+        rolling = (running - np.where(before >= 0, running[np.maximum(before, 0)], 0)) / width
+        
+        # Exponentially weighted mean, latest exam weighted highest
+        weights = (1 - alpha) ** (counts[group] - 1 - position)
+        ewm = np.bincount(group, weights * pct) / np.bincount(group, weights)
+        
+        # Least-squares slope of percentage over time, on group-centred values
+        day_mean = np.bincount(group, days) / counts
+        pct_mean = np.bincount(group, pct) / counts
+        day_dev = days - day_mean[group]
+        pct_dev = pct - pct_mean[group]
+        spread = np.bincount(group, day_dev * day_dev)
+        covariance = np.bincount(group, day_dev * pct_dev)
+        has_slope = spread > 0
+        slope = np.divide(covariance, spread, out=np.zeros_like(spread), where=has_slope) * 30
+        
+        trends = []
+        for g, (first, last) in enumerate(zip(starts.tolist(), ends.tolist())):
+            group_slope = round(float(slope[g]), 2) if has_slope[g] else None
+            if group_slope is None:
+                trend = None
+            elif group_slope >= TrendService.TREND_THRESHOLD:
+                trend = 'improving'
+            elif group_slope <= -TrendService.TREND_THRESHOLD:
+                trend = 'slipping'
+            else:
+                trend = 'steady'
+            trends.append({
+                'student_id': student_col[first],
+                'student_name': student_names[first],
+                'subject_id': subject_col[first],
+                'subject_name': subject_names[first],
+                'exam_count': int(counts[g]),
+                'first_date': dates[first].isoformat(),
+                'last_date': dates[last].isoformat(),
+                'latest': round(float(pct[last]), 2),
+                'average': round(float(pct_mean[g]), 2),
+                'rolling_average': round(float(rolling[last]), 2),
+                'ewm': round(float(ewm[g]), 2),
+                'slope': group_slope,
+                'trend': trend,
+            })
+        return trends
+
+
+class HeadToHeadService:
+    """
+    Service class for pairwise head-to-head records over shared exams.
+    
+    Results are pivoted into a dense exam × student percentage matrix and
+    every pair is compared at once with NumPy broadcasting, in blocks of
+    exams so memory stays bounded for whole classes.
+    """
+    
+    # Percentages closer than this count as a tie (as for rank ties)
+    TIE_TOLERANCE = 0.01
+    # Most exam × student × student cells compared per block
+    BLOCK_CELLS = 4_000_000
+    
+    @staticmethod
+    def compute(class_number=None):
+        """
+        Head-to-head records of every pair of students who sat the same exams.
+        
+        Two results belong to the same exam when they share an exam_id.
+        
+        Args:
+            class_number: Only exams of this class (default: all classes)
+            
+        Returns:
+            dict: 'student_ids' (array, by name), 'names', and square arrays
+            'wins', 'ties', 'shared' and 'margin' (summed percentage point
+            lead) where [i, j] is student i against student j
+        """
+        rows = list(class_scope(Exam.objects.filter(exam_id__isnull=False), class_number).order_by().values_list(
+            'exam_id', 'student_id', 'mark_obtained', 'total_marks'
+        ))
+        names = dict(Student.objects.filter(id__in={row[1] for row in rows}).values_list('id', 'name'))
+        if not rows:
+            empty = np.zeros((0, 0), dtype=np.int64)
+            return {
+                'student_ids': np.zeros(0, dtype=np.int64), 'names': [],
+                'wins': empty, 'ties': empty, 'shared': empty, 'margin': empty.astype(np.float64),
+            }
+        
+        exam_col, student_col, obtained, possible = zip(*rows)
+        _, exam_index = np.unique(np.array(exam_col, dtype=np.int64), return_inverse=True)
+        student_ids, student_index = np.unique(np.array(student_col, dtype=np.int64), return_inverse=True)
+        
+        # Pivot: one row per exam, one column per student (NaN = did not sit)
+        shape = (int(exam_index.max()) + 1, len(student_ids))
+        obtained_matrix = np.zeros(shape)
+        possible_matrix = np.zeros(shape)
+        np.add.at(obtained_matrix, (exam_index, student_index), np.array(obtained, dtype=np.float64))
+        np.add.at(possible_matrix, (exam_index, student_index), np.array(possible, dtype=np.float64))
+        pct = np.full(shape, np.nan)
+        np.divide(obtained_matrix * 100, possible_matrix, out=pct, where=possible_matrix > 0)
+        
+        count = len(student_ids)
+        wins = np.zeros((count, count), dtype=np.int64)
+        ties = np.zeros((count, count), dtype=np.int64)
+        margin = np.zeros((count, count))
+        block = max(1, HeadToHeadService.BLOCK_CELLS // (count * count))
+        for start in range(0, shape[0], block):
+            scores = pct[start:start + block]
+            # lead[e, i, j]: how far student i finished ahead of student j in exam e
+            lead = scores[:, :, None] - scores[:, None, :]
+            both = ~np.isnan(lead)
+            wins += (lead >= HeadToHeadService.TIE_TOLERANCE).sum(axis=0)
+            ties += (both & (np.abs(lead) < HeadToHeadService.TIE_TOLERANCE)).sum(axis=0)
+            margin += np.where(both, lead, 0).sum(axis=0)
+        np.fill_diagonal(ties, 0)
+        
+        order = sorted(range(count), key=lambda i: (names.get(int(student_ids[i]), ''), int(student_ids[i])))
+        grid = np.ix_(order, order)
+        wins, ties, margin = wins[grid], ties[grid], margin[grid]
+        return {
+            'student_ids': student_ids[order],
+            'names': [names.get(int(student_ids[i]), '') for i in order],
+            'wins': wins,
+            'ties': ties,
+            'shared': wins + wins.T + ties,
+            'margin': margin,
+        }
+    
+    @staticmethod
+    def table(records, student_ids=None):
+        """
+        JSON-ready head-to-head table of some students.
+        
+        Args:
+            records: Result of compute()
+            student_ids: Students to include, in order (default: all, by
+                name); students without shared exams are left out
+                
+        Returns:
+            dict: 'students' (id and name) plus 'wins', 'losses', 'ties',
+            'shared' and 'average_margin' (None without shared exams) as
+            nested lists where [i][j] is student i against student j
+        """
+        positions = {int(student_id): i for i, student_id in enumerate(records['student_ids'])}
+        if student_ids is None:
+            index = list(range(len(positions)))
+        else:
+            index = [positions[student_id] for student_id in student_ids if student_id in positions]
+        grid = np.ix_(index, index)
+        wins, ties, shared = records['wins'][grid], records['ties'][grid], records['shared'][grid]
+        average_margin = np.divide(
+            records['margin'][grid], shared, out=np.zeros(shared.shape), where=shared > 0
+        ).round(2)
+        return {
+            'students': [
+                {'id': int(records['student_ids'][i]), 'name': records['names'][i]} for i in index
+            ],
+            'wins': wins.tolist(),
+            'losses': wins.T.tolist(),
+            'ties': ties.tolist(),
+            'shared': shared.tolist(),
+            'average_margin': np.where(shared > 0, average_margin, None).tolist(),
+        }
+
+
+class ExamStatsService:
+    """
+    Service class for per-exam score distributions.
+    
+    An exam is every result sharing an exam_id (one bulk entry). Statistics
+    for any number of exams come from one query and one sorted pass over
+    the scores, and are cached per exam_id until one of its results changes.
+    """
+    
+    CACHE_PREFIX = 'exam-stats'
+    
+    @staticmethod
+    def compute(exam_ids=None):
+        """
+        Compute distribution statistics for exams.
+        
+        Args:
+            exam_ids: Only these exams (default: every exam)
+            
+        Returns:
+            dict: exam_id mapped to count, mean, median, q1, q3, std, min and
+            max (percentages), and 'rows': one dict per result (id,
+            student_id, percentage, rank, percentile, z_score) ordered by rank.
+            percentile is the share of classmates scoring strictly lower
+            (PERCENT_RANK), None for a single-student exam.
+        """
+        results = Exam.objects.filter(exam_id__isnull=False).values_list(
+            'exam_id', 'id', 'student_id', 'mark_obtained', 'total_marks'
+        )
+        if exam_ids is not None:
+            results = results.filter(exam_id__in=exam_ids)
+        rows = list(results)
+        if not rows:
+            return {}
+        
+        exam_col, id_col, student_col, obtained, possible = zip(*rows)
+        exams = np.array(exam_col, dtype=np.int64)
+        obtained = np.array(obtained, dtype=np.float64)
+        possible = np.array(possible, dtype=np.float64)
+        pct = np.divide(obtained * 100, possible, out=np.zeros_like(obtained), where=possible > 0)
+        
+        # One sort puts every exam's scores next to each other, ascending
+        order = np.lexsort((pct, exams))
+        exams, pct = exams[order], pct[order]
+        n = len(order)
+        index = np.arange(n)
+        is_start = np.ones(n, dtype=bool)
+        is_start[1:] = exams[1:] != exams[:-1]
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:], n) - 1
+        group = np.cumsum(is_start) - 1
+        counts = np.bincount(group)
+        
+        mean = np.bincount(group, pct) / counts
+        std = np.sqrt(np.bincount(group, (pct - mean[group]) ** 2) / counts)
+        
+        def quantile(q):
+            # Linear interpolation between the sorted scores, like numpy.quantile
+            position = q * (counts - 1)
+            low = np.floor(position).astype(np.int64)
+            high = np.ceil(position).astype(np.int64)
+            return pct[starts + low] + (pct[starts + high] - pct[starts + low]) * (position - low)
+        
+        q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+        
+        # Tied scores share the first (percentile) and last (rank) index of their run
+        is_new_score = is_start.copy()
+        is_new_score[1:] |= pct[1:] != pct[:-1]
+        run_first = np.maximum.accumulate(np.where(is_new_score, index, 0))
+        is_run_end = np.append(is_new_score[1:], True)
+        run_last = np.minimum.accumulate(np.where(is_run_end, index, n)[::-1])[::-1]
+        below = run_first - starts[group]
+        above = ends[group] - run_last
+        rank = above + 1
+        others = counts[group] - 1
+        percentile = np.divide(below * 100, others, out=np.zeros(n), where=others > 0)
+        z_score = np.divide(pct - mean[group], std[group], out=np.zeros(n), where=std[group] > 0)
+        
+        stats = {}
+        for g, (first, last) in enumerate(zip(starts.tolist(), ends.tolist())):
+            exam_rows = []
+            for i in range(last, first - 1, -1):
+                source = order[i]
+                exam_rows.append({
+                    'id': id_col[source],
+                    'student_id': student_col[source],
+                    'percentage': round(float(pct[i]), 2),
+                    'rank': int(rank[i]),
+                    'percentile': round(float(percentile[i]), 1) if counts[g] > 1 else None,
+                    'z_score': round(float(z_score[i]), 2),
+                })
+            stats[int(exams[first])] = {
+                'exam_id': int(exams[first]),
+                'count': int(counts[g]),
+                'mean': round(float(mean[g]), 2),
+                'median': round(float(median[g]), 2),
+                'q1': round(float(q1[g]), 2),
+                'q3': round(float(q3[g]), 2),
+                'std': round(float(std[g]), 2),
+                'min': round(float(pct[first]), 2),
+                'max': round(float(pct[last]), 2),
+                'rows': exam_rows,
+            }
+        return stats
+    
+    @staticmethod
+    def for_exams(exam_ids):
+        """Cached statistics for some exams (see compute); unknown exam_ids are left out"""
+        return stats_cache.get_many(
+            ExamStatsService.CACHE_PREFIX,
+            [exam_id for exam_id in exam_ids if exam_id is not None],
+            ExamStatsService.compute,
+        )
+    
+    @staticmethod
+    def row_stats(exam_ids):
+        """
+        Per-result statistics for some exams.
+        
+        Returns:
+            dict: Exam primary key mapped to its row dict (rank, percentile, z_score)
+        """
+        return {
+            row['id']: row
+            for stats in ExamStatsService.for_exams(exam_ids).values()
+            for row in stats['rows']
+        }
+    
+    @staticmethod
+    def invalidate(exam_ids):
+        stats_cache.delete_many(ExamStatsService.CACHE_PREFIX, exam_ids)
+
+
+def class_scope(exams, class_number=None):
+    """Restrict an exam queryset to one class (None keeps every class)"""
+    if class_number is None:
+        return exams
+    return exams.filter(class_number=class_number)
+
+
+def _weighted_average(obtained, possible):
+    return (obtained * 100 / possible) if possible else 0
+
+
 class LeaderboardService:
     """Service class for generating various leaderboards"""
     
     @staticmethod
-    def total_marks_leaderboard():
+    def student_totals(class_number=None):
+        """
+        Marks and unique exam totals of every student in one grouped query
+        over the rollup cube.
+        
+        All classes include students without exams; a single class only
+        includes students with exams in it.
+        """
+        scope = Q() if class_number is None else Q(rollups__class_number=class_number)
+        students = Student.objects.annotate(
+            marks_obtained=Coalesce(Sum('rollups__marks_obtained', filter=scope), 0),
+            marks_possible=Coalesce(Sum('rollups__marks_possible', filter=scope), 0),
+            exam_count=Coalesce(Sum('rollups__exam_count', filter=scope), 0),
+        ).order_by('id')
+        if class_number is not None:
+            students = students.filter(exam_count__gt=0)
+        return list(students)
+    
+    @staticmethod
+    def student_ranking():
+        """
+        Rank every student as Student.rank does, from one grouped query.
+        
+        Ranked by average score, then total marks (ties share a rank);
+        students without exams are included with zero totals.
+        
+        Returns:
+            list: Dicts with student, total_marks, average, total_exams and
+            rank, best first
+        """
+        return rank_with_ties([
+            {
+                'student': student,
+                'total_marks': student.marks_obtained,
+                'average': _weighted_average(student.marks_obtained, student.marks_possible),
+                'total_exams': student.exam_count,
+            }
+            for student in LeaderboardService.student_totals()
+        ], score_key='average', total_key='total_marks')
+    
+    @staticmethod
+    def total_marks_leaderboard(class_number=None):
         """Generate leaderboard based on total marks"""
-        students = Student.objects.all()
         leaderboard = [
             {
                 'student': student,
-                'total_marks': student.total_marks,
-                'total_exams': student.total_exams
+                'total_marks': student.marks_obtained,
+                'total_exams': student.exam_count
             }
-            for student in students
+            for student in LeaderboardService.student_totals(class_number)
         ]
         return sorted(leaderboard, key=lambda x: x['total_marks'], reverse=True)
     
     @staticmethod
-    def average_leaderboard():
+    def average_leaderboard(class_number=None):
         """Generate leaderboard based on average percentage"""
-        students = Student.objects.all()
         leaderboard = [
             {
                 'student': student,
-                'average': student.average_percentage,
-                'total_exams': student.total_exams
+                'average': _weighted_average(student.marks_obtained, student.marks_possible),
+                'total_exams': student.exam_count
             }
-            for student in students if student.total_exams > 0
+            for student in LeaderboardService.student_totals(class_number) if student.exam_count > 0
         ]
         return sorted(leaderboard, key=lambda x: x['average'], reverse=True)
     
     @staticmethod
-    def subject_wise_leaderboard(subject_id):
-        """Generate leaderboard for a specific subject"""
-        try:
-            subject = Subject.objects.get(id=subject_id)
-        except Subject.DoesNotExist:
-            return []
+    def overall_rankings(class_number=None):
+        """
+        Overall rankings of one class (or all classes) from the rollup cube.
         
-        students = Student.objects.filter(exam__subject=subject).distinct()
-        leaderboard = []
+        Points are lifetime points earned across all classes; within a class
+        they are the exam points plus monthly win bonuses of that class only.
+        Ranked by average score, then points (ties share a rank).
         
-        for student in students:
-            exams = student.exam_set.filter(subject=subject)
-            total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-            total_possible_marks = sum(float(e.total_marks) for e in exams)
-            avg_percentage = (total_marks_obtained * 100 / total_possible_marks) if total_possible_marks > 0 else 0
-            
-            leaderboard.append({
-                'student': student,
-                'average': round(avg_percentage, 2),
-                'total_marks': total_marks_obtained,
-                'exam_count': exams.count()
-            })
+        Returns:
+            list: Dicts with student, total_exams, average_percentage,
+            total_points, excellence_rate and rank
+        """
+        rows = [row for row in RollupService.query(('student',), class_number) if row['unique_exams'] > 0]
         
-        return sorted(leaderboard, key=lambda x: x['average'], reverse=True)
+        if class_number is None:
+            points = dict(LifetimePoints.objects.values_list('student_id', 'points_earned'))
+        else:
+            points = {row['student_id']: row['points'] for row in rows}
+            for month_rows in RollupService.monthly_rankings(class_number).values():
+                for row in month_rows:
+                    if row['rank'] == 1:
+                        points[row['student_id']] = points.get(row['student_id'], 0) + MONTHLY_WIN_BONUS
+        
+        students = Student.objects.in_bulk([row['student_id'] for row in rows])
+        rankings = [
+            {
+                'student': students[row['student_id']],
+                'total_exams': row['unique_exams'],
+                'average_percentage': row['average_percentage'],
+                'total_points': points.get(row['student_id'], 0),
+                'excellence_rate': excellence_rate({
+                    'excellent_exams': row['excellent_exams'],
+                    'rated_exams': row['unique_exams'],
+                }),
+            }
+            for row in rows
+        ]
+        return rank_with_ties(rankings, total_key='total_points')
+    
+    @staticmethod
+    def monthly_champions(class_number=None, limit=10):
+        """
+        Top students of every fully passed month, most recent month first.
+        
+        Ranked by average score, then total marks (ties share a rank).
+        
+        Returns:
+            list: Dicts with month_name, year, month and the top `limit`
+            champions (student, exams_count, total_marks, average_percentage,
+            points_earned, rank)
+        """
+        rankings = RollupService.monthly_rankings(class_number)
+        monthly = [
+            {
+                'month_name': date(year, month, 1).strftime('%B %Y'),
+                'year': year,
+                'month': month,
+                'champions': rows[:limit],
+            }
+            for (year, month), rows in sorted(rankings.items(), reverse=True)
+        ]
+        
+        students = Student.objects.in_bulk({
+            row['student_id'] for month in monthly for row in month['champions']
+        })
+        for month in monthly:
+            month['champions'] = [
+                {
+                    'student': students[row['student_id']],
+                    'exams_count': row['unique_exams'],
+                    'total_marks': row['total_obtained'],
+                    'average_percentage': row['average_percentage'],
+                    'points_earned': row['points'],
+                    'rank': row['rank'],
+                }
+                for row in month['champions']
+            ]
+        return monthly
+    
+    @staticmethod
+    def subject_wise_leaderboard(subject_id):
+        """Generate leaderboard for a specific subject"""
+        standings = SubjectStanding.objects.filter(
+            subject_id=subject_id,
+            class_number__isnull=True
+        ).select_related('student').order_by('rank', 'student__name')
+        
+        return [
+            {
+                'student': standing.student,
+                'average': round(standing.average_percentage, 2),
+                'total_marks': standing.total_marks_obtained,
+                'exam_count': standing.exam_count,
+                'rank': standing.rank,
+            }
+            for standing in standings
+        ]
     
     @staticmethod
     def exam_type_leaderboard(exam_type_id):
-        """Generate leaderboard for a specific exam type"""
-        try:
-            exam_type = ExamType.objects.get(id=exam_type_id)
-        except ExamType.DoesNotExist:
-            return []
+        """Generate leaderboard for a specific exam type (two queries)"""
+        rows = list(Exam.objects.filter(exam_type_id=exam_type_id).values('student_id').annotate(
+            total_obtained=Sum('mark_obtained'),
+            total_possible=Sum('total_marks'),
+            exam_count=Count('id'),
+        ).order_by('student_id'))
+        students = Student.objects.in_bulk([row['student_id'] for row in rows])
         
-        students = Student.objects.filter(exam__exam_type=exam_type).distinct()
         leaderboard = []
-        
-        for student in students:
-            exams = student.exam_set.filter(exam_type=exam_type)
-            total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-            total_possible_marks = sum(float(e.total_marks) for e in exams)
+        for row in rows:
+            total_marks_obtained = float(row['total_obtained'])
+            total_possible_marks = float(row['total_possible'])
             avg_percentage = (total_marks_obtained * 100 / total_possible_marks) if total_possible_marks > 0 else 0
-            
             leaderboard.append({
-                'student': student,
+                'student': students[row['student_id']],
                 'average': round(avg_percentage, 2),
                 'total_marks': total_marks_obtained,
-                'exam_count': exams.count()
+                'exam_count': row['exam_count'],
             })
         
         return sorted(leaderboard, key=lambda x: x['average'], reverse=True)
     
     @staticmethod
-    def lifetime_points_leaderboard():
-        """Generate leaderboard based on lifetime points"""
-        from .models import LifetimePoints
-        lifetime_points = LifetimePoints.objects.all()
+    def lifetime_points_leaderboard(class_number=None):
+        """
+        Generate leaderboard based on lifetime points.
+        
+        Lifetime points are not split by class; a class only narrows the
+        leaderboard to students with exams in it.
+        """
+        lifetime_points = LifetimePoints.objects.select_related('student')
+        if class_number is not None:
+            lifetime_points = lifetime_points.filter(
+                student__in=Exam.objects.filter(class_number=class_number).values('student_id')
+            )
         leaderboard = [
             {
                 'student': lp.student,
@@ -128,30 +1391,344 @@ class LeaderboardService:
         return sorted(leaderboard, key=lambda x: x['total_points'], reverse=True)
 
 
+class SnapshotService:
+    """
+    Service class persisting point-in-time overall rankings.
+    
+    A snapshot freezes overall_rankings() as it stood at the end of one day
+    or month, for every class partition, so rank history and "rankings as
+    of" queries read a few stored rows instead of replaying every exam.
+    """
+    
+    @staticmethod
+    def compute(as_of, class_number=None):
+        """
+        Overall rankings as they stood at the end of a day.
+        
+        Whole months are summed from the rollup cube and only the exams of
+        an unfinished last month are read. Points are exam points plus the
+        monthly win bonuses of the months passed by then, as in
+        LeaderboardService.overall_rankings().
+        
+        Args:
+            as_of: Last day included
+            class_number: Rank within one class only (default: all classes)
+            
+        Returns:
+            list: Ranked dicts with student_id, average_percentage,
+            total_points and rank
+        """
+        # First day after the last whole month covered
+        cutoff = (as_of + timedelta(days=1)).replace(day=1)
+        totals, exam_ids = {}, defaultdict(set)
+        for row in RollupService.query(('student',), class_number, month__lt=cutoff):
+            totals[row['student_id']] = [row['total_obtained'], row['total_possible'], row['points'], row['unique_exams']]
+        
+        if cutoff <= as_of:
+            registry = grading.get_registry()
+            partial = class_scope(Exam.objects.filter(date__gte=cutoff, date__lte=as_of), class_number)
+            for student_id, exam_type_id, exam_id, mark_obtained, total_marks in partial.values_list(
+                'student_id', 'exam_type_id', 'exam_id', 'mark_obtained', 'total_marks'
+            ).iterator():
+                total = totals.setdefault(student_id, [0, 0, 0, 0])
+                total[0] += mark_obtained
+                total[1] += total_marks
+                percentage = (mark_obtained / total_marks) * 100 if total_marks > 0 else 0
+                total[2] += registry.policy_for_exam_type_id(exam_type_id).points_for(percentage)
+                if exam_id is not None:
+                    exam_ids[student_id].add(exam_id)
+        
+        for month_rows in RollupService.monthly_rankings(class_number, before=cutoff).values():
+            for row in month_rows:
+                if row['rank'] == 1:
+                    totals[row['student_id']][2] += MONTHLY_WIN_BONUS
+        
+        rankings = [
+            {
+                'student_id': student_id,
+                'average_percentage': _weighted_average(obtained, possible),
+                'total_points': points,
+            }
+            for student_id, (obtained, possible, points, exams) in totals.items()
+            if exams + len(exam_ids[student_id]) > 0
+        ]
+        return rank_with_ties(rankings, total_key='total_points')
+    
+    @staticmethod
+    def take(as_of, period=RankingSnapshot.PERIOD_DAY, class_numbers=None):
+        """
+        Store (or replace) the snapshot of one day or month.
+        
+        Args:
+            as_of: Last day covered; month snapshots use the last day of the
+                month
+            period: RankingSnapshot.PERIOD_DAY or PERIOD_MONTH
+            class_numbers: Only retake these classes plus the all-classes
+                partition (default: every class with exams by then)
+                
+        Returns:
+            int: Number of snapshot rows written
+        """
+        if class_numbers is None:
+            class_numbers = ExamRollup.objects.filter(month__lte=as_of).values_list(
+                'class_number', flat=True
+            ).distinct().order_by()
+        partitions = [None, *sorted(set(class_numbers))]
+        
+        rows = []
+        for class_number in partitions:
+            rankings = SnapshotService.compute(as_of, class_number)
+            rows.extend(
+                RankingSnapshot(
+                    period=period,
+                    as_of=as_of,
+                    class_number=class_number,
+                    student_id=row['student_id'],
+                    rank=row['rank'],
+                    cohort_size=len(rankings),
+                    average_percentage=row['average_percentage'],
+                    points=row['total_points'],
+                )
+                for row in rankings
+            )
+        
+        existing = RankingSnapshot.objects.filter(period=period, as_of=as_of)
+        scope = Q(class_number__isnull=True) | Q(class_number__in=partitions[1:])
+        with transaction.atomic():
+            existing.filter(scope).delete()
+            RankingSnapshot.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
+    
+    @staticmethod
+    def close_months(today=None):
+        """
+        Take the month snapshot of every closed month that has none yet.
+        
+        Returns:
+            list: Last days of the months snapshotted
+        """
+        if today is None:
+            today = date.today()
+        first = ExamRollup.objects.aggregate(first=Min('month'))['first']
+        if first is None:
+            return []
+        taken = set(
+            RankingSnapshot.objects.filter(period=RankingSnapshot.PERIOD_MONTH).values_list(
+                'as_of', flat=True
+            ).distinct().order_by()
+        )
+        closed = []
+        month = first
+        while month < today.replace(day=1):
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            month_end = next_month - timedelta(days=1)
+            if month_end not in taken:
+                SnapshotService.take(month_end, RankingSnapshot.PERIOD_MONTH)
+                closed.append(month_end)
+            month = next_month
+        return closed
+    
+    @staticmethod
+    def retake_since(since, class_numbers):
+        """
+        Retake the snapshots covering exams changed on or after a date.
+        
+        Rankings are cumulative, so every existing snapshot from `since` on
+        is affected; only the changed classes and the all-classes partition
+        are recomputed.
+        
+        Returns:
+            int: Number of snapshots retaken
+        """
+        snapshots = RankingSnapshot.objects.filter(as_of__gte=since).values_list(
+            'period', 'as_of'
+        ).distinct().order_by('as_of')
+        count = 0
+        for period, as_of in snapshots:
+            SnapshotService.take(as_of, period, class_numbers)
+            count += 1
+        return count
+    
+    @staticmethod
+    def rank_history(student_id, period=RankingSnapshot.PERIOD_MONTH, class_number=None):
+        """
+        Rank of one student in every snapshot, oldest first.
+        
+        Returns:
+            list: Dicts with as_of, rank, cohort_size, average_percentage and
+            points
+        """
+        snapshots = RankingSnapshot.objects.filter(student_id=student_id, period=period)
+        if class_number is None:
+            snapshots = snapshots.filter(class_number__isnull=True)
+        else:
+            snapshots = snapshots.filter(class_number=class_number)
+        return list(snapshots.order_by('as_of').values(
+            'as_of', 'rank', 'cohort_size', 'average_percentage', 'points'
+        ))
+    
+    @staticmethod
+    def rankings_as_of(as_of, period=RankingSnapshot.PERIOD_MONTH, class_number=None, limit=None):
+        """
+        Rankings of the latest snapshot taken on or before a date.
+        
+        Returns:
+            tuple: (snapshot date or None, list of dicts with student_id,
+            student name, rank, average_percentage and points)
+        """
+        snapshots = RankingSnapshot.objects.filter(period=period)
+        if class_number is None:
+            snapshots = snapshots.filter(class_number__isnull=True)
+        else:
+            snapshots = snapshots.filter(class_number=class_number)
+        snapshot_date = snapshots.filter(as_of__lte=as_of).aggregate(latest=Max('as_of'))['latest']
+        if snapshot_date is None:
+            return None, []
+        rows = snapshots.filter(as_of=snapshot_date).order_by('rank', 'student__name').values(
+            'student_id', 'student__name', 'rank', 'average_percentage', 'points'
+        )
+        if limit:
+            rows = rows[:limit]
+        return snapshot_date, list(rows)
+
+
+class ComparisonService:
+    """
+    Service class comparing any number of students side by side.
+    
+    Every statistic is read for all selected students at once (rollup
+    cube, standings, overall and monthly rankings), so comparing eight
+    students costs the same number of queries as comparing one.
+    """
+    
+    # Most students on one comparison page
+    MAX_STUDENTS = 8
+    
+    @staticmethod
+    def compare(student_ids):
+        """
+        Comparison stats of some students.
+        
+        Args:
+            student_ids: Student ids, in display order (unknown ids are skipped)
+            
+        Returns:
+            list: One dict per student with student, rank, total_marks,
+            average_percentage, total_exams, excellence_rate,
+            monthly_winner_count, subject_champion_count, best_month,
+            subject_summary, lifetime_points, mcq_average and cq_average
+        """
+        students = Student.objects.select_related('lifetimepoints').in_bulk(student_ids)
+        student_ids = [student_id for student_id in dict.fromkeys(student_ids) if student_id in students]
+        if not student_ids:
+            return []
+        
+        overall_ranks = {row['student'].id: row['rank'] for row in LeaderboardService.student_ranking()}
+        monthly_wins = Counter(
+            row['student_id']
+            for month_rows in RollupService.monthly_rankings().values()
+            for row in month_rows if row['rank'] == 1
+        )
+        
+        exam_type_names = grading.get_registry().exam_type_names
+        type_rows = defaultdict(list)
+        for row in RollupService.query(('student', 'exam_type'), student_id__in=student_ids):
+            row['exam_type_name'] = (exam_type_names.get(row['exam_type_id']) or '').upper()
+            type_rows[row['student_id']].append(row)
+        
+        best_months = {}
+        for row in RollupService.query(
+            ('student', 'month'), student_id__in=student_ids, month__lt=date.today().replace(day=1)
+        ):
+            best = best_months.get(row['student_id'])
+            if row['unique_exams'] > 0 and (best is None or row['average_percentage'] > best['average_percentage']):
+                best_months[row['student_id']] = row
+        
+        subject_rows = RollupService.query(('student', 'subject'), student_id__in=student_ids)
+        subjects = Subject.objects.in_bulk({row['subject_id'] for row in subject_rows})
+        subject_ranks = {
+            (student_id, subject_id): rank
+            for student_id, subject_id, rank in SubjectStanding.objects.filter(
+                student_id__in=student_ids, class_number__isnull=True
+            ).values_list('student_id', 'subject_id', 'rank')
+        }
+        subject_summaries = defaultdict(list)
+        for row in subject_rows:
+            subject_summaries[row['student_id']].append({
+                'subject': subjects[row['subject_id']],
+                'total_marks': float(row['total_obtained']),
+                'exam_count': row['unique_exams'],
+                'average_percentage': row['average_percentage'],
+                'rank': subject_ranks.get((row['student_id'], row['subject_id'])),
+            })
+        champion_counts = Counter(
+            student_id for (student_id, _), rank in subject_ranks.items() if rank == 1
+        )
+        
+        def totals(rows):
+            obtained = sum(row['total_obtained'] for row in rows)
+            possible = sum(row['total_possible'] for row in rows)
+            return obtained, _weighted_average(obtained, possible)
+        
+        comparison = []
+        for student_id in student_ids:
+            student = students[student_id]
+            rows = type_rows[student_id]
+            total_marks, average_percentage = totals(rows)
+            best_month = best_months.get(student_id)
+            try:
+                lifetime_points = student.lifetimepoints.points_earned
+            except LifetimePoints.DoesNotExist:
+                lifetime_points = 0
+            comparison.append({
+                'student': student,
+                'rank': overall_ranks.get(student_id),
+                'total_marks': total_marks,
+                'average_percentage': average_percentage,
+                'total_exams': sum(row['unique_exams'] for row in rows),
+                'excellence_rate': round(excellence_rate({
+                    'excellent_exams': sum(row['excellent_exams'] for row in rows),
+                    'rated_exams': sum(row['unique_exams'] for row in rows),
+                }), 1),
+                'monthly_winner_count': monthly_wins[student_id],
+                'subject_champion_count': champion_counts[student_id],
+                'best_month': best_month['month'].strftime('%B %Y') if best_month else 'N/A',
+                'subject_summary': subject_summaries[student_id],
+                'lifetime_points': lifetime_points,
+                'mcq_average': round(totals([row for row in rows if row['exam_type_name'] == 'MCQ'])[1], 1),
+                'cq_average': round(totals([row for row in rows if row['exam_type_name'] == 'CQ'])[1], 1),
+            })
+        return comparison
+
+
 class DashboardService:
     """Service class for generating dashboard data"""
     
     @staticmethod
-    def get_dashboard_summary():
-        """Get overall dashboard summary statistics"""
-        total_exams = count_unique_exams(Exam.objects.all())
-        total_subjects = Subject.objects.count()
-        total_students = Student.objects.count()
+    def get_dashboard_summary(class_number=None):
+        """
+        Get dashboard summary statistics for one class (or all classes).
         
-        # Get highest performers
-        students = Student.objects.all()
-        if students:
-            highest_marks_student = max(students, key=lambda s: s.total_marks)
-            highest_avg_student = max(
-                [s for s in students if s.total_exams > 0],
-                key=lambda s: s.average_percentage,
-                default=None
-            )
-            best_student = highest_avg_student
+        Within a class, subjects and students only count when they have
+        exams in that class.
+        """
+        total_exams = RollupService.query(class_number=class_number)[0]['unique_exams']
+        if class_number is None:
+            total_subjects = Subject.objects.count()
+            total_students = Student.objects.count()
         else:
-            highest_marks_student = None
-            highest_avg_student = None
-            best_student = None
+            rollups = ExamRollup.objects.filter(class_number=class_number)
+            total_subjects = rollups.values('subject_id').distinct().count()
+            total_students = rollups.values('student_id').distinct().count()
+        
+        # Get highest performers
+        students = LeaderboardService.student_totals(class_number)
+        highest_marks_student = max(students, key=lambda s: s.marks_obtained, default=None)
+        highest_avg_student = max(
+            [s for s in students if s.exam_count > 0],
+            key=lambda s: _weighted_average(s.marks_obtained, s.marks_possible),
+            default=None
+        )
         
         return {
             'total_exams': total_exams,
@@ -159,102 +1736,201 @@ class DashboardService:
             'total_students': total_students,
             'highest_marks_student': highest_marks_student,
             'highest_avg_student': highest_avg_student,
-            'best_student': best_student
+            'best_student': highest_avg_student
         }
     
     @staticmethod
-    def get_subject_performance_table():
-        """Get performance data for all subjects"""
-        subjects = Subject.objects.all()
-        performance_data = []
+    def get_subject_performance_table(class_number=None):
+        """Get performance data for all subjects with exams (in one class)"""
+        rows = RollupService.query(('subject',), class_number)
+        subjects = Subject.objects.in_bulk([row['subject_id'] for row in rows])
         
-        for subject in subjects:
-            exams = Exam.objects.filter(subject=subject)
-            if exams.exists():
-                total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-                total_possible_marks = sum(float(e.total_marks) for e in exams)
-                avg_percentage = (
-                    (total_marks_obtained * 100 / total_possible_marks) 
-                    if total_possible_marks > 0 else 0
-                )
-                
-                performance_data.append({
-                    'subject': subject,
-                    'average_percentage': round(avg_percentage, 2),
-                    'total_exams': count_unique_exams(exams),
-                    'best_student': subject.best_student()
-                })
+        # Best student: rank #1 of the precomputed standings of the partition
+        best_students = {}
+        for standing in SubjectStanding.objects.filter(
+            class_number=class_number, rank=1
+        ).select_related('student').order_by('subject_id', 'student__name'):
+            best_students.setdefault(standing.subject_id, standing.student)
         
+        performance_data = [
+            {
+                'subject': subjects[row['subject_id']],
+                'average_percentage': round(row['average_percentage'], 2),
+                'total_exams': row['unique_exams'],
+                'best_student': best_students.get(row['subject_id'])
+            }
+            for row in rows
+        ]
         return sorted(performance_data, key=lambda x: x['average_percentage'], reverse=True)
     
     @staticmethod
-    def get_exam_type_performance_table():
-        """Get performance data for all exam types"""
-        exam_types = ExamType.objects.all()
-        performance_data = []
-        
-        for exam_type in exam_types:
-            exams = Exam.objects.filter(exam_type=exam_type)
-            if exams.exists():
-                total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-                total_possible_marks = sum(float(e.total_marks) for e in exams)
-                avg_percentage = (
-                    (total_marks_obtained * 100 / total_possible_marks) 
-                    if total_possible_marks > 0 else 0
-                )
-                
-                performance_data.append({
-                    'exam_type': exam_type,
-                    'average_percentage': round(avg_percentage, 2),
-                    'total_exams': count_unique_exams(exams)
-                })
+    def get_exam_type_performance_table(class_number=None):
+        """Get performance data for all exam types with exams (in one class)"""
+        rows = RollupService.query(('exam_type',), class_number)
+        exam_types = ExamType.objects.in_bulk([row['exam_type_id'] for row in rows])
         
+        performance_data = [
+            {
+                'exam_type': exam_types[row['exam_type_id']],
+                'average_percentage': round(row['average_percentage'], 2),
+                'total_exams': row['unique_exams']
+            }
+            for row in rows
+        ]
         return sorted(performance_data, key=lambda x: x['average_percentage'], reverse=True)
     
     @staticmethod
-    def get_grade_distribution():
-        """Get grade distribution across all exams"""
-        exams = Exam.objects.all()
-        grades = [exam.grade for exam in exams]
-        distribution = Counter(grades)
-
-        # Get color codes for each grade, fallback to default mapping
-        grade_data = []
-        for grade_name, count in distribution.items():
-            grade_scale = GradeScale.objects.filter(grade_name=grade_name).first()
-            if grade_scale:
-                color = grade_scale.color_code
-            else:
-                color = DEFAULT_GRADE_COLORS.get(grade_name, '#000000')
-            grade_data.append({
-                'grade': grade_name,
-                'count': count,
-                'color': color
-            })
-        return grade_data
+    def get_grade_distribution(class_number=None):
+        """Get grade distribution across all exams (in one class)"""
+        distribution = grading.grade_counts(
+            class_scope(Exam.objects.all(), class_number).values_list('exam_type_id', 'mark_obtained', 'total_marks')
+        )
+        return [
+            {'grade': grade_name, 'count': count, 'color': grading.grade_color(grade_name)}
+            for grade_name, count in distribution.items()
+        ]
     
     @staticmethod
-    def get_recent_exams(limit=10):
+    def get_recent_exams(limit=10, class_number=None):
         """Get most recent exams"""
-        return Exam.objects.all().order_by('-date', '-exam_id')[:limit]
+        exams = class_scope(Exam.objects.all(), class_number)
+        return exams.select_related('student', 'subject', 'exam_type').order_by('-date', '-exam_id')[:limit]
+
+
+class ClassAnalyticsService:
+    """
+    Service class caching leaderboard and dashboard analytics per class.
+    
+    Every section is cached per class_number partition (None = all classes).
+    An exam write only bumps the generation of its own class plus the
+    all-classes partition (see signals.py), so writes in one class never
+    recompute another class. Changes that affect every class (grading
+    policies, student/subject/exam type renames) bump a global generation.
+    Both generations are part of every cache key and are shared tokens
+    (see generations.py), so a bump reaches every process, and a request
+    that computed from old data while the bump happened caches under a key
+    nobody reads.
+    """
+    
+    CACHE_PREFIX = 'class-analytics'
+    GENERATION_CACHE_KEY = 'marks:class-analytics:generation'
+    
+    @staticmethod
+    def _generation_key(class_number):
+        partition = 'all' if class_number is None else class_number
+        return f"{ClassAnalyticsService.GENERATION_CACHE_KEY}:{partition}"
+    
+    @staticmethod
+    def _cache_id(section, class_number):
+        # Monthly champions only include fully passed months, so the
+        # current month is part of the key
+        partition = 'all' if class_number is None else class_number
+        partition_key = ClassAnalyticsService._generation_key(class_number)
+        tokens = generations.get_many([ClassAnalyticsService.GENERATION_CACHE_KEY, partition_key])
+        generation = tokens[ClassAnalyticsService.GENERATION_CACHE_KEY]
+        return f"{section}:{partition}:{date.today():%Y-%m}:{generation}.{tokens[partition_key]}"
+    
+    @staticmethod
+    def _get(section, class_number, compute):
+        return stats_cache.get_or_compute(
+            ClassAnalyticsService.CACHE_PREFIX,
+            ClassAnalyticsService._cache_id(section, class_number),
+            compute,
+        )
+    
+    @staticmethod
+    def available_classes():
+        """Class numbers that have exams, ascending"""
+        return ClassAnalyticsService._get('classes', None, lambda: list(
+            Exam.objects.values_list('class_number', flat=True).distinct().order_by('class_number')
+        ))
+    
+    @staticmethod
+    def overall_rankings(class_number=None):
+        """Cached LeaderboardService.overall_rankings()"""
+        return ClassAnalyticsService._get(
+            'rankings', class_number, lambda: LeaderboardService.overall_rankings(class_number)
+        )
+    
+    @staticmethod
+    def monthly_champions(class_number=None):
+        """Cached LeaderboardService.monthly_champions()"""
+        return ClassAnalyticsService._get(
+            'champions', class_number, lambda: LeaderboardService.monthly_champions(class_number)
+        )
+    
+    @staticmethod
+    def head_to_head(class_number=None):
+        """Cached HeadToHeadService.compute()"""
+        return ClassAnalyticsService._get(
+            'head-to-head', class_number, lambda: HeadToHeadService.compute(class_number)
+        )
+    
+    @staticmethod
+    def dashboard(class_number=None):
+        """
+        Cached dashboard sections of one class (or all classes).
+        
+        Returns:
+            dict: summary, subject_performance, exam_type_performance,
+            grade_distribution, recent_exams and the top 5 of the total
+            marks and average leaderboards
+        """
+        def compute():
+            return {
+                'summary': DashboardService.get_dashboard_summary(class_number),
+                'subject_performance': DashboardService.get_subject_performance_table(class_number),
+                'exam_type_performance': DashboardService.get_exam_type_performance_table(class_number),
+                'grade_distribution': DashboardService.get_grade_distribution(class_number),
+                'recent_exams': list(DashboardService.get_recent_exams(limit=10, class_number=class_number)),
+                'total_marks_leaderboard': LeaderboardService.total_marks_leaderboard(class_number)[:5],
+                'average_leaderboard': LeaderboardService.average_leaderboard(class_number)[:5],
+            }
+        return ClassAnalyticsService._get('dashboard', class_number, compute)
+    
+    @staticmethod
+    def invalidate(class_numbers=()):
+        """
+        Drop the cached analytics of some classes and of the all-classes
+        partition (which every class contributes to) by bumping their
+        generations; the old entries expire on their own.
+        """
+        for class_number in {None, *class_numbers}:
+            generations.bump(ClassAnalyticsService._generation_key(class_number))
+    
+    @staticmethod
+    def invalidate_all():
+        """Drop the cached analytics of every class"""
+        generations.bump(ClassAnalyticsService.GENERATION_CACHE_KEY)
 
 
 class ChartDataService:
-    """Service class for generating chart data"""
+    """
+    Service class for generating chart data.
+
+    Every chart is a columnar payload (see marks/payloads.py): labels are
+    dictionary-encoded and percentages sent as integer hundredths.
+    """
     
     @staticmethod
     def marks_over_time(student_id):
         """Generate line chart data for student marks over time"""
-        try:
-            student = Student.objects.get(id=student_id)
-        except Student.DoesNotExist:
-            return {'labels': [], 'data': []}
+        exams = list(
+            Exam.objects.filter(student_id=student_id)
+            .order_by('date', 'id')
+            .values_list('subject_id', 'subject__name', 'date', 'mark_obtained', 'total_marks')
+        )
+        subjects = {subject_id: {'id': subject_id, 'name': name} for subject_id, name, *_ in exams}
         
-        exams = student.exam_set.all().order_by('date')
-        labels = [f"{exam.subject.name} ({exam.date.strftime('%m/%d')})" for exam in exams]
-        data = [float(exam.percentage) for exam in exams]
-        
-        return {'labels': labels, 'data': data}
+        return (
+            payloads.Columns(len(exams))
+            .dictionary('subject', [exam[0] for exam in exams], subjects)
+            .days('day', [exam[2] for exam in exams])
+            .scaled('percentage', [
+                obtained / total * 100 if total > 0 else 0 for *_, obtained, total in exams
+            ])
+            .payload()
+        )
     
     @staticmethod
     def subject_performance_chart(student_id):
@@ -262,13 +1938,34 @@ class ChartDataService:
         try:
             student = Student.objects.get(id=student_id)
         except Student.DoesNotExist:
-            return {'labels': [], 'data': []}
+            return payloads.Columns(0).payload()
         
         subject_summary = student.subject_wise_summary()
-        labels = [item['subject'].name for item in subject_summary]
-        data = [float(item['average_percentage']) for item in subject_summary]
-        
-        return {'labels': labels, 'data': data}
+        return (
+            payloads.Columns(len(subject_summary))
+            .dictionary(
+                'subject',
+                [item['subject'].id for item in subject_summary],
+                {item['subject'].id: {'id': item['subject'].id, 'name': item['subject'].name} for item in subject_summary},
+            )
+            .scaled('percentage', [item['average_percentage'] for item in subject_summary])
+            .payload()
+        )
+    
+    @staticmethod
+    def grade_distribution_payload(counts):
+        """Columnar grade counts with each grade's name and colour in the dictionary"""
+        grades = list(counts)
+        return (
+            payloads.Columns(len(grades))
+            .dictionary(
+                'grade',
+                grades,
+                {grade: {'name': grade, 'color': grading.grade_color(grade)} for grade in grades},
+            )
+            .plain('count', counts.values())
+            .payload()
+        )
     
     @staticmethod
     def grade_distribution_chart(student_id):
@@ -276,57 +1973,53 @@ class ChartDataService:
         try:
             student = Student.objects.get(id=student_id)
         except Student.DoesNotExist:
-            return {'labels': [], 'data': [], 'colors': []}
-
-        grade_freq = student.grade_frequency()
-        labels = list(grade_freq.keys())
-        data = list(grade_freq.values())
-
-        # Get colors for each grade, fallback to default mapping
-        colors = []
-        for grade_name in labels:
-            grade_scale = GradeScale.objects.filter(grade_name=grade_name).first()
-            if grade_scale:
-                color = grade_scale.color_code
-            else:
-                color = DEFAULT_GRADE_COLORS.get(grade_name, '#000000')
-            colors.append(color)
-        return {'labels': labels, 'data': data, 'colors': colors}
+            return payloads.Columns(0).payload()
+
+        return ChartDataService.grade_distribution_payload(student.grade_frequency())
     
     @staticmethod
     def student_comparison_chart(subject_id):
         """Generate chart comparing all students in a subject"""
-        try:
-            subject = Subject.objects.get(id=subject_id)
-        except Subject.DoesNotExist:
-            return {'labels': [], 'data': []}
-        
-        students = Student.objects.filter(exam__subject=subject).distinct()
-        comparison_data = []
-        
-        for student in students:
-            exams = student.exam_set.filter(subject=subject)
-            if exams.exists():
-                total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-                total_possible_marks = sum(float(e.total_marks) for e in exams)
-                avg_percentage = (total_marks_obtained * 100 / total_possible_marks) if total_possible_marks > 0 else 0
-                comparison_data.append({
-                    'student': student.name,
-                    'average': round(avg_percentage, 2)
-                })
-        
-        comparison_data = sorted(comparison_data, key=lambda x: x['average'], reverse=True)
-        labels = [item['student'] for item in comparison_data]
-        data = [float(item['average']) for item in comparison_data]
-        
-        return {'labels': labels, 'data': data}
+        comparison_data = LeaderboardService.subject_wise_leaderboard(subject_id)
+        return (
+            payloads.Columns(len(comparison_data))
+            .dictionary(
+                'student',
+                [item['student'].id for item in comparison_data],
+                {item['student'].id: {'id': item['student'].id, 'name': item['student'].name} for item in comparison_data},
+            )
+            .scaled('average', [item['average'] for item in comparison_data])
+            .payload()
+        )
     
     @staticmethod
-    def overall_grade_distribution():
-        """Generate chart for overall grade distribution"""
-        grade_data = DashboardService.get_grade_distribution()
-        labels = [item['grade'] for item in grade_data]
-        data = [item['count'] for item in grade_data]
-        colors = [item['color'] for item in grade_data]
-        
-        return {'labels': labels, 'data': data, 'colors': colors}
+    def overall_grade_distribution(class_number=None):
+        """Generate chart for overall grade distribution (optionally of one class)"""
+        grade_data = DashboardService.get_grade_distribution(class_number)
+        return ChartDataService.grade_distribution_payload(
+            {item['grade']: item['count'] for item in grade_data}
+        )
+    
+    @staticmethod
+    def dashboard_subject_performance(subject_performance):
+        """Columnar per-subject averages embedded in the dashboard"""
+        best_students = {
+            item['best_student'].id: {'id': item['best_student'].id, 'name': item['best_student'].name}
+            for item in subject_performance if item['best_student']
+        }
+        return (
+            payloads.Columns(len(subject_performance))
+            .dictionary(
+                'subject',
+                [item['subject'].id for item in subject_performance],
+                {item['subject'].id: {'id': item['subject'].id, 'name': item['subject'].name} for item in subject_performance},
+            )
+            .scaled('average_percentage', [item['average_percentage'] for item in subject_performance])
+            .plain('total_exams', [item['total_exams'] for item in subject_performance])
+            .dictionary(
+                'best_student',
+                [item['best_student'].id if item['best_student'] else None for item in subject_performance],
+                best_students,
+            )
+            .payload()
+        )
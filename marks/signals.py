@@ -1,14 +1,64 @@
-
+from django.core.signals import request_started
 from django.db.models.signals import pre_save, post_delete, post_save
 from django.dispatch import receiver
+from django.db import transaction
 from django.db.models import Max
-from .models import Exam
+from . import grading, search
+from .models import (
+    Exam, ExamType, GradeScale, GradeThreshold, Student, Subject, LifetimePoints, PointsLedgerEntry,
+)
+from .services import ClassAnalyticsService, ExamStatsService, RecalcQueueService
+
+
+@receiver(post_save, sender=Student)
+def provision_lifetime_points(sender, instance, created, **kwargs):
+    """Give every new student a LifetimePoints row so pages never create it on read"""
+    # Fixtures (loaddata) bring their own rows; see restore --rebuild-only
+    if created and not kwargs.get('raw'):
+        LifetimePoints.objects.bulk_create([LifetimePoints(student=instance)], ignore_conflicts=True)
+
+
+@receiver(pre_save, sender=Exam)
+def remember_previous_exam(sender, instance, **kwargs):
+    """Remember the student, subject, class, date and exam_id an edited exam is moving away from"""
+    instance._previous_state = None
+    if instance.pk and not kwargs.get('raw'):
+        instance._previous_state = Exam.objects.filter(pk=instance.pk).values_list(
+            'student_id', 'subject_id', 'class_number', 'date', 'exam_id'
+        ).first()
+
 
 @receiver(post_save, sender=Exam)
-def recalculate_points_on_save(sender, instance, **kwargs):
-    """Recalculate student's lifetime points after exam save."""
-    if instance.student:
-        instance.student.recalculate_lifetime_points()
+def enqueue_recalculation_on_save(sender, instance, **kwargs):
+    """Queue recalculation of points and standings touched by this exam"""
+    if kwargs.get('raw'):
+        # Loaded fixtures are rebuilt in one pass by restore --rebuild-only
+        return
+    current = (instance.student_id, instance.subject_id, instance.class_number, instance.date)
+    RecalcQueueService.enqueue_exam_change(*current)
+    previous = getattr(instance, '_previous_state', None)
+    if previous and previous[:4] != current:
+        RecalcQueueService.enqueue_exam_change(*previous[:4])
+
+
+@receiver(post_save, sender=Exam)
+def invalidate_exam_stats_on_save(sender, instance, **kwargs):
+    """Drop cached distribution statistics of the exam (and the one it moved out of)"""
+    exam_ids = [instance.exam_id]
+    previous = getattr(instance, '_previous_state', None)
+    if previous:
+        exam_ids.append(previous[4])
+    transaction.on_commit(lambda: ExamStatsService.invalidate(exam_ids))
+
+
+@receiver(post_save, sender=Exam)
+def invalidate_class_analytics_on_save(sender, instance, **kwargs):
+    """Drop cached analytics of the exam's class (and the class it moved out of)"""
+    class_numbers = {instance.class_number}
+    previous = getattr(instance, '_previous_state', None)
+    if previous:
+        class_numbers.add(previous[2])
+    transaction.on_commit(lambda: ClassAnalyticsService.invalidate(class_numbers))
 
 
 @receiver(pre_save, sender=Exam)
@@ -32,7 +82,83 @@ def assign_exam_id(sender, instance, **kwargs):
 
 
 @receiver(post_delete, sender=Exam)
-def recalculate_points_on_delete(sender, instance, **kwargs):
-    """Recalculate student's lifetime points after exam deletion"""
-    if instance.student:
-        instance.student.recalculate_lifetime_points()
+def invalidate_exam_stats_on_delete(sender, instance, **kwargs):
+    """Drop cached distribution statistics of the exam"""
+    transaction.on_commit(lambda: ExamStatsService.invalidate([instance.exam_id]))
+
+
+@receiver(post_delete, sender=Exam)
+def invalidate_class_analytics_on_delete(sender, instance, **kwargs):
+    """Drop cached analytics of the exam's class"""
+    transaction.on_commit(lambda: ClassAnalyticsService.invalidate([instance.class_number]))
+
+
+@receiver(post_delete, sender=Exam)
+def enqueue_recalculation_on_delete(sender, instance, **kwargs):
+    """Queue recalculation of points and standings after exam deletion"""
+    RecalcQueueService.enqueue_exam_change(
+        instance.student_id, instance.subject_id, instance.class_number, instance.date
+    )
+
+
+@receiver(post_save, sender=GradeScale)
+@receiver(post_delete, sender=GradeScale)
+@receiver(post_save, sender=GradeThreshold)
+@receiver(post_delete, sender=GradeThreshold)
+def grading_policy_changed(sender, **kwargs):
+    """Recompile grading policies and recalculate points earned under the old ones"""
+    grading.invalidate(broadcast=False)
+    transaction.on_commit(grading.invalidate)
+    transaction.on_commit(ClassAnalyticsService.invalidate_all)
+    RecalcQueueService.enqueue_students()
+    # Exam points are summed in the rollup cube
+    RecalcQueueService.enqueue_months()
+
+
+@receiver(post_save, sender=ExamType)
+@receiver(post_delete, sender=ExamType)
+def exam_type_changed(sender, instance, created=False, **kwargs):
+    """Exam types are looked up by id in the compiled grading policies"""
+    grading.invalidate(broadcast=False)
+    transaction.on_commit(grading.invalidate)
+    if not created:
+        RecalcQueueService.enqueue_students()
+        RecalcQueueService.enqueue_months()
+
+
+@receiver(request_started)
+def check_grading_generation(sender, **kwargs):
+    """Pick up grading policy changes made by other processes"""
+    grading.check_generation()
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_search(sender, **kwargs):
+    """Rebuild the student typeahead index after students change"""
+    transaction.on_commit(lambda: search.invalidate('students'))
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def invalidate_subject_search(sender, **kwargs):
+    """Rebuild the subject typeahead index after subjects change"""
+    transaction.on_commit(lambda: search.invalidate('subjects'))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=ExamType)
+@receiver(post_delete, sender=ExamType)
+def invalidate_all_class_analytics(sender, **kwargs):
+    """Names (and student and subject counts) appear in the analytics of every class"""
+    transaction.on_commit(ClassAnalyticsService.invalidate_all)
+
+
+@receiver(post_save, sender=PointsLedgerEntry)
+def invalidate_class_analytics_on_points(sender, instance, created, **kwargs):
+    """The all-classes rankings rank by lifetime points earned"""
+    if created and instance.kind != PointsLedgerEntry.KIND_SPEND:
+        transaction.on_commit(ClassAnalyticsService.invalidate)
@@ -9,7 +9,8 @@ urlpatterns = [
     path('students/', views.student_list, name='student_list'),
     path('students/<int:student_id>/', views.student_detail, name='student_detail'),
     path('students/add/', views.add_student, name='add_student'),
-    path('students/compare/<int:student1_id>/<int:student2_id>/', views.compare_students, name='compare_students'),
+    path('students/compare/', views.compare_students, name='compare_students'),
+    path('students/compare/<int:student1_id>/<int:student2_id>/', views.compare_two_students, name='compare_two_students'),
     
     # Subject pages
     path('subjects/', views.subject_list, name='subject_list'),
@@ -20,6 +21,7 @@ urlpatterns = [
     path('exams/', views.all_exams, name='all_exams'),
     path('exams/add/', views.add_exam, name='add_exam'),
     path('exams/add-bulk/', views.add_bulk_exam, name='add_bulk_exams'),
+    path('exams/<int:exam_id>/', views.exam_detail, name='exam_detail'),
     path('exam-types/add/', views.add_exam_type, name='add_exam_type'),
     
     # Points page
@@ -38,4 +40,13 @@ urlpatterns = [
     path('api/grade-distribution/<int:student_id>/', views.api_grade_distribution, name='api_grade_distribution'),
     path('api/student-comparison/<int:subject_id>/', views.api_student_comparison, name='api_student_comparison'),
     path('api/overall-grade-distribution/', views.api_overall_grade_distribution, name='api_overall_grade_distribution'),
+    path('api/exams/<int:exam_id>/stats/', views.api_exam_stats, name='api_exam_stats'),
+    path('api/search/students/', views.api_search_students, name='api_search_students'),
+    path('api/search/subjects/', views.api_search_subjects, name='api_search_subjects'),
+    path('api/trends/', views.api_trends, name='api_trends'),
+    path('api/rollup/', views.api_rollup, name='api_rollup'),
+    path('api/head-to-head/', views.api_head_to_head, name='api_head_to_head'),
+    path('api/rank-history/<int:student_id>/', views.api_rank_history, name='api_rank_history'),
+    path('api/rankings/as-of/', views.api_rankings_as_of, name='api_rankings_as_of'),
+    path('api/recalc-queue/', views.api_recalc_queue, name='api_recalc_queue'),
 ]
@@ -1,46 +1,71 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
+from django.urls import reverse
 from django.contrib import messages
-from django.db.models import Sum, Q
-import json
-from .models import Student, Subject, ExamType, Exam, GradeScale, LifetimePoints, PointsSpent
-from .services import LeaderboardService, DashboardService, ChartDataService, count_unique_exams
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Sum, Avg, Max, Min, Count, F
+from django.db.models.functions import Coalesce
+from .models import (
+    Student, Subject, ExamType, Exam, LifetimePoints, PointsSpent, SubjectStanding, RankingSnapshot,
+)
+from . import payloads, search, services
+from .services import (
+    LeaderboardService, ChartDataService, StandingsService, RecalcQueueService,
+    TrendService, ExamStatsService, ClassAnalyticsService, RollupService, SnapshotService, ComparisonService,
+    HeadToHeadService,
+    count_unique_exams, excellence_aggregates,
+)
+
+# Rows per page in the points spent history table
+POINTS_HISTORY_PAGE_SIZE = 25
+
+# Rows per page in the all exams table
+EXAMS_PAGE_SIZE = 50
+
+# ?sort= orderings of the all exams table (stored_percentage is indexed)
+EXAM_SORTS = {
+    'recent': ('-date', '-exam_id'),
+    'score_desc': ('-stored_percentage', '-date', '-exam_id'),
+    'score_asc': ('stored_percentage', '-date', '-exam_id'),
+}
+
+
+def _class_filter(request):
+    """
+    Read the ?class_number= filter.
+    
+    Returns:
+        tuple: (selected value for the class dropdown, class number or None for all classes)
+    """
+    class_filter = request.GET.get('class_number', 'all')
+    try:
+        return class_filter, int(class_filter)
+    except ValueError:
+        return 'all', None
 
 
 def dashboard(request):
-    """Main dashboard view with analytics"""
-    summary = DashboardService.get_dashboard_summary()
-    subject_performance = DashboardService.get_subject_performance_table()
-    exam_type_performance = DashboardService.get_exam_type_performance_table()
-    grade_distribution = DashboardService.get_grade_distribution()
-    recent_exams = DashboardService.get_recent_exams(limit=10)
-    
-    # Leaderboards
-    total_marks_leaderboard = LeaderboardService.total_marks_leaderboard()[:5]
-    average_leaderboard = LeaderboardService.average_leaderboard()[:5]
-    points_leaderboard = LeaderboardService.lifetime_points_leaderboard()[:5]
-    
-    # Serialize subject_performance for JavaScript
-    subject_performance_json = json.dumps([
-        {
-            'subject': {'name': item['subject'].name, 'id': item['subject'].id},
-            'average_percentage': item['average_percentage'],
-            'total_exams': item['total_exams'],
-            'best_student': item['best_student'].name if item['best_student'] else None
-        }
-        for item in subject_performance
-    ])
+    """Main dashboard view with analytics (optionally for one class)"""
+    class_filter, class_number = _class_filter(request)
+    analytics = ClassAnalyticsService.dashboard(class_number)
+    subject_performance = analytics['subject_performance']
+    
+    # Lifetime points change with every spend, so they are read live
+    points_leaderboard = LeaderboardService.lifetime_points_leaderboard(class_number)[:5]
     
     context = {
-        'summary': summary,
+        'summary': analytics['summary'],
         'subject_performance': subject_performance,
-        'subject_performance_json': subject_performance_json,
-        'exam_type_performance': exam_type_performance,
-        'grade_distribution': grade_distribution,
-        'recent_exams': recent_exams,
-        'total_marks_leaderboard': total_marks_leaderboard,
-        'average_leaderboard': average_leaderboard,
+        'subject_performance_chart': ChartDataService.dashboard_subject_performance(subject_performance),
+        'exam_type_performance': analytics['exam_type_performance'],
+        'grade_distribution': analytics['grade_distribution'],
+        'recent_exams': analytics['recent_exams'],
+        'total_marks_leaderboard': analytics['total_marks_leaderboard'],
+        'average_leaderboard': analytics['average_leaderboard'],
         'points_leaderboard': points_leaderboard,
+        'available_classes': ClassAnalyticsService.available_classes(),
+        'selected_class': class_filter,
     }
     
     return render(request, 'marks/dashboard.html', context)
@@ -48,18 +73,7 @@ def dashboard(request):
 
 def student_list(request):
     """List all students"""
-    students = Student.objects.all().order_by('name')
-    
-    # Add computed properties for sorting/display
-    student_data = [
-        {
-            'student': student,
-            'total_marks': student.total_marks,
-            'average': student.average_percentage,
-            'rank': student.rank
-        }
-        for student in students
-    ]
+    student_data = sorted(LeaderboardService.student_ranking(), key=lambda item: item['student'].name)
     
     context = {'students': student_data}
     return render(request, 'marks/student_list.html', context)
@@ -67,8 +81,7 @@ def student_list(request):
 
 def student_detail(request, student_id):
     """Student profile dashboard"""
-    from datetime import datetime
-    from django.db.models import Avg, Sum
+    from datetime import date
     
     student = get_object_or_404(Student, id=student_id)
     
@@ -77,6 +90,7 @@ def student_detail(request, student_id):
     exam_type_summary = student.exam_type_summary()
     grade_frequency = student.grade_frequency()
     recent_exams = student.exam_set.all().order_by('-date', '-exam_id')[:10]
+    subject_trends = TrendService.compute(student_ids=[student.id])
     
     # Get lifetime points
     try:
@@ -85,155 +99,43 @@ def student_detail(request, student_id):
         lifetime_points = None
     
     # Calculate Excellence Rate (CQ >=80%, MCQ >=85%)
-    exams = student.exam_set.all()
-    total_exams = student.total_exams
-    excellence_rate = 0
-    
-    if total_exams > 0:
-        excellent_exams = 0
-        for exam in exams:
-            # Count exams meeting excellence criteria based on exam type
-            percentage = exam.percentage
-            exam_type_name = exam.exam_type.name.upper().strip()
-            
-            if exam_type_name == "MCQ" and percentage >= 85:
-                excellent_exams += 1
-            elif exam_type_name == "CQ" and percentage >= 80:
-                excellent_exams += 1
-        excellence_rate = (excellent_exams / total_exams) * 100
-    
-    # Calculate Monthly Winner Count (only past months, #1 positions)
-    from datetime import date
-    current_year = date.today().year
-    current_month = date.today().month
-    
-    monthly_winner_count = 0
-    exam_dates = Exam.objects.values_list('date', flat=True).distinct()
-    months_set = set()
-    
-    for exam_date in exam_dates:
-        if exam_date:
-            # Only count months that have fully passed
-            if (exam_date.year < current_year) or (exam_date.year == current_year and exam_date.month < current_month):
-                months_set.add((exam_date.year, exam_date.month))
-    
-    for year, month in months_set:
-        # Get all students who had exams in this month
-        students_in_month = Student.objects.filter(
-            exam__date__year=year,
-            exam__date__month=month
-        ).distinct()
-        
-        month_rankings = []
-        for s in students_in_month:
-            month_exams = s.exam_set.filter(date__year=year, date__month=month)
-            exams_count = month_exams.values('exam_id').distinct().count()
-            
-            if exams_count > 0:
-                total_marks = sum(float(e.mark_obtained) for e in month_exams)
-                total_possible = sum(float(e.total_marks) for e in month_exams)
-                avg_percentage = (total_marks * 100 / total_possible) if total_possible > 0 else 0
-                
-                month_rankings.append({
-                    'student_id': s.id,
-                    'average_percentage': avg_percentage,
-                    'total_marks': total_marks,
-                })
-        
-        # Sort by average score (primary), then total marks (tie-breaker)
-        month_rankings.sort(key=lambda x: (x['average_percentage'], x['total_marks']), reverse=True)
-        
-        # Check if this student is tied for #1
-        if month_rankings:
-            top_avg = month_rankings[0]['average_percentage']
-            top_total = month_rankings[0]['total_marks']
-            
-            # Find this student in rankings
-            for ranking in month_rankings:
-                if ranking['student_id'] == student.id:
-                    # If this student has same avg AND same total marks as top, count it as a win
-                    if (abs(ranking['average_percentage'] - top_avg) < 0.01 and
-                        ranking['total_marks'] == top_total):
-                        monthly_winner_count += 1
-                    break
-    
-    # Calculate Subject Champion Count (how many subjects they've topped)
-    subject_champion_count = 0
-    subjects = Subject.objects.all()
-    
-    for subject in subjects:
-        students_in_subject = Student.objects.filter(exam__subject=subject).distinct()
-        subject_rankings = []
-        
-        for s in students_in_subject:
-            subject_exams = s.exam_set.filter(subject=subject)
-            exams_count = subject_exams.count()
-            
-            if exams_count > 0:
-                total_marks = sum(float(e.mark_obtained) for e in subject_exams)
-                total_possible = sum(float(e.total_marks) for e in subject_exams)
-                avg_percentage = (total_marks * 100 / total_possible) if total_possible > 0 else 0
-                
-                subject_rankings.append({
-                    'student_id': s.id,
-                    'average_percentage': avg_percentage,
-                    'total_marks': total_marks,
-                })
-        
-        # Sort by average score (primary), then total marks (tie-breaker)
-        subject_rankings.sort(key=lambda x: (x['average_percentage'], x['total_marks']), reverse=True)
-        
-        # Check if this student is tied for #1
-        if subject_rankings:
-            top_avg = subject_rankings[0]['average_percentage']
-            top_total = subject_rankings[0]['total_marks']
-            
-            # Find this student in rankings
-            for ranking in subject_rankings:
-                if ranking['student_id'] == student.id:
-                    # If this student has same avg AND same total marks as top, count it
-                    if (abs(ranking['average_percentage'] - top_avg) < 0.01 and
-                        ranking['total_marks'] == top_total):
-                        subject_champion_count += 1
-                    break
-    
-    # Calculate Best 5 Months (exclude current month)
-    monthly_performance = []
-    all_exam_dates = student.exam_set.values_list('date', flat=True).distinct()
-    student_months_set = set()
-    
-    for exam_date in all_exam_dates:
-        if exam_date:
-            # Only include months that have fully passed
-            if (exam_date.year < current_year) or (exam_date.year == current_year and exam_date.month < current_month):
-                student_months_set.add((exam_date.year, exam_date.month))
-    
-    for year, month in student_months_set:
-        month_exams = student.exam_set.filter(date__year=year, date__month=month)
-        exams_count = month_exams.count()
-        
-        if exams_count > 0:
-            total_marks = sum(float(e.mark_obtained) for e in month_exams)
-            total_possible = sum(float(e.total_marks) for e in month_exams)
-            avg_percentage = (total_marks * 100 / total_possible) if total_possible > 0 else 0
-            points_earned = sum(e.points_earned for e in month_exams)
-            
-            month_name = datetime(year, month, 1).strftime('%B %Y')
-            
-            monthly_performance.append({
-                'month_name': month_name,
-                'exams_count': exams_count,
-                'average_percentage': avg_percentage,
-                'points_earned': points_earned,
-            })
+    excellence_rate = services.excellence_rate(
+        student.exam_set.aggregate(**excellence_aggregates(unique_exams=True))
+    )
+    
+    # Monthly Winner Count (only past months, #1 positions, ties share the win)
+    current_month_start = date.today().replace(day=1)
+    monthly_winner_count = sum(
+        1
+        for month_rows in RollupService.monthly_rankings(before=current_month_start).values()
+        for row in month_rows
+        if row['student_id'] == student.id and row['rank'] == 1
+    )
+    
+    # Subject Champion Count (how many subjects they've topped)
+    subject_champion_count = student.subject_champion_count()
+    
+    # Overall rank (same order as Student.rank, from one grouped query)
+    rank = next(
+        row['rank'] for row in LeaderboardService.student_ranking() if row['student'].id == student.id
+    )
+    
+    # Calculate Best 5 Months (exclude current month) from the rollup cube
+    monthly_performance = [
+        {
+            'month_name': row['month'].strftime('%B %Y'),
+            'exams_count': row['rated_exams'],
+            'average_percentage': row['average_percentage'],
+            'points_earned': row['points'],
+        }
+        for row in RollupService.query(('month',), student_id=student.id, month__lt=current_month_start)
+        if row['rated_exams'] > 0
+    ]
     
     # Sort by average percentage and get top 5
     monthly_performance.sort(key=lambda x: x['average_percentage'], reverse=True)
     best_5_months = monthly_performance[:5]
     
-    # Get all other students for comparison dropdown
-    all_students = Student.objects.exclude(id=student_id).order_by('name')
-    
     context = {
         'student': student,
         'subject_summary': subject_summary,
@@ -244,219 +146,99 @@ def student_detail(request, student_id):
         'excellence_rate': excellence_rate,
         'monthly_winner_count': monthly_winner_count,
         'subject_champion_count': subject_champion_count,
+        'rank': rank,
         'best_5_months': best_5_months,
-        'all_students': all_students,
+        'subject_trends': subject_trends,
     }
     
     return render(request, 'marks/student_detail.html', context)
 
 
-def compare_students(request, student1_id, student2_id):
-    """Compare two students side by side"""
-    from datetime import date
-    
-    student1 = get_object_or_404(Student, id=student1_id)
-    student2 = None
-    if student2_id != 0:
-        student2 = get_object_or_404(Student, id=student2_id)
-    
-    # Get all other students for the dropdown
-    all_students = Student.objects.exclude(id=student1_id).order_by('name')
-    
-    def get_student_stats(student):
-        """Get comprehensive stats for a student"""
-        # Basic stats
-        total_marks = student.total_marks
-        average_percentage = student.average_percentage
-        total_exams = student.total_exams
-        rank = student.rank
-        
-        # Excellence rate
-        exams = student.exam_set.all()
-        excellence_rate = 0
-        if total_exams > 0:
-            excellent_exams = 0
-            for exam in exams:
-                percentage = exam.percentage
-                exam_type_name = exam.exam_type.name.upper().strip()
-                if exam_type_name == "MCQ" and percentage >= 85:
-                    excellent_exams += 1
-                elif exam_type_name == "CQ" and percentage >= 80:
-                    excellent_exams += 1
-            excellence_rate = (excellent_exams / total_exams) * 100
-        
-        # Monthly winner count
-        current_year = date.today().year
-        current_month = date.today().month
-        monthly_winner_count = 0
-        
-        exam_dates = Exam.objects.values_list('date', flat=True).distinct()
-        months_set = set()
-        for exam_date in exam_dates:
-            if exam_date:
-                if (exam_date.year < current_year) or (exam_date.year == current_year and exam_date.month < current_month):
-                    months_set.add((exam_date.year, exam_date.month))
-        
-        for year, month in months_set:
-            students_in_month = Student.objects.filter(
-                exam__date__year=year,
-                exam__date__month=month
-            ).distinct()
-            
-            month_rankings = []
-            for s in students_in_month:
-                month_exams = s.exam_set.filter(date__year=year, date__month=month)
-                exams_count = month_exams.count()
-                if exams_count > 0:
-                    total_m = sum(float(e.mark_obtained) for e in month_exams)
-                    total_p = sum(float(e.total_marks) for e in month_exams)
-                    avg_p = (total_m * 100 / total_p) if total_p > 0 else 0
-                    month_rankings.append({
-                        'student_id': s.id,
-                        'average_percentage': avg_p,
-                        'total_marks': total_m
-                    })
-            
-            # Sort by average score (primary), then total marks (tie-breaker)
-            month_rankings.sort(key=lambda x: (x['average_percentage'], x['total_marks']), reverse=True)
-            
-            # Check if this student is tied for #1
-            if month_rankings:
-                top_avg = month_rankings[0]['average_percentage']
-                top_total = month_rankings[0]['total_marks']
-                
-                for ranking in month_rankings:
-                    if ranking['student_id'] == student.id:
-                        if (abs(ranking['average_percentage'] - top_avg) < 0.01 and
-                            ranking['total_marks'] == top_total):
-                            monthly_winner_count += 1
-                        break
-        
-        # Subject champion count
-        subject_champion_count = 0
-        subjects = Subject.objects.all()
-        for subject in subjects:
-            students_in_subject = Student.objects.filter(exam__subject=subject).distinct()
-            subject_rankings = []
-            for s in students_in_subject:
-                subject_exams = s.exam_set.filter(subject=subject)
-                exams_count = subject_exams.values('exam_id').distinct().count()
-                if exams_count > 0:
-                    total_m = sum(float(e.mark_obtained) for e in subject_exams)
-                    total_p = sum(float(e.total_marks) for e in subject_exams)
-                    avg_p = (total_m * 100 / total_p) if total_p > 0 else 0
-                    subject_rankings.append({
-                        'student_id': s.id,
-                        'average_percentage': avg_p,
-                        'total_marks': total_m
-                    })
-            
-            # Sort by average score (primary), then total marks (tie-breaker)
-            subject_rankings.sort(key=lambda x: (x['average_percentage'], x['total_marks']), reverse=True)
-            
-            # Check if this student is tied for #1
-            if subject_rankings:
-                top_avg = subject_rankings[0]['average_percentage']
-                top_total = subject_rankings[0]['total_marks']
-                
-                for ranking in subject_rankings:
-                    if ranking['student_id'] == student.id:
-                        if (abs(ranking['average_percentage'] - top_avg) < 0.01 and
-                            ranking['total_marks'] == top_total):
-                            subject_champion_count += 1
-                        break
-        
-        # Best month
-        from datetime import datetime
-        monthly_performance = []
-        all_exam_dates = student.exam_set.values_list('date', flat=True).distinct()
-        student_months_set = set()
-        for exam_date in all_exam_dates:
-            if exam_date:
-                if (exam_date.year < current_year) or (exam_date.year == current_year and exam_date.month < current_month):
-                    student_months_set.add((exam_date.year, exam_date.month))
-        
-        for year, month in student_months_set:
-            month_exams = student.exam_set.filter(date__year=year, date__month=month)
-            exams_count = month_exams.values('exam_id').distinct().count()
-            if exams_count > 0:
-                total_m = sum(float(e.mark_obtained) for e in month_exams)
-                total_p = sum(float(e.total_marks) for e in month_exams)
-                avg_p = (total_m * 100 / total_p) if total_p > 0 else 0
-                month_name = datetime(year, month, 1).strftime('%B %Y')
-                monthly_performance.append({
-                    'month_name': month_name,
-                    'average_percentage': avg_p,
-                })
-        
-        monthly_performance.sort(key=lambda x: x['average_percentage'], reverse=True)
-        best_month = monthly_performance[0]['month_name'] if monthly_performance else 'N/A'
-        
-        # Subject-wise performance
-        subject_summary = student.subject_wise_summary()
-        
-        # Lifetime points
+def compare_students(request):
+    """Compare any number of students side by side (?ids=3,7,12)"""
+    student_ids = []
+    for value in request.GET.get('ids', '').split(','):
         try:
-            lifetime_points = student.lifetimepoints.points_earned
-        except:
-            lifetime_points = 0
-        
-        # MCQ and CQ averages
-        mcq_exams = exams.filter(exam_type__name__iexact='MCQ')
-        cq_exams = exams.filter(exam_type__name__iexact='CQ')
-        
-        mcq_average = 0
-        if mcq_exams.exists():
-            mcq_total_obtained = sum(float(e.mark_obtained) for e in mcq_exams)
-            mcq_total_possible = sum(float(e.total_marks) for e in mcq_exams)
-            mcq_average = (mcq_total_obtained * 100 / mcq_total_possible) if mcq_total_possible > 0 else 0
-        
-        cq_average = 0
-        if cq_exams.exists():
-            cq_total_obtained = sum(float(e.mark_obtained) for e in cq_exams)
-            cq_total_possible = sum(float(e.total_marks) for e in cq_exams)
-            cq_average = (cq_total_obtained * 100 / cq_total_possible) if cq_total_possible > 0 else 0
-        
-        return {
-            'student': student,
-            'total_marks': total_marks,
-            'average_percentage': average_percentage,
-            'total_exams': total_exams,
-            'rank': rank,
-            'excellence_rate': round(excellence_rate, 1),
-            'monthly_winner_count': monthly_winner_count,
-            'subject_champion_count': subject_champion_count,
-            'best_month': best_month,
-            'subject_summary': subject_summary,
-            'lifetime_points': lifetime_points,
-            'mcq_average': round(mcq_average, 1),
-            'cq_average': round(cq_average, 1),
-        }
+            student_ids.append(int(value))
+        except ValueError:
+            continue
+    student_ids = list(dict.fromkeys(student_ids))[:ComparisonService.MAX_STUDENTS]
+    
+    comparison = ComparisonService.compare(student_ids)
+    if len(comparison) < len(student_ids):
+        raise Http404("Student not found")
     
-    stats1 = get_student_stats(student1)
-    stats2 = get_student_stats(student2) if student2 else None
+    # Links that drop one student from the comparison
+    for stats in comparison:
+        stats['remove_ids'] = ','.join(
+            str(student_id) for student_id in student_ids if student_id != stats['student'].id
+        )
+    
+    # Head-to-head heatmap: row student against column student over shared exams
+    head_to_head = HeadToHeadService.table(ClassAnalyticsService.head_to_head(), student_ids)
+    head_to_head_rows = []
+    for i, row_student in enumerate(head_to_head['students']):
+        cells = []
+        for j, column_student in enumerate(head_to_head['students']):
+            wins, losses = head_to_head['wins'][i][j], head_to_head['losses'][i][j]
+            decided = wins + losses
+            win_rate = wins * 100 / decided if decided else None
+            if win_rate is None:
+                background = 'transparent'
+            else:
+                # Green when winning most decided exams, red when losing most
+                strength = 0.1 + abs(win_rate - 50) / 50 * 0.6
+                rgb = '16, 185, 129' if win_rate >= 50 else '239, 68, 68'
+                background = f'rgba({rgb}, {strength:.2f})'
+            cells.append({
+                'is_self': i == j,
+                'opponent': column_student['name'],
+                'wins': wins,
+                'losses': losses,
+                'ties': head_to_head['ties'][i][j],
+                'shared': head_to_head['shared'][i][j],
+                'average_margin': head_to_head['average_margin'][i][j],
+                'background': background,
+            })
+        head_to_head_rows.append({'student': row_student, 'cells': cells})
     
     context = {
-        'student1_stats': stats1,
-        'student2_stats': stats2,
-        'all_students': all_students,
+        'comparison': comparison,
+        'head_to_head_students': head_to_head['students'],
+        'head_to_head_rows': head_to_head_rows,
+        'student_ids': ','.join(map(str, student_ids)),
+        'max_students': ComparisonService.MAX_STUDENTS,
+        'can_add': len(student_ids) < ComparisonService.MAX_STUDENTS,
     }
     
     return render(request, 'marks/compare_students.html', context)
 
 
+def compare_two_students(request, student1_id, student2_id):
+    """Old two-student comparison URL (student2_id 0 = not picked yet)"""
+    student_ids = [student1_id] + ([student2_id] if student2_id else [])
+    return redirect(f"{reverse('compare_students')}?ids={','.join(map(str, student_ids))}")
+
+
 def subject_list(request):
     """List all subjects"""
-    subjects = Subject.objects.all().order_by('name')
-    
-    subject_data = []
-    for subject in subjects:
-        exams = Exam.objects.filter(subject=subject)
-        subject_data.append({
+    # Totals of every subject in one grouped query
+    subjects = Subject.objects.annotate(
+        marks_obtained=Coalesce(Sum('exam__mark_obtained'), 0),
+        marks_possible=Coalesce(Sum('exam__total_marks'), 0),
+        exam_count=Count('exam__exam_id', distinct=True),
+    ).order_by('name')
+    
+    subject_data = [
+        {
             'subject': subject,
-            'average': subject.average_marks,
-            'total_exams': count_unique_exams(exams)
-        })
+            'average': (
+                subject.marks_obtained * 100 / subject.marks_possible if subject.marks_possible > 0 else 0
+            ),
+            'total_exams': subject.exam_count,
+        }
+        for subject in subjects
+    ]
     
     context = {'subjects': subject_data}
     return render(request, 'marks/subject_list.html', context)
@@ -466,122 +248,87 @@ def subject_detail(request, subject_id):
     """Subject dashboard"""
     subject = get_object_or_404(Subject, id=subject_id)
     
-    # Get subject statistics
-    exams = Exam.objects.filter(subject=subject)
-    best_student = subject.best_student()
-    
     # Get all students in this subject with their performance
-    students = Student.objects.filter(exam__subject=subject).distinct()
-    student_performance = []
-    
-    for student in students:
-        student_exams = student.exam_set.filter(subject=subject)
-        total_marks_obtained = sum(float(e.mark_obtained) for e in student_exams)
-        total_possible_marks = sum(float(e.total_marks) for e in student_exams)
-        avg_percentage = (
-            (total_marks_obtained * 100 / total_possible_marks) 
-            if total_possible_marks > 0 else 0
-        )
-        
-        student_performance.append({
-            'student': student,
-            'average': round(avg_percentage, 2),
-            'exam_count': count_unique_exams(student_exams),
-            'total_marks_obtained': round(total_marks_obtained, 2),
-            'total_possible_marks': round(total_possible_marks, 2)
-        })
+    standings = SubjectStanding.objects.filter(
+        subject=subject,
+        class_number__isnull=True
+    ).select_related('student').order_by('rank', 'student__name')
+    students = [standing.student for standing in standings]
+    best_student = students[0] if students else None
+    student_performance = [
+        {
+            'student': standing.student,
+            'average': round(standing.average_percentage, 2),
+            'exam_count': standing.exam_count,
+            'total_marks_obtained': standing.total_marks_obtained,
+            'total_possible_marks': standing.total_possible_marks,
+            'rank': standing.rank,
+        }
+        for standing in standings
+    ]
     
-    student_performance = sorted(student_performance, key=lambda x: x['average'], reverse=True)
+    # Totals per exam type (and per exam type and student) from the rollup cube
+    type_totals = RollupService.query(('exam_type',), subject_id=subject.id)
+    student_totals = RollupService.query(('exam_type', 'student'), subject_id=subject.id)
+    type_names = dict(ExamType.objects.filter(
+        id__in=[row['exam_type_id'] for row in type_totals]
+    ).values_list('id', 'name'))
     
     # Calculate excellence rate: (Number of Excellent Exams / Total Exams) × 100%
     # CQ Excellence Threshold: ≥ 80%
     # MCQ Excellence Threshold: ≥ 85%
-    excellent_exams = 0
-    total_exams_count = 0
-    
-    for exam in exams:
-        total_exams_count += 1
-        # Check if exam meets excellence threshold
-        exam_type_name = exam.exam_type.name.upper().strip()
-        if exam_type_name == 'CQ' and exam.percentage >= 80:
-            excellent_exams += 1
-        elif exam_type_name == 'MCQ' and exam.percentage >= 85:
-            excellent_exams += 1
-    
-    excellence_rate = (excellent_exams / total_exams_count * 100) if total_exams_count > 0 else 0
-    
-    # Calculate CQ and MCQ statistics
-    cq_exams = exams.filter(exam_type__name__iexact='CQ')
-    mcq_exams = exams.filter(exam_type__name__iexact='MCQ')
-    
-    # CQ Statistics
-    cq_stats = {
-        'exam_count': count_unique_exams(cq_exams),  # Use unique count
-        'total_marks_obtained': 0,
-        'total_marks_possible': 0,
-        'average': 0,
-        'excellence_rate': 0,
-        'best_student': None,
-    }
-    
-    if cq_exams.exists():
-        cq_stats['total_marks_obtained'] = sum(float(e.mark_obtained) for e in cq_exams)
-        cq_stats['total_marks_possible'] = sum(float(e.total_marks) for e in cq_exams)
-        cq_stats['average'] = (cq_stats['total_marks_obtained'] * 100 / cq_stats['total_marks_possible']) if cq_stats['total_marks_possible'] > 0 else 0
-        
-        # CQ Excellence Rate (≥80%)
-        cq_excellent = sum(1 for e in cq_exams if e.percentage >= 80)
-        cq_total_count = cq_exams.count()  # Use total count for excellence rate
-        cq_stats['excellence_rate'] = (cq_excellent / cq_total_count * 100) if cq_total_count > 0 else 0
+    excellence_rate = services.excellence_rate({
+        'excellent_exams': sum(row['excellent_exams'] for row in type_totals),
+        'rated_exams': sum(row['rated_exams'] for row in type_totals),
+    })
+    
+    def exam_type_stats(type_name):
+        """Marks, excellence rate and best student of one exam type (CQ or MCQ)"""
+        type_ids = {type_id for type_id, name in type_names.items() if name.lower() == type_name.lower()}
+        rows = [row for row in type_totals if row['exam_type_id'] in type_ids]
+        stats = {
+            'exam_count': sum(row['unique_exams'] for row in rows),  # Use unique count
+            'total_marks_obtained': 0,
+            'total_marks_possible': 0,
+            'average': 0,
+            'excellence_rate': 0,
+            'best_student': None,
+        }
+        if not rows:
+            return stats
         
-        # Find best CQ student
-        cq_student_avgs = {}
-        for student in students:
-            student_cq = student.exam_set.filter(subject=subject, exam_type__name__iexact='CQ')
-            if student_cq.exists():
-                cq_marks = sum(float(e.mark_obtained) for e in student_cq)
-                cq_total = sum(float(e.total_marks) for e in student_cq)
-                cq_student_avgs[student] = (cq_marks * 100 / cq_total) if cq_total > 0 else 0
+        stats['total_marks_obtained'] = sum(row['total_obtained'] for row in rows)
+        stats['total_marks_possible'] = sum(row['total_possible'] for row in rows)
+        stats['average'] = (stats['total_marks_obtained'] * 100 / stats['total_marks_possible']) if stats['total_marks_possible'] > 0 else 0
+        stats['excellence_rate'] = services.excellence_rate({
+            'excellent_exams': sum(row['excellent_exams'] for row in rows),
+            'rated_exams': sum(row['rated_exams'] for row in rows),
+        })
         
-        if cq_student_avgs:
-            cq_stats['best_student'] = max(cq_student_avgs, key=cq_student_avgs.get)
-    
-    # MCQ Statistics
-    mcq_stats = {
-        'exam_count': count_unique_exams(mcq_exams),  # Use unique count
-        'total_marks_obtained': 0,
-        'total_marks_possible': 0,
-        'average': 0,
-        'excellence_rate': 0,
-        'best_student': None,
-    }
+        # Find the best student (ties go to the better overall standing)
+        marks = {}
+        for row in student_totals:
+            if row['exam_type_id'] in type_ids:
+                obtained, possible = marks.get(row['student_id'], (0, 0))
+                marks[row['student_id']] = (obtained + row['total_obtained'], possible + row['total_possible'])
+        student_avgs = {
+            student: (marks[student.id][0] * 100 / marks[student.id][1]) if marks[student.id][1] > 0 else 0
+            for student in students if student.id in marks
+        }
+        if student_avgs:
+            stats['best_student'] = max(student_avgs, key=student_avgs.get)
+        return stats
     
-    if mcq_exams.exists():
-        mcq_stats['total_marks_obtained'] = sum(float(e.mark_obtained) for e in mcq_exams)
-        mcq_stats['total_marks_possible'] = sum(float(e.total_marks) for e in mcq_exams)
-        mcq_stats['average'] = (mcq_stats['total_marks_obtained'] * 100 / mcq_stats['total_marks_possible']) if mcq_stats['total_marks_possible'] > 0 else 0
-        
-        # MCQ Excellence Rate (≥85%)
-        mcq_excellent = sum(1 for e in mcq_exams if e.percentage >= 85)
-        mcq_total_count = mcq_exams.count()  # Use total count for excellence rate
-        mcq_stats['excellence_rate'] = (mcq_excellent / mcq_total_count * 100) if mcq_total_count > 0 else 0
-        
-        # Find best MCQ student
-        mcq_student_avgs = {}
-        for student in students:
-            student_mcq = student.exam_set.filter(subject=subject, exam_type__name__iexact='MCQ')
-            if student_mcq.exists():
-                mcq_marks = sum(float(e.mark_obtained) for e in student_mcq)
-                mcq_total = sum(float(e.total_marks) for e in student_mcq)
-                mcq_student_avgs[student] = (mcq_marks * 100 / mcq_total) if mcq_total > 0 else 0
-        
-        if mcq_student_avgs:
-            mcq_stats['best_student'] = max(mcq_student_avgs, key=mcq_student_avgs.get)
+    cq_stats = exam_type_stats('CQ')
+    mcq_stats = exam_type_stats('MCQ')
+    
+    total_obtained = sum(row['total_obtained'] for row in type_totals)
+    total_possible = sum(row['total_possible'] for row in type_totals)
     
     context = {
         'subject': subject,
-        'average_marks': subject.average_marks,
-        'total_exams': count_unique_exams(exams),
+        'average_marks': (total_obtained * 100 / total_possible) if total_possible > 0 else 0,
+        'total_exams': sum(row['unique_exams'] for row in type_totals),
         'best_student': best_student,
         'student_performance': student_performance,
         'excellence_rate': round(excellence_rate, 1),
@@ -685,15 +432,8 @@ def add_exam(request):
         else:
             messages.error(request, 'All required fields must be filled!')
     
-    students = Student.objects.all().order_by('name')
-    subjects = Subject.objects.all().order_by('name')
-    
-    context = {
-        'students': students,
-        'subjects': subjects,
-    }
-    
-    return render(request, 'marks/add_exam.html', context)
+    # Students and subjects are picked with typeahead fields (api/search/)
+    return render(request, 'marks/add_exam.html')
 
 
 def add_bulk_exam(request):
@@ -725,27 +465,29 @@ def add_bulk_exam(request):
                     import uuid
                     from datetime import datetime
                     group_id = f"bulk_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
-                    # Create exams for all students
+                    # Create exams for all students in one transaction, so the
+                    # recalculation jobs they queue are committed (and coalesced) together
                     created_count = 0
-                    for i in range(1, student_count + 1):
-                        student_id = request.POST.get(f'student_{i}')
-                        mark_obtained = request.POST.get(f'marks_{i}')
-                        if student_id and mark_obtained:
-                            student = Student.objects.get(id=student_id)
-                            mark_obtained = int(mark_obtained)
-                            Exam.objects.create(
-                                student=student,
-                                subject=subject,
-                                exam_type=exam_type,
-                                date=date,
-                                chapter=chapter if chapter else None,
-                                class_number=class_number,
-                                total_marks=total_marks,
-                                mark_obtained=mark_obtained,
-                                group_id=group_id,
-                                exam_id=exam_id
-                            )
-                            created_count += 1
+                    with transaction.atomic():
+                        for i in range(1, student_count + 1):
+                            student_id = request.POST.get(f'student_{i}')
+                            mark_obtained = request.POST.get(f'marks_{i}')
+                            if student_id and mark_obtained:
+                                student = Student.objects.get(id=student_id)
+                                mark_obtained = int(mark_obtained)
+                                Exam.objects.create(
+                                    student=student,
+                                    subject=subject,
+                                    exam_type=exam_type,
+                                    date=date,
+                                    chapter=chapter if chapter else None,
+                                    class_number=class_number,
+                                    total_marks=total_marks,
+                                    mark_obtained=mark_obtained,
+                                    group_id=group_id,
+                                    exam_id=exam_id
+                                )
+                                created_count += 1
                     messages.success(request, f'Successfully added 1 exam with {created_count} student results!')
                     return redirect('all_exams')
                 except Exception as e:
@@ -756,12 +498,8 @@ def add_bulk_exam(request):
             # Step 1: Get student count and show the form
             student_count = int(request.POST.get('student_count', 0))
     
-    students = Student.objects.all().order_by('name')
-    subjects = Subject.objects.all().order_by('name')
-    
+    # Students and subjects are picked with typeahead fields (api/search/)
     context = {
-        'students': students,
-        'subjects': subjects,
         'student_count': student_count,
         'student_range': range(1, student_count + 1) if student_count else [],
     }
@@ -769,40 +507,271 @@ def add_bulk_exam(request):
     return render(request, 'marks/add_bulk_exam.html', context)
 
 
-# API endpoints for chart data
+# API endpoints for chart data (columnar payloads, see payloads.py)
+@payloads.compressed
 def api_marks_over_time(request, student_id):
     """API endpoint for marks over time chart data"""
     data = ChartDataService.marks_over_time(student_id)
-    return JsonResponse(data)
+    return payloads.json_response(data)
 
 
+@payloads.compressed
 def api_subject_performance(request, student_id):
     """API endpoint for subject performance chart data"""
     data = ChartDataService.subject_performance_chart(student_id)
-    return JsonResponse(data)
+    return payloads.json_response(data)
 
 
+@payloads.compressed
 def api_grade_distribution(request, student_id):
     """API endpoint for grade distribution chart data"""
     data = ChartDataService.grade_distribution_chart(student_id)
-    return JsonResponse(data)
+    return payloads.json_response(data)
 
 
+@payloads.compressed
 def api_student_comparison(request, subject_id):
     """API endpoint for student comparison chart data"""
     data = ChartDataService.student_comparison_chart(subject_id)
-    return JsonResponse(data)
+    return payloads.json_response(data)
+
+
+@payloads.compressed
+def api_exam_stats(request, exam_id):
+    """API endpoint for the score distribution of one exam"""
+    stats = ExamStatsService.for_exams([exam_id]).get(exam_id)
+    if stats is None:
+        return JsonResponse({'error': 'Exam not found'}, status=404)
+    
+    student_names = dict(
+        Student.objects.filter(id__in=[row['student_id'] for row in stats['rows']]).values_list('id', 'name')
+    )
+    rows = [{**row, 'student_name': student_names.get(row['student_id'])} for row in stats['rows']]
+    return JsonResponse({**stats, 'rows': rows})
+
+
+def _search_limit(request):
+    try:
+        return int(request.GET.get('limit', search.MAX_RESULTS))
+    except ValueError:
+        return search.MAX_RESULTS
+
+
+@payloads.compressed
+def api_search_students(request):
+    """
+    API endpoint for student typeahead: ?q=<prefix>&limit=<n>.
+    
+    With ?with_points=1 every match also carries its remaining lifetime points.
+    """
+    results = search.search('students', request.GET.get('q', ''), _search_limit(request))
+    if request.GET.get('with_points') and results:
+        remaining = dict(
+            LifetimePoints.objects.filter(student_id__in=[item['id'] for item in results]).values_list(
+                'student_id', F('points_earned') - F('points_spent')
+            )
+        )
+        for item in results:
+            item['points_remaining'] = remaining.get(item['id'], 0)
+    return JsonResponse({'results': results})
+
+
+@payloads.compressed
+def api_search_subjects(request):
+    """API endpoint for subject typeahead: ?q=<prefix>&limit=<n>"""
+    results = search.search('subjects', request.GET.get('q', ''), _search_limit(request))
+    return JsonResponse({'results': results})
 
 
+@payloads.compressed
+def api_trends(request):
+    """
+    API endpoint for per student × subject score trends.
+    
+    Optional filters: ?student=<id> and ?subject=<id> (both repeatable) and
+    ?class_number=<n>.
+    """
+    try:
+        student_ids = [int(value) for value in request.GET.getlist('student')] or None
+        subject_ids = [int(value) for value in request.GET.getlist('subject')] or None
+        class_number = request.GET.get('class_number')
+        class_number = int(class_number) if class_number else None
+    except ValueError:
+        return JsonResponse({'error': 'student, subject and class_number must be integers'}, status=400)
+    
+    trends = TrendService.compute(student_ids=student_ids, subject_ids=subject_ids, class_number=class_number)
+    return JsonResponse({'trends': trends})
+
+
+@payloads.compressed
+def api_head_to_head(request):
+    """
+    API endpoint for pairwise head-to-head records over shared exams.
+    
+    Optional filters: ?class_number=<n> and ?ids=<id>,<id>,... (default:
+    every student with shared exams, by name). Cell [i][j] of every matrix
+    is student i against student j.
+    """
+    try:
+        class_number = request.GET.get('class_number')
+        class_number = int(class_number) if class_number else None
+        ids = request.GET.get('ids')
+        student_ids = [int(value) for value in ids.split(',')] if ids else None
+    except ValueError:
+        return JsonResponse({'error': 'class_number and ids must be integers'}, status=400)
+    
+    records = ClassAnalyticsService.head_to_head(class_number)
+    return JsonResponse(HeadToHeadService.table(records, student_ids))
+
+
+@payloads.compressed
+def api_rollup(request):
+    """
+    API endpoint rolling exam totals up to any grain of the rollup cube.
+    
+    ?group_by= takes a comma separated list of student, subject, exam_type,
+    class and month (empty for grand totals). Optional filters: ?student=,
+    ?subject=, ?exam_type= (repeatable ids), ?class_number=, and ?from= /
+    ?to= months (YYYY-MM, inclusive).
+    """
+    from datetime import date
+    
+    group_by = [name for name in request.GET.get('group_by', '').split(',') if name]
+    unknown = [name for name in group_by if name not in RollupService.DIMENSIONS]
+    if unknown:
+        return JsonResponse(
+            {'error': f"Unknown dimension(s) {', '.join(unknown)}; use {', '.join(RollupService.DIMENSIONS)}"},
+            status=400,
+        )
+    
+    filters = {}
+    try:
+        for param, field in (('student', 'student_id'), ('subject', 'subject_id'), ('exam_type', 'exam_type_id')):
+            ids = [int(value) for value in request.GET.getlist(param)]
+            if len(ids) == 1:
+                filters[field] = ids[0]
+            elif ids:
+                filters[f'{field}__in'] = ids
+        class_number = request.GET.get('class_number')
+        class_number = int(class_number) if class_number else None
+        for param, lookup in (('from', 'month__gte'), ('to', 'month__lte')):
+            if request.GET.get(param):
+                year, month = request.GET[param].split('-')
+                filters[lookup] = date(int(year), int(month), 1)
+    except ValueError:
+        return JsonResponse(
+            {'error': 'student, subject, exam_type and class_number must be integers; from and to YYYY-MM'},
+            status=400,
+        )
+    
+    rows = RollupService.query(group_by, class_number, **filters)
+    for row in rows:
+        if 'month' in row:
+            row['month'] = row['month'].strftime('%Y-%m')
+    return JsonResponse({'group_by': group_by, 'rows': rows})
+
+
+def _snapshot_period(request):
+    """Read the ?period= of ranking snapshot APIs (None if invalid)"""
+    period = request.GET.get('period', RankingSnapshot.PERIOD_MONTH)
+    return period if period in dict(RankingSnapshot.PERIOD_CHOICES) else None
+
+
+@payloads.compressed
+def api_rank_history(request, student_id):
+    """
+    API endpoint for a student's rank history, read from ranking snapshots.
+    
+    ?period= is month (default) or day; ?class_number= ranks within one
+    class instead of all classes.
+    """
+    student = get_object_or_404(Student, id=student_id)
+    period = _snapshot_period(request)
+    if period is None:
+        return JsonResponse({'error': 'period must be day or month'}, status=400)
+    _, class_number = _class_filter(request)
+    
+    history = SnapshotService.rank_history(student.id, period, class_number)
+    for row in history:
+        row['as_of'] = row['as_of'].isoformat()
+    return JsonResponse({
+        'student_id': student.id,
+        'period': period,
+        'class_number': class_number,
+        'history': history,
+    })
+
+
+@payloads.compressed
+def api_rankings_as_of(request):
+    """
+    API endpoint for the overall rankings as they stood on a date.
+    
+    ?date= (YYYY-MM-DD, default today) picks the latest snapshot taken on
+    or before it; ?period=, ?class_number= and ?limit= are optional.
+    """
+    from datetime import date
+    from django.utils.dateparse import parse_date
+    
+    period = _snapshot_period(request)
+    try:
+        as_of = parse_date(request.GET['date']) if request.GET.get('date') else date.today()
+        limit = int(request.GET.get('limit') or 0)
+    except ValueError:
+        as_of = None
+    if period is None or as_of is None:
+        return JsonResponse(
+            {'error': 'date must be YYYY-MM-DD, period day or month and limit an integer'},
+            status=400,
+        )
+    _, class_number = _class_filter(request)
+    
+    snapshot_date, rows = SnapshotService.rankings_as_of(as_of, period, class_number, limit)
+    return JsonResponse({
+        'as_of': snapshot_date.isoformat() if snapshot_date else None,
+        'period': period,
+        'class_number': class_number,
+        'rankings': [
+            {
+                'student_id': row['student_id'],
+                'name': row['student__name'],
+                'rank': row['rank'],
+                'average_percentage': row['average_percentage'],
+                'points': row['points'],
+            }
+            for row in rows
+        ],
+    })
+
+
+@payloads.compressed
+def api_recalc_queue(request):
+    """API endpoint for recalculation queue depth and lag"""
+    return JsonResponse(RecalcQueueService.stats())
+
+
+@payloads.compressed
 def api_overall_grade_distribution(request):
-    """API endpoint for overall grade distribution chart data"""
-    data = ChartDataService.overall_grade_distribution()
-    return JsonResponse(data)
+    """API endpoint for overall grade distribution chart data (?class_number= for one class)"""
+    _, class_number = _class_filter(request)
+    data = ChartDataService.overall_grade_distribution(class_number)
+    return payloads.json_response(data)
+
+
+def _float_param(request, name):
+    """A float query parameter, or None when it is missing or invalid"""
+    try:
+        return float(request.GET.get(name, ''))
+    except ValueError:
+        return None
 
 
 def all_exams(request):
     """Display all exam entries in detail"""
-    exams = Exam.objects.all().select_related('student', 'subject', 'exam_type').order_by('-date', '-exam_id')
+    sort = request.GET.get('sort', 'recent')
+    if sort not in EXAM_SORTS:
+        sort = 'recent'
+    exams = Exam.objects.all().select_related('student', 'subject', 'exam_type').order_by(*EXAM_SORTS[sort])
     
     # Get filter parameters
     student_filter = request.GET.get('student')
@@ -836,26 +805,45 @@ def all_exams(request):
         exams = exams.filter(date__gte=date_from)
     if date_to:
         exams = exams.filter(date__lte=date_to)
+    # Score range, e.g. ?percentage_max=40 for every result below 40%
+    percentage_min = _float_param(request, 'percentage_min')
+    percentage_max = _float_param(request, 'percentage_max')
+    if percentage_min is not None:
+        exams = exams.filter(stored_percentage__gte=percentage_min)
+    if percentage_max is not None:
+        exams = exams.filter(stored_percentage__lte=percentage_max)
     
     # Count unique exams and total records
     unique_exams_count = count_unique_exams(exams)
     total_records_count = exams.count()
     
-    # Calculate statistics
-    average_percentage = 0
-    highest_percentage = 0
-    lowest_percentage = 0
-    
-    if exams.exists():
-        total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-        total_possible_marks = sum(float(e.total_marks) for e in exams)
-        average_percentage = (total_marks_obtained * 100 / total_possible_marks) if total_possible_marks > 0 else 0
-        highest_percentage = max(exam.percentage for exam in exams)
-        lowest_percentage = min(exam.percentage for exam in exams)
-    
-    # Get all options for filters
-    students = Student.objects.all().order_by('name')
-    subjects = Subject.objects.all().order_by('name')
+    # Calculate statistics in SQL
+    totals = exams.aggregate(
+        total_marks_obtained=Sum('mark_obtained'),
+        total_possible_marks=Sum('total_marks'),
+        highest_percentage=Max('stored_percentage'),
+        lowest_percentage=Min('stored_percentage'),
+    )
+    total_possible_marks = totals['total_possible_marks'] or 0
+    average_percentage = (
+        totals['total_marks_obtained'] * 100 / total_possible_marks if total_possible_marks > 0 else 0
+    )
+    highest_percentage = totals['highest_percentage'] or 0
+    lowest_percentage = totals['lowest_percentage'] or 0
+    
+    # Paginate the table (keeping the active filters in page links)
+    exams_page = Paginator(exams, EXAMS_PAGE_SIZE).get_page(request.GET.get('page'))
+    filter_params = request.GET.copy()
+    filter_params.pop('page', None)
+    
+    # Percentile of every result on this page within its own exam
+    row_stats = ExamStatsService.row_stats({exam.exam_id for exam in exams_page})
+    for exam in exams_page:
+        exam.stats = row_stats.get(exam.pk)
+    
+    # Get options for filters (students and subjects are typeahead fields)
+    selected_student = Student.objects.filter(id=student_filter).first() if student_filter else None
+    selected_subject = Subject.objects.filter(id=subject_filter).first() if subject_filter else None
     exam_types = ExamType.objects.all().order_by('name')
     
     # Generate available months from exam dates
@@ -879,25 +867,63 @@ def all_exams(request):
         })
     
     context = {
-        'exams': exams,
+        'exams': exams_page,
+        'filter_query': filter_params.urlencode(),
         'unique_exams_count': unique_exams_count,
         'total_records_count': total_records_count,
-        'students': students,
-        'subjects': subjects,
+        'selected_student': selected_student,
+        'selected_subject': selected_subject,
         'exam_types': exam_types,
         'available_months': available_months,
         'average_percentage': average_percentage,
         'highest_percentage': highest_percentage,
         'lowest_percentage': lowest_percentage,
+        'sort': sort,
     }
     
     return render(request, 'marks/all_exams.html', context)
 
 
+def exam_detail(request, exam_id):
+    """Score distribution of one exam (every result sharing the exam_id)"""
+    results = {
+        exam.pk: exam
+        for exam in Exam.objects.filter(exam_id=exam_id).select_related('student', 'subject', 'exam_type')
+    }
+    if not results:
+        raise Http404("Exam not found")
+    
+    stats = ExamStatsService.for_exams([exam_id])[exam_id]
+    ranked_results = [
+        {'exam': results[row['id']], **row}
+        for row in stats['rows'] if row['id'] in results
+    ]
+    
+    context = {
+        'exam_id': exam_id,
+        'exam': ranked_results[0]['exam'] if ranked_results else next(iter(results.values())),
+        'stats': stats,
+        'ranked_results': ranked_results,
+    }
+    
+    return render(request, 'marks/exam_detail.html', context)
+
+
 def points(request):
     """Points management page with history and summary"""
-    # Get all students for filters
-    students = Student.objects.all().order_by('name')
+    # Student points summary: one LEFT JOIN of students to their lifetime points
+    student_summary = list(
+        Student.objects.annotate(
+            points_earned=Coalesce('lifetimepoints__points_earned', 0),
+            points_spent=Coalesce('lifetimepoints__points_spent', 0),
+        ).annotate(
+            points_remaining=F('points_earned') - F('points_spent'),
+        ).order_by('-points_earned', 'name').values(
+            'id', 'name', 'points_earned', 'points_spent', 'points_remaining'
+        )
+    )
+    for item in student_summary:
+        item['student'] = {'id': item['id'], 'name': item['name']}
     
     # Get points spent history with filters
     points_history = PointsSpent.objects.all().select_related('student')
@@ -908,8 +934,12 @@ def points(request):
     to_date = request.GET.get('to_date')
     min_spent = request.GET.get('min_spent')
     
+    selected_student = None
     if student_filter:
         points_history = points_history.filter(student_id=student_filter)
+        selected_student = next(
+            (item['student'] for item in student_summary if str(item['id']) == student_filter), None
+        )
     if from_date:
         points_history = points_history.filter(date__gte=from_date)
     if to_date:
@@ -917,40 +947,30 @@ def points(request):
     if min_spent:
         points_history = points_history.filter(points_spent__gte=int(min_spent))
     
-    # Calculate statistics for filtered records
-    total_points_spent = 0
-    average_spent = 0
-    highest_spent = 0
-    lowest_spent = 0
-    
-    if points_history.exists():
-        total_points_spent = sum(record.points_spent for record in points_history)
-        average_spent = total_points_spent / points_history.count()
-        highest_spent = max(record.points_spent for record in points_history)
-        lowest_spent = min(record.points_spent for record in points_history)
-    
-    # Get student points summary
-    student_summary = []
-    for student in Student.objects.all().order_by('name'):
-        lifetime_points, created = LifetimePoints.objects.get_or_create(student=student)
-        student_summary.append({
-            'student': student,
-            'points_earned': lifetime_points.points_earned,
-            'points_spent': lifetime_points.points_spent,
-            'points_remaining': lifetime_points.points_remaining
-        })
+    # Calculate statistics for filtered records in a single aggregate
+    spend_stats = points_history.aggregate(
+        total=Sum('points_spent'),
+        average=Avg('points_spent'),
+        highest=Max('points_spent'),
+        lowest=Min('points_spent'),
+        count=Count('id'),
+    )
     
-    # Sort by points earned descending
-    student_summary.sort(key=lambda x: x['points_earned'], reverse=True)
+    # Paginate the history table (keeping the active filters in page links)
+    history_page = Paginator(points_history, POINTS_HISTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+    filter_params = request.GET.copy()
+    filter_params.pop('page', None)
     
     context = {
-        'students': students,
-        'points_history': points_history,
+        'selected_student': selected_student,
+        'points_history': history_page,
+        'filter_query': filter_params.urlencode(),
         'student_summary': student_summary,
-        'total_points_spent': total_points_spent,
-        'average_spent': average_spent,
-        'highest_spent': highest_spent,
-        'lowest_spent': lowest_spent,
+        'total_records': spend_stats['count'],
+        'total_points_spent': spend_stats['total'] or 0,
+        'average_spent': spend_stats['average'] or 0,
+        'highest_spent': spend_stats['highest'] or 0,
+        'lowest_spent': spend_stats['lowest'] or 0,
     }
     
     return render(request, 'marks/points.html', context)
@@ -989,316 +1009,43 @@ def add_points_spent(request):
         except ValueError:
             messages.error(request, 'Invalid points value.')
     
-    # Get all students for the form
-    students = Student.objects.all().order_by('name')
-    
-    context = {
-        'students': students,
-    }
-    
-    return render(request, 'marks/add_points_spent.html', context)
+    # Students (with their remaining points) come from api/search/students
+    return render(request, 'marks/add_points_spent.html')
 
 
 def leaderboard(request):
     """Leaderboard page with overall, subject-wise, and monthly rankings"""
-    from django.db.models import Avg, Count, Max, Sum
-    from datetime import datetime
-    
-    # Get class filter from request
-    class_filter = request.GET.get('class_number', 'all')
-    
-    # Get available class numbers
-    available_classes = Exam.objects.values_list('class_number', flat=True).distinct().order_by('class_number')
-    
-    # Overall Rankings
-    overall_rankings = []
-    students = Student.objects.all()
-    
-    for student in students:
-        # Filter exams by class if specified
-        if class_filter != 'all':
-            exams = student.exam_set.filter(class_number=int(class_filter))
-            if not exams.exists():
-                continue
-
-            total_exams = student._count_unique_exams(exams)
-            if total_exams > 0:
-                # Calculate excellence rate (CQ >=80%, MCQ >=85%)
-                excellent_exams = 0
-                exam_points = 0
-                for exam in exams:
-                    percentage = exam.percentage
-                    exam_type_name = exam.exam_type.name.upper().strip()
-                    exam_points += exam.points_earned
-                    if exam_type_name == "MCQ" and percentage >= 85:
-                        excellent_exams += 1
-                    elif exam_type_name == "CQ" and percentage >= 80:
-                        excellent_exams += 1
-
-                # Calculate monthly wins for this class filter
-                from datetime import date
-                current_year = date.today().year
-                current_month = date.today().month
-                months_set = set()
-                exam_dates = exams.values_list('date', flat=True).distinct()
-                for exam_date in exam_dates:
-                    if exam_date:
-                        if (exam_date.year < current_year) or (exam_date.year == current_year and exam_date.month < current_month):
-                            months_set.add((exam_date.year, exam_date.month))
-
-                monthly_wins = 0
-                for year, month in months_set:
-                    month_exams = exams.filter(date__year=year, date__month=month)
-                    if not month_exams.exists():
-                        continue
-                    students_in_month = Student.objects.filter(exam__class_number=exams.first().class_number, exam__date__year=year, exam__date__month=month).distinct()
-                    month_rankings = []
-                    for s in students_in_month:
-                        s_month_exams = s.exam_set.filter(class_number=exams.first().class_number, date__year=year, date__month=month)
-                        total_marks = sum(float(e.mark_obtained) for e in s_month_exams)
-                        total_possible = sum(float(e.total_marks) for e in s_month_exams)
-                        avg_percentage = (total_marks * 100 / total_possible) if total_possible > 0 else 0
-                        month_rankings.append({
-                            'student_id': s.id,
-                            'average_percentage': avg_percentage,
-                            'total_marks': total_marks,
-                        })
-                    month_rankings.sort(key=lambda x: (x['average_percentage'], x['total_marks']), reverse=True)
-                    if month_rankings:
-                        top_avg = month_rankings[0]['average_percentage']
-                        top_total = month_rankings[0]['total_marks']
-                        for ranking in month_rankings:
-                            if ranking['student_id'] == student.id:
-                                if (abs(ranking['average_percentage'] - top_avg) < 0.01 and ranking['total_marks'] == top_total):
-                                    monthly_wins += 1
-                                break
-
-                bonus_points = monthly_wins * 40
-                total_points = exam_points + bonus_points
-                excellence_rate = (excellent_exams / total_exams) * 100
-                total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-                total_possible_marks = sum(float(e.total_marks) for e in exams)
-                avg_percentage = (total_marks_obtained * 100 / total_possible_marks) if total_possible_marks > 0 else 0
-
-                overall_rankings.append({
-                    'student': student,
-                    'total_exams': total_exams,
-                    'average_percentage': avg_percentage,
-                    'total_points': total_points,
-                    'excellence_rate': excellence_rate,
-                })
-        else:
-            exams = student.exam_set.all()
-            if not exams.exists():
-                continue
-            total_exams = student._count_unique_exams(exams)
-            if total_exams > 0:
-                # Calculate excellence rate (CQ >=80%, MCQ >=85%)
-                excellent_exams = 0
-                for exam in exams:
-                    percentage = exam.percentage
-                    exam_type_name = exam.exam_type.name.upper().strip()
-                    if exam_type_name == "MCQ" and percentage >= 85:
-                        excellent_exams += 1
-                    elif exam_type_name == "CQ" and percentage >= 80:
-                        excellent_exams += 1
-                excellence_rate = (excellent_exams / total_exams) * 100
-                # Use lifetime points (precomputed, includes all monthly wins)
-                lifetime_points_obj = LifetimePoints.objects.filter(student=student).first()
-                total_points = lifetime_points_obj.points_earned if lifetime_points_obj else 0
-                total_marks_obtained = sum(float(e.mark_obtained) for e in exams)
-                total_possible_marks = sum(float(e.total_marks) for e in exams)
-                avg_percentage = (total_marks_obtained * 100 / total_possible_marks) if total_possible_marks > 0 else 0
-                overall_rankings.append({
-                    'student': student,
-                    'total_exams': total_exams,
-                    'average_percentage': avg_percentage,
-                    'total_points': total_points,
-                    'excellence_rate': excellence_rate,
-                })
-    
-    # Sort by average score (primary), then total marks (tie-breaker)
-    overall_rankings.sort(key=lambda x: (x['average_percentage'], x['total_points']), reverse=True)
-    
-    # Add ranks with tie handling
-    current_rank = 1
-    for idx, item in enumerate(overall_rankings):
-        if idx > 0:
-            prev = overall_rankings[idx - 1]
-            # If same score AND same total marks, keep same rank
-            if (abs(item['average_percentage'] - prev['average_percentage']) < 0.01 and
-                item['total_points'] == prev['total_points']):
-                item['rank'] = current_rank  # Share rank
-            else:
-                current_rank = idx + 1
-                item['rank'] = current_rank
-        else:
-            item['rank'] = 1
+    class_filter, class_number = _class_filter(request)
     
-    # Subject-wise Leaders
-    subject_leaders = []
-    subjects = Subject.objects.all()
+    # Rankings and monthly champions are computed and cached per class
+    overall_rankings = ClassAnalyticsService.overall_rankings(class_number)
+    monthly_champions = ClassAnalyticsService.monthly_champions(class_number)
     
-    for subject in subjects:
-        leaders = []
-        
-        # Filter by class if specified
-        if class_filter != 'all':
-            students_in_subject = Student.objects.filter(
-                exam__subject=subject,
-                exam__class_number=int(class_filter)
-            ).distinct()
-        else:
-            students_in_subject = Student.objects.filter(exam__subject=subject).distinct()
-        
-        for student in students_in_subject:
-            # Filter exams by class
-            if class_filter != 'all':
-                exams = student.exam_set.filter(subject=subject, class_number=int(class_filter))
-            else:
-                exams = student.exam_set.filter(subject=subject)
-                
-            from .services import count_unique_exams
-            exams_count = count_unique_exams(exams)
-            
-            if exams_count > 0:
-                total_marks = sum(float(e.mark_obtained) for e in exams)
-                total_possible = sum(float(e.total_marks) for e in exams)
-                avg_percentage = (total_marks * 100 / total_possible) if total_possible > 0 else 0
-                best_score = max(e.percentage for e in exams)
-                
-                leaders.append({
-                    'student': student,
-                    'exams_count': exams_count,
-                    'total_marks': total_marks,  # Add for tie-breaking
-                    'average_percentage': avg_percentage,
-                    'best_score': best_score,
-                })
-        
-        # Sort by average score (primary), then total marks (tie-breaker)
-        leaders.sort(key=lambda x: (x['average_percentage'], x['total_marks']), reverse=True)
-        
-        # Add ranks with tie handling
-        current_rank = 1
-        for idx, leader in enumerate(leaders):
-            if idx > 0:
-                prev = leaders[idx - 1]
-                # If same score AND same total marks, keep same rank
-                if (abs(leader['average_percentage'] - prev['average_percentage']) < 0.01 and
-                    leader['total_marks'] == prev['total_marks']):
-                    leader['rank'] = current_rank  # Share rank
-                else:
-                    current_rank = idx + 1
-                    leader['rank'] = current_rank
-            else:
-                leader['rank'] = 1
-        
-        subject_leaders.append({
+    # Subject-wise Leaders (precomputed standings, top 10 per subject)
+    leaders_by_subject = StandingsService.subject_leaders(class_number=class_number)
+    subject_leaders = [
+        {
             'subject': subject,
-            'leaders': leaders[:10],  # Top 10 per subject
-        })
-    
-    # Monthly Champions (exclude current month)
-    monthly_champions = []
-    
-    # Get all unique year-month combinations from exams (only past months)
-    from datetime import date as date_type
-    current_year = date_type.today().year
-    current_month = date_type.today().month
-    
-    # Filter exam dates by class
-    if class_filter != 'all':
-        exam_dates = Exam.objects.filter(class_number=int(class_filter)).values_list('date', flat=True).distinct()
-    else:
-        exam_dates = Exam.objects.values_list('date', flat=True).distinct()
-    
-    months_set = set()
-    
-    for date in exam_dates:
-        if date:
-            # Only include months that have fully passed
-            if (date.year < current_year) or (date.year == current_year and date.month < current_month):
-                months_set.add((date.year, date.month))
-    
-    # Sort months in descending order (most recent first)
-    sorted_months = sorted(months_set, reverse=True)
-    
-    for year, month in sorted_months:
-        month_name = datetime(year, month, 1).strftime('%B %Y')
-        champions = []
-        
-        # Get all students who had exams in this month (with class filter)
-        if class_filter != 'all':
-            students_in_month = Student.objects.filter(
-                exam__date__year=year,
-                exam__date__month=month,
-                exam__class_number=int(class_filter)
-            ).distinct()
-        else:
-            students_in_month = Student.objects.filter(
-                exam__date__year=year,
-                exam__date__month=month
-            ).distinct()
-        
-        for student in students_in_month:
-            # Filter by class
-            if class_filter != 'all':
-                exams = student.exam_set.filter(
-                    date__year=year,
-                    date__month=month,
-                    class_number=int(class_filter)
-                )
-            else:
-                exams = student.exam_set.filter(date__year=year, date__month=month)
-                
-            from .services import count_unique_exams
-            exams_count = count_unique_exams(exams)
-            
-            if exams_count > 0:
-                total_marks = sum(float(e.mark_obtained) for e in exams)
-                total_marks = sum(float(e.mark_obtained) for e in exams)
-                total_possible = sum(float(e.total_marks) for e in exams)
-                avg_percentage = (total_marks * 100 / total_possible) if total_possible > 0 else 0
-                points_earned = sum(e.points_earned for e in exams)
-                
-                champions.append({
-                    'student': student,
-                    'exams_count': exams_count,
-                    'total_marks': total_marks,  # Add for tie-breaking
-                    'average_percentage': avg_percentage,
-                    'points_earned': points_earned,
-                })
-        
-        # Sort by average score (primary), then total marks (tie-breaker)
-        champions.sort(key=lambda x: (x['average_percentage'], x['total_marks']), reverse=True)
-        
-        # Add ranks with tie handling
-        current_rank = 1
-        for idx, champion in enumerate(champions):
-            if idx > 0:
-                prev = champions[idx - 1]
-                # If same score AND same total marks, keep same rank
-                if (abs(champion['average_percentage'] - prev['average_percentage']) < 0.01 and
-                    champion['total_marks'] == prev['total_marks']):
-                    champion['rank'] = current_rank  # Share rank
-                else:
-                    current_rank = idx + 1
-                    champion['rank'] = current_rank
-            else:
-                champion['rank'] = 1
-        
-        monthly_champions.append({
-            'month_name': month_name,
-            'year': year,
-            'month': month,
-            'champions': champions[:10],  # Top 10 per month
-        })
+            'leaders': [
+                {
+                    'student': standing.student,
+                    'exams_count': standing.exam_count,
+                    'total_marks': standing.total_marks_obtained,
+                    'average_percentage': standing.average_percentage,
+                    'best_score': standing.best_percentage,
+                    'rank': standing.rank,
+                }
+                for standing in leaders_by_subject.get(subject.id, [])
+            ],
+        }
+        for subject in Subject.objects.all()
+    ]
     
     context = {
         'overall_rankings': overall_rankings,
         'subject_leaders': subject_leaders,
         'monthly_champions': monthly_champions,
-        'available_classes': available_classes,
+        'available_classes': ClassAnalyticsService.available_classes(),
         'selected_class': class_filter,
     }
     
@@ -0,0 +1,120 @@
+"""
+Process warm-up after a (re)start.
+
+Builds everything the first requests of a fresh worker would otherwise
+pay for: imports done lazily by the URLconf and views, compiled
+templates, the grading registry and search tries of this process, and
+the cached dashboard and leaderboard analytics of every class partition.
+
+Run it per worker from gunicorn (see gunicorn.conf.py), at startup with
+WARM_CACHES_ON_STARTUP=true (see MarksConfig.ready), or on demand with
+`python manage.py warm_caches`. Per-process state is warmed in every
+process; shared cache entries that are still valid are simply reused.
+"""
+import importlib
+import logging
+import time
+from pathlib import Path
+
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+# Modules imported inside view functions
+LAZY_IMPORTS = (
+    'datetime',
+    'uuid',
+    'django.utils.dateparse',
+)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+
+def import_modules():
+    """Import the URLconf, the views it references and lazily imported modules"""
+    from django.urls import get_resolver
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+    for name in LAZY_IMPORTS:
+        importlib.import_module(name)
+    return len(LAZY_IMPORTS)
+
+
+def compile_templates():
+    """Load every marks template, filling the cached template loader"""
+    from django.template.loader import get_template
+    names = sorted(
+        path.relative_to(TEMPLATE_DIR).as_posix() for path in TEMPLATE_DIR.rglob('*.html')
+    )
+    for name in names:
+        get_template(name)
+    return len(names)
+
+
+def compile_grading():
+    """Compile the grading registry of this process"""
+    from . import grading
+    grading.check_generation()
+    return len(grading.get_registry().exam_type_names)
+
+
+def build_search_indexes():
+    """Build the typeahead tries of this process"""
+    from . import search
+    return sum(len(search.get_index(source).entries) for source in search.SOURCES)
+
+
+def build_analytics():
+    """Cache the dashboard, rankings and monthly champions of every class partition"""
+    from .services import ClassAnalyticsService
+    partitions = [None, *ClassAnalyticsService.available_classes()]
+    for class_number in partitions:
+        ClassAnalyticsService.dashboard(class_number)
+        ClassAnalyticsService.overall_rankings(class_number)
+        ClassAnalyticsService.monthly_champions(class_number)
+    return len(partitions)
+
+
+# Steps in the order they run; later steps reuse the grading registry
+STEPS = {
+    'imports': import_modules,
+    'templates': compile_templates,
+    'grading': compile_grading,
+    'search': build_search_indexes,
+    'analytics': build_analytics,
+}
+
+
+def warm(steps=None):
+    """
+    Run the warm-up steps and log how long they took.
+
+    A step that fails (e.g. the database is not migrated yet) is logged and
+    skipped; warming up never stops a worker from starting.
+
+    Args:
+        steps: Names from STEPS to run (default: all)
+
+    Returns:
+        list: (step name, items warmed or None on failure, seconds) tuples
+    """
+    results = []
+    for name, step in STEPS.items():
+        if steps is not None and name not in steps:
+            continue
+        started = time.perf_counter()
+        try:
+            count = step()
+        except DatabaseError:
+            logger.warning('Warm-up step %s failed', name, exc_info=True)
+            count = None
+        elapsed = time.perf_counter() - started
+        logger.debug('Warm-up step %s: %s items in %.3fs', name, count, elapsed)
+        results.append((name, count, elapsed))
+    logger.info(
+        'Warmed up in %.3fs (%s)',
+        sum(elapsed for _, _, elapsed in results),
+        ', '.join(f'{name} {elapsed:.3f}s' for name, _, elapsed in results),
+    )
+    return results
@@ -0,0 +1,78 @@
+// Decoder for the columnar chart payloads of the chart APIs (see marks/payloads.py).
+//
+//   {"version": 1, "length": 2, "scale": 100,
+//    "columns": {"subject": [0, 1], "day": [20163, 20170], "percentage": [8750, 6425]},
+//    "encodings": {"subject": "dictionary", "day": "epoch_day", "percentage": "scaled"},
+//    "dictionaries": {"subject": {"id": [3, 5], "name": ["Mathematics", "Physics"]}}}
+//
+// Columnar.column(payload, 'percentage')  -> [87.5, 64.25]
+// Columnar.column(payload, 'subject')     -> [{id: 3, name: 'Mathematics'}, {id: 5, name: 'Physics'}]
+// Columnar.column(payload, 'day')         -> [Date, Date] (UTC midnight)
+// Columnar.rows(payload)                  -> [{subject: {...}, day: Date, percentage: 87.5}, ...]
+//
+// A null dictionary column means row i uses dictionary entry i.
+(function () {
+    'use strict';
+
+    const VERSION = 1;
+    const DAY_MS = 86400000;
+
+    function checkVersion(payload) {
+        if (payload.version !== VERSION) {
+            throw new Error('Unsupported chart payload version ' + payload.version);
+        }
+    }
+
+    function dictionaryEntries(dictionary) {
+        const fields = Object.keys(dictionary);
+        const size = fields.length ? dictionary[fields[0]].length : 0;
+        const entries = new Array(size);
+        for (let i = 0; i < size; i++) {
+            const entry = {};
+            fields.forEach(field => { entry[field] = dictionary[field][i]; });
+            entries[i] = entry;
+        }
+        return entries;
+    }
+
+    function column(payload, name) {
+        checkVersion(payload);
+        const values = payload.columns[name] || [];
+        switch ((payload.encodings || {})[name]) {
+            case 'dictionary': {
+                const entries = dictionaryEntries(payload.dictionaries[name]);
+                if (payload.columns[name] === null) {
+                    return entries;
+                }
+                return values.map(code => (code === null ? null : entries[code]));
+            }
+            case 'scaled':
+                return values.map(value => (value === null ? null : value / payload.scale));
+            case 'epoch_day':
+                return values.map(day => new Date(day * DAY_MS));
+            default:
+                return values.slice();
+        }
+    }
+
+    function rows(payload) {
+        checkVersion(payload);
+        const names = Object.keys(payload.columns);
+        const decoded = names.map(name => column(payload, name));
+        const result = new Array(payload.length);
+        for (let i = 0; i < payload.length; i++) {
+            const row = {};
+            names.forEach((name, j) => { row[name] = decoded[j][i]; });
+            result[i] = row;
+        }
+        return result;
+    }
+
+    // "mm/dd" of a decoded epoch_day value
+    function monthDay(date) {
+        const pad = number => String(number).padStart(2, '0');
+        return pad(date.getUTCMonth() + 1) + '/' + pad(date.getUTCDate());
+    }
+
+    window.Columnar = { column, rows, monthDay };
+})();
@@ -0,0 +1,131 @@
+// Typeahead inputs for students and subjects.
+//
+// Markup (see marks/partials/typeahead.html):
+//   <div data-typeahead="/api/search/students/">
+//     <input type="hidden" name="student" data-typeahead-value>
+//     <input type="text" data-typeahead-input>
+//     <ul data-typeahead-results></ul>
+//   </div>
+//
+// The hidden input holds the chosen id and fires "change" whenever it is
+// set or cleared. The container also dispatches "typeahead:select"
+// (detail = the chosen result, including any extra fields) and
+// "typeahead:clear".
+(function () {
+    'use strict';
+
+    const DEBOUNCE_MS = 150;
+
+    function setup(container) {
+        const url = container.dataset.typeahead;
+        const extraParams = container.dataset.typeaheadParams || '';
+        const valueInput = container.querySelector('[data-typeahead-value]');
+        const textInput = container.querySelector('[data-typeahead-input]');
+        const list = container.querySelector('[data-typeahead-results]');
+        const emptyMessage = container.dataset.typeaheadEmpty || 'No matches';
+        let results = [];
+        let active = -1;
+        let timer = null;
+        let request = 0;
+
+        function close() {
+            list.classList.add('hidden');
+            active = -1;
+        }
+
+        function render() {
+            list.innerHTML = '';
+            if (!results.length) {
+                const li = document.createElement('li');
+                li.className = 'px-3 py-2 text-xs text-gray-500';
+                li.textContent = emptyMessage;
+                list.appendChild(li);
+            }
+            results.forEach(function (item, index) {
+                const li = document.createElement('li');
+                li.className = 'px-3 py-2 text-sm cursor-pointer ' +
+                    (index === active ? 'bg-purple-100 text-purple-800' : 'hover:bg-purple-50');
+                li.setAttribute('role', 'option');
+                li.textContent = item.name;
+                li.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    choose(item);
+                });
+                list.appendChild(li);
+            });
+            list.classList.remove('hidden');
+        }
+
+        function fetchResults() {
+            const current = ++request;
+            const query = encodeURIComponent(textInput.value.trim());
+            fetch(url + '?q=' + query + (extraParams ? '&' + extraParams : ''))
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    if (current !== request) {
+                        return;  // A newer request is on its way
+                    }
+                    results = data.results || [];
+                    active = results.length ? 0 : -1;
+                    render();
+                });
+        }
+
+        function choose(item) {
+            valueInput.value = item.id;
+            textInput.value = item.name;
+            textInput.setCustomValidity('');
+            close();
+            valueInput.dispatchEvent(new Event('change', { bubbles: true }));
+            container.dispatchEvent(new CustomEvent('typeahead:select', { detail: item, bubbles: true }));
+        }
+
+        function clear() {
+            if (valueInput.value) {
+                valueInput.value = '';
+                valueInput.dispatchEvent(new Event('change', { bubbles: true }));
+                container.dispatchEvent(new CustomEvent('typeahead:clear', { bubbles: true }));
+            }
+        }
+
+        textInput.addEventListener('input', function () {
+            clear();
+            // Typed text only counts once a match is picked
+            textInput.setCustomValidity(textInput.value.trim() ? 'Choose a match from the list' : '');
+            clearTimeout(timer);
+            timer = setTimeout(fetchResults, DEBOUNCE_MS);
+        });
+
+        textInput.addEventListener('focus', function () {
+            if (!valueInput.value) {
+                fetchResults();
+            }
+        });
+
+        textInput.addEventListener('blur', close);
+
+        textInput.addEventListener('keydown', function (event) {
+            if (list.classList.contains('hidden') || !results.length) {
+                return;
+            }
+            if (event.key === 'ArrowDown') {
+                active = (active + 1) % results.length;
+                render();
+                event.preventDefault();
+            } else if (event.key === 'ArrowUp') {
+                active = (active - 1 + results.length) % results.length;
+                render();
+                event.preventDefault();
+            } else if (event.key === 'Enter' && active >= 0) {
+                choose(results[active]);
+                event.preventDefault();
+            } else if (event.key === 'Escape') {
+                close();
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('[data-typeahead]').forEach(setup);
+    });
+})();